@@ -0,0 +1,86 @@
+"""Benchmark TransactionDeduplicator modes on large synthetic batches.
+
+Usage:
+    python -m benchmarks.bench_dedup --sizes 10000 100000 --duplicate-rate 0.2
+"""
+import argparse
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from src.config import TxType, PaymentMode
+from src.deduplicator import TransactionDeduplicator
+from src.parser import Transaction
+
+MERCHANTS = ['SWIGGY', 'ZOMATO', 'UBER TRIP', 'AMAZON', 'BIGBASKET', 'NETFLIX', None]
+MODES = [PaymentMode.UPI, PaymentMode.CARD, PaymentMode.NEFT]
+
+
+def synthetic_batch(size: int, duplicate_rate: float, seed: int = 7) -> List[Transaction]:
+    """
+    Generate transactions over ~a year with a share of near-duplicates.
+
+    Args:
+        size: Number of transactions
+        duplicate_rate: Fraction that are re-alerts of an earlier transaction
+        seed: Random seed
+
+    Returns:
+        Shuffled list of Transaction objects
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    transactions = []
+    for _ in range(size):
+        if transactions and rng.random() < duplicate_rate:
+            original = rng.choice(transactions)
+            # Second alert for the same payment, a few minutes later, often without a payee
+            transactions.append(Transaction(
+                amount=original.amount,
+                tx_type=original.tx_type,
+                mode=PaymentMode.UNKNOWN,
+                merchant=original.merchant if rng.random() < 0.5 else None,
+                date=original.date + timedelta(minutes=rng.uniform(-4, 4)),
+                raw_text=''
+            ))
+            continue
+        transactions.append(Transaction(
+            amount=float(rng.choice([100, 250, 499, 999]) if rng.random() < 0.3 else round(rng.uniform(10, 20000), 2)),
+            tx_type=TxType.DEBIT if rng.random() < 0.9 else TxType.CREDIT,
+            mode=rng.choice(MODES),
+            merchant=rng.choice(MERCHANTS),
+            date=start + timedelta(seconds=rng.uniform(0, 365 * 86400)),
+            raw_text=''
+        ))
+    rng.shuffle(transactions)
+    return transactions
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    arg_parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    arg_parser.add_argument('--tolerance', type=float, default=5.0, help="Sweep tolerance in minutes")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{'size':>8} {'mode':>7} {'best s':>9} {'tx/s':>11} {'kept':>8}")
+    for size in args.sizes:
+        batch = synthetic_batch(size, args.duplicate_rate)
+        for mode in ('bucket', 'sweep'):
+            dedup = TransactionDeduplicator(mode=mode, tolerance_minutes=args.tolerance)
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                kept = dedup.deduplicate(batch)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            print(f"{size:>8} {mode:>7} {best:>9.4f} {size / best:>11,.0f} {len(kept):>8}")
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    main()
@@ -0,0 +1,330 @@
+"""End-to-end pipeline benchmark on a synthetic corpus, against fake IMAP, LLM and Sheets.
+
+Generates N alert emails from the templates in tests/fixtures/sample_emails.json
+(every bank, plain text and HTML, with re-sent duplicates), runs them through
+run_account() with the in-memory stand-ins from tests/fakes.py at the given
+latencies, and prints throughput and exact latency percentiles per stage and
+per component. With --baseline, exits non-zero if throughput or a p95 latency
+regressed past the stored baseline by more than --tolerance.
+
+Usage:
+    python -m benchmarks.bench_pipeline --emails 2000 --pipeline-mode staged
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baselines.json
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baselines.json --update-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+from src.categorizer import CATEGORY_CODES, TransactionCategorizer
+from src.config import BANK_SENDERS, Account
+from src.main import run_account
+from src.metrics import LatencyHistogram, run_metrics
+from src.parser import TransactionParser
+from src.sheets import SheetsClientPool
+from tests.fakes import FakeAnthropic, FakeIMAP, FakeSheetsService
+
+TEMPLATES_FILE = Path(__file__).parent.parent / 'tests' / 'fixtures' / 'sample_emails.json'
+
+# Pipeline stages, and the external calls made inside them
+STAGES = ['parse', 'deduplicate', 'categorize', 'write_sheets']
+COMPONENTS = ['fetch', 'sheets_request']
+
+# First decimal amount in an alert is the transaction amount (balances come later)
+AMOUNT_PATTERN = re.compile(r'\d[\d,]*\.\d{2}')
+
+
+def load_templates() -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Read the sample alerts.
+
+    Returns:
+        (name, body, merchant) per template
+    """
+    with open(TEMPLATES_FILE) as f:
+        samples = json.load(f)
+    return [(name, sample['body'], sample['expected'].get('merchant')) for name, sample in samples.items()]
+
+
+def _sender(template: str) -> str:
+    """Bank sender address for a template, by its name prefix."""
+    bank = template.split('_')[0]
+    return next((sender for sender in BANK_SENDERS if bank in sender), BANK_SENDERS[0])
+
+
+def _vary(body: str, merchant: Optional[str], rng: random.Random, merchants: int) -> str:
+    """Give a template body a new amount and one of `merchants` merchant variants."""
+    body = AMOUNT_PATTERN.sub(f"{rng.uniform(10, 20000):.2f}", body, count=1)
+    if merchant and merchant in body:
+        variant = rng.randrange(merchants)
+        if '@' in merchant:
+            name, domain = merchant.split('@', 1)
+            replacement = f"{name}{variant}@{domain}"
+        else:
+            replacement = f"{merchant} {variant}"
+        body = body.replace(merchant, replacement, 1)
+    return body
+
+
+def _message(body: str, sender: str, date: datetime, message_id: str, html: bool, rng: random.Random) -> bytes:
+    """Build RFC822 bytes: plain text, HTML only, or both as alternatives."""
+    msg = EmailMessage()
+    msg['Subject'] = 'Transaction alert'
+    msg['From'] = sender
+    msg['Date'] = format_datetime(date)
+    msg['Message-ID'] = message_id
+    if not html:
+        msg.set_content(body)
+        return msg.as_bytes()
+
+    markup = f"<html><body><table><tr><td><p>{body}</p></td></tr></table></body></html>"
+    if rng.random() < 0.5:
+        msg.set_content(body)
+        msg.add_alternative(markup, subtype='html')
+    else:
+        msg.set_content(markup, subtype='html')
+        msg.make_mixed()
+    return msg.as_bytes()
+
+
+def synthetic_corpus(
+    size: int,
+    duplicate_rate: float = 0.1,
+    html_rate: float = 0.3,
+    merchants: int = 200,
+    seed: int = 7
+) -> List[bytes]:
+    """
+    Generate alert emails over the last day.
+
+    Duplicates are re-sent alerts: half repeat the Message-ID (dropped at
+    fetch), half are a second alert a minute later (dropped by dedup).
+
+    Args:
+        size: Number of emails
+        duplicate_rate: Fraction of emails that repeat an earlier one
+        html_rate: Fraction of emails with an HTML body
+        merchants: Distinct variants per template merchant
+        seed: Random seed
+
+    Returns:
+        RFC822 message bytes, in arrival order
+    """
+    rng = random.Random(seed)
+    templates = load_templates()
+    now = datetime.now().astimezone()
+    sent: List[Tuple[str, str, datetime, str, bool]] = []
+    corpus = []
+    for _ in range(size):
+        if sent and rng.random() < duplicate_rate:
+            body, sender, date, message_id, html = rng.choice(sent)
+            if rng.random() < 0.5:
+                message_id, date = make_msgid(domain='bench.example'), date + timedelta(minutes=1)
+        else:
+            name, body, merchant = rng.choice(templates)
+            body = _vary(body, merchant, rng, merchants)
+            sender = _sender(name)
+            date = now - timedelta(seconds=rng.uniform(0, 86400))
+            message_id = make_msgid(domain='bench.example')
+            html = rng.random() < html_rate
+            sent.append((body, sender, date, message_id, html))
+        corpus.append(_message(body, sender, date, message_id, html, rng))
+    return corpus
+
+
+def run_once(corpus: List[bytes], args: argparse.Namespace) -> Dict:
+    """
+    Run the full pipeline once over the corpus, in a scratch directory.
+
+    Args:
+        corpus: RFC822 messages
+        args: Parsed command-line arguments (latencies and pipeline mode)
+
+    Returns:
+        Throughput, counts and per-stage/per-component latency
+    """
+    codes = list(CATEGORY_CODES)
+
+    def respond(params: Dict) -> str:
+        time.sleep(args.llm_latency)
+        return codes[zlib.crc32(params['messages'][0]['content'].encode()) % len(codes)]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            # Exact percentiles from every span: clustered latencies share a bucket,
+            # and the p95 gate would otherwise compare bucket estimates
+            run_metrics.reset()
+            run_metrics.keep_samples = True
+            categorizer = TransactionCategorizer(
+                'bench-key', cache_file='cache.json', model_file='model.json', batch_file='batch.json'
+            )
+            categorizer.client = FakeAnthropic(respond)
+            categorizer.stats.llm_latency = LatencyHistogram(keep_samples=True)
+            pool = SheetsClientPool('{}')
+            pool.release(FakeSheetsService(latency=args.sheets_latency))
+            imap = FakeIMAP(corpus, latency=args.imap_latency, bandwidth=args.imap_bandwidth)
+            account = Account('bench', 'bench@example.com', 'secret', ['sheets'], spreadsheet_id='bench')
+            config = SimpleNamespace(
+                dedup_mode='bucket', dedup_tolerance_minutes=5, dedup_horizon_days=90,
+                defer_categorization=False, pipeline_mode=args.pipeline_mode
+            )
+            report: Dict = {}
+
+            started = time.perf_counter()
+            with mock.patch('src.email_fetcher.imaplib.IMAP4_SSL', return_value=imap):
+                run_account(account, config, report, TransactionParser(), categorizer, pool)
+            wall = time.perf_counter() - started
+        finally:
+            run_metrics.keep_samples = False
+            os.chdir(cwd)
+
+    stages = run_metrics.to_dict()['stages']
+    llm = categorizer.stats.llm_latency
+    components = {name: stages[name] for name in COMPONENTS if name in stages}
+    components['llm'] = {
+        'calls': llm.count, 'seconds': llm.sum,
+        'p50_seconds': llm.percentile(50), 'p95_seconds': llm.percentile(95), 'p99_seconds': llm.percentile(99)
+    }
+    return {
+        'emails': len(corpus),
+        'wall_seconds': wall,
+        'emails_per_second': len(corpus) / wall,
+        'counts': report['counts'],
+        'stages': {name: stages[name] for name in STAGES if name in stages},
+        'components': components
+    }
+
+
+def _ms(seconds: Optional[float]) -> str:
+    """Format seconds as milliseconds."""
+    return f"{seconds * 1000:9.2f}" if seconds is not None else f"{'-':>9}"
+
+
+def print_results(results: Dict) -> None:
+    """Print throughput and latency tables."""
+    counts = results['counts']
+    print(f"{results['emails']} emails in {results['wall_seconds']:.2f}s "
+          f"({results['emails_per_second']:,.0f} emails/s); parsed {counts.get('parsed', 0)}, "
+          f"unique {counts.get('unique', 0)}, written {counts.get('written', 0)}")
+    for title, rows in (('stage', results['stages']), ('component', results['components'])):
+        print()
+        print(f"{title:<16} {'calls':>7} {'items/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, row in rows.items():
+            rate = row.get('items_per_second')
+            rate = f"{rate:>11,.0f}" if rate else f"{'-':>11}"
+            print(f"{name:<16} {row['calls']:>7} {rate} {_ms(row['p50_seconds'])} "
+                  f"{_ms(row['p95_seconds'])} {_ms(row['p99_seconds'])}")
+
+
+def summarize(results: Dict) -> Dict:
+    """
+    Reduce results to the figures compared against a baseline.
+
+    Args:
+        results: Output of run_once()
+
+    Returns:
+        Throughput and p95 latency per stage and component
+    """
+    p95 = {name: row['p95_seconds'] for name, row in {**results['stages'], **results['components']}.items()
+           if row['p95_seconds'] is not None}
+    return {'emails_per_second': results['emails_per_second'], 'p95_seconds': p95}
+
+
+def regressions(current: Dict, baseline: Dict, tolerance: float, slack: float = 0.002) -> List[str]:
+    """
+    Compare a summary with its baseline.
+
+    Args:
+        current: summarize() of this run
+        baseline: Stored summary
+        tolerance: Allowed relative slowdown, e.g. 0.25
+        slack: Absolute p95 increase (seconds) always allowed, for tiny timings
+
+    Returns:
+        Human-readable regressions (empty if none)
+    """
+    found = []
+    floor = baseline['emails_per_second'] * (1 - tolerance)
+    if current['emails_per_second'] < floor:
+        found.append(f"throughput {current['emails_per_second']:,.0f} emails/s < {floor:,.0f}")
+    for name, limit in baseline['p95_seconds'].items():
+        value = current['p95_seconds'].get(name)
+        ceiling = limit * (1 + tolerance) + slack
+        if value is not None and value > ceiling:
+            found.append(f"{name} p95 {value * 1000:.2f} ms > {ceiling * 1000:.2f} ms")
+    return found
+
+
+def main() -> int:
+    """Run the benchmark, print tables and check the baseline."""
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--emails', type=int, default=1000)
+    arg_parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    arg_parser.add_argument('--html-rate', type=float, default=0.3)
+    arg_parser.add_argument('--merchants', type=int, default=200, help="Variants per template merchant")
+    arg_parser.add_argument('--pipeline-mode', choices=['batch', 'staged'], default='batch')
+    arg_parser.add_argument('--imap-latency', type=float, default=0.02, help="Seconds per IMAP command")
+    arg_parser.add_argument('--imap-bandwidth', type=float, default=5e6, help="Bytes per second")
+    arg_parser.add_argument('--llm-latency', type=float, default=0.005, help="Seconds per LLM call")
+    arg_parser.add_argument('--sheets-latency', type=float, default=0.05, help="Seconds per Sheets request")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--seed', type=int, default=7)
+    arg_parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    arg_parser.add_argument('--baseline', help="Baseline file to check against (or update)")
+    arg_parser.add_argument('--update-baseline', action='store_true')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative regression")
+    args = arg_parser.parse_args()
+
+    corpus = synthetic_corpus(args.emails, args.duplicate_rate, args.html_rate, args.merchants, args.seed)
+    runs = [run_once(corpus, args) for _ in range(args.repeat)]
+    results = max(runs, key=lambda run: run['emails_per_second'])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+    if not args.baseline:
+        return 0
+
+    scenario = f"{args.pipeline_mode}-{args.emails}"
+    path = Path(args.baseline)
+    baselines = json.loads(path.read_text()) if path.exists() else {}
+    if args.update_baseline:
+        baselines[scenario] = summarize(results)
+        path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f"\nBaseline '{scenario}' written to {path}")
+        return 0
+    if scenario not in baselines:
+        print(f"\nNo baseline for '{scenario}' in {path}")
+        return 0
+
+    found = regressions(summarize(results), baselines[scenario], args.tolerance)
+    print()
+    for message in found:
+        print(f"REGRESSION ({scenario}): {message}")
+    if not found:
+        print(f"Within {args.tolerance:.0%} of baseline '{scenario}'")
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    sys.exit(main())
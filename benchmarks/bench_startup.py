@@ -0,0 +1,101 @@
+"""Benchmark cold-start cost of the nightly entry point.
+
+Measures, in fresh interpreters, the `python -X importtime` cumulative import
+time of src.main and of the heavy client libraries, and the cost of building
+the Sheets service from the bundled discovery document versus discovery.build().
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import re
+import subprocess
+import sys
+from typing import List
+
+MODULES = ['src.main', 'anthropic', 'googleapiclient.discovery', 'google.oauth2.service_account']
+
+SERVICE_SNIPPETS = {
+    'build()': (
+        "from googleapiclient.discovery import build\n"
+        "s = build('sheets', 'v4', developerKey='x', static_discovery=True, cache_discovery=False)\n"
+    ),
+    'bundled': (
+        "from googleapiclient.discovery import build_from_document\n"
+        "from src.sheets_discovery import load_document\n"
+        "s = build_from_document(load_document(), developerKey='x')\n"
+    ),
+}
+
+# First resource access is where discovery docs are rendered
+SERVICE_TIMER = (
+    "import time\n"
+    "started = time.perf_counter()\n"
+    "{snippet}"
+    "s.spreadsheets().values()\n"
+    "print(time.perf_counter() - started)\n"
+)
+
+
+def import_time(module: str) -> float:
+    """
+    Cumulative import time of a module in a fresh interpreter.
+
+    Args:
+        module: Dotted module name
+
+    Returns:
+        Seconds, as reported by -X importtime
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    pattern = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| ' + re.escape(module) + r'$')
+    for line in result.stderr.splitlines():
+        match = pattern.search(line)
+        if match:
+            return int(match.group(1)) / 1e6
+    raise RuntimeError(f"No importtime entry for {module}")
+
+
+def service_time(snippet: str) -> float:
+    """
+    Time to import the client, build the Sheets service and touch a resource.
+
+    Args:
+        snippet: Code defining `s`
+
+    Returns:
+        Seconds
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', SERVICE_TIMER.format(snippet=snippet)],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+
+def best(samples: List[float]) -> str:
+    """Format the fastest sample in milliseconds."""
+    return f"{min(samples) * 1000:9.1f}"
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{'import':<32} {'best ms':>9}")
+    for module in MODULES:
+        print(f"{module:<32} {best([import_time(module) for _ in range(args.repeat)])}")
+
+    print()
+    print(f"{'sheets service':<32} {'best ms':>9}")
+    for name, snippet in SERVICE_SNIPPETS.items():
+        print(f"{name:<32} {best([service_time(snippet) for _ in range(args.repeat)])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Historical import: walk the mailbox in date windows, with resumable progress.
+
+`python -m src.main backfill --since 2023-01-01` splits the period into
+windows (a week by default) and streams each one through the usual pipeline,
+oldest first, over one IMAP connection. Each completed window is recorded in
+a progress file next to the backfill's own journal, so an interrupted
+backfill skips finished windows and resumes the one it stopped in.
+"""
+import copy
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .categorizer import TransactionCategorizer
+from .config import BACKFILL_STATE_DIR, BACKFILL_WINDOW_DAYS, Account, Config
+from .email_fetcher import EmailFetcher
+from .journal import RunJournal
+from .main import run_account
+from .parser import TransactionParser
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FILE = 'progress.json'
+
+
+def date_windows(since: date, until: date, days: int = BACKFILL_WINDOW_DAYS) -> List[Tuple[date, date]]:
+    """
+    Split a period into consecutive windows.
+
+    Args:
+        since: First day
+        until: Last day (inclusive)
+        days: Days per window
+
+    Returns:
+        (start, end) pairs, end exclusive; the last window may be shorter
+
+    Raises:
+        ValueError: If the period is empty or days is not positive
+    """
+    if days < 1:
+        raise ValueError(f"Window must be at least one day, got {days}")
+    if since > until:
+        raise ValueError(f"Backfill start {since} is after its end {until}")
+    windows = []
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=days), until + timedelta(days=1))
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as e.g. '1h 05m' or '42s'."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+class BackfillProgress:
+    """Completed windows of one account's backfill, saved after every window."""
+
+    def __init__(self, path: str, since: date, until: date, window_days: int):
+        """
+        Load progress, starting over if it was for a different period or window size.
+
+        Args:
+            path: Progress file
+            since: First day of the backfill
+            until: Last day of the backfill
+            window_days: Days per window
+        """
+        self.path = Path(path)
+        self.params = {'since': since.isoformat(), 'until': until.isoformat(), 'window_days': window_days}
+        self.state = self._read()
+        # Whether progress starts from scratch, in which case a leftover journal is stale
+        self.started_over = any(self.state.get(key) != value for key, value in self.params.items())
+        if self.started_over:
+            if self.state.get('completed'):
+                logger.warning(f"Backfill period or window size changed; starting over ({self.path})")
+            self.state = dict(self.params, completed=[], counts={'emails': 0, 'written': 0})
+
+    def _read(self) -> Dict:
+        """Load the progress file, or an empty state."""
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable backfill progress: {e}")
+            return {}
+
+    def _write(self) -> None:
+        """Save the progress file atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.state, indent=2))
+        os.replace(tmp_path, self.path)
+
+    def is_complete(self, window: Tuple[date, date]) -> bool:
+        """Whether a window was fully processed."""
+        return window[0].isoformat() in self.state['completed']
+
+    def complete(self, window: Tuple[date, date], counts: Dict) -> None:
+        """
+        Record a processed window.
+
+        Args:
+            window: (start, end) of the window
+            counts: Run counts of the window
+        """
+        self.state['completed'].append(window[0].isoformat())
+        for key in ('emails', 'written'):
+            self.state['counts'][key] += counts.get(key, 0)
+        self._write()
+
+    def to_dict(self) -> Dict:
+        """Progress for the run report."""
+        return dict(self.state, completed=len(self.state['completed']))
+
+
+def backfill_account(
+    account: Account,
+    config: Config,
+    parser: TransactionParser,
+    categorizer: TransactionCategorizer,
+    sheets_pool,
+    since: date,
+    until: date,
+    window_days: int = BACKFILL_WINDOW_DAYS
+) -> Dict:
+    """
+    Import one account's history, window by window.
+
+    Args:
+        account: Mailbox and destinations
+        config: Run configuration
+        parser: Transaction parser
+        categorizer: Categorizer
+        sheets_pool: SheetsClientPool, required if the account writes to Sheets
+        since: First day
+        until: Last day (inclusive)
+        window_days: Days per window
+
+    Returns:
+        Backfill progress and throughput for the report
+    """
+    state_dir = account.path(BACKFILL_STATE_DIR)
+    progress = BackfillProgress(os.path.join(state_dir, PROGRESS_FILE), since, until, window_days)
+    if progress.started_over:
+        RunJournal(state_dir).clear()
+    windows = date_windows(since, until, window_days)
+    pending = [window for window in windows if not progress.is_complete(window)]
+    logger.info(
+        f"Backfilling {account.name} from {since} to {until}: {len(windows)} windows of {window_days} days, "
+        f"{len(windows) - len(pending)} already done"
+    )
+
+    # Old transactions must stay in the dedup index until the backfill is over
+    config = copy.copy(config)
+    config.dedup_horizon_days = max(config.dedup_horizon_days, (date.today() - since).days + window_days + 1)
+
+    fetcher = EmailFetcher(account.email_address, account.email_password, account.imap_server, account.imap_port)
+    started = time.perf_counter()
+    emails = written = 0
+    try:
+        for done, window in enumerate(pending, start=1):
+            report: Dict = {'counts': {}}
+            # The LLM deadline and retry budget are per window, not for the whole backfill
+            categorizer.llm.reset()
+            # Resume picks up a window interrupted by an earlier backfill (its own journal).
+            # Pending rows are patched once, not re-read for every window
+            run_account(
+                account, config, report, parser, categorizer, sheets_pool, resume=True, fetcher=fetcher,
+                window=(datetime.combine(window[0], datetime.min.time()),
+                        datetime.combine(window[1], datetime.min.time())),
+                state_dir=state_dir, patch_pending=done == 1
+            )
+            progress.complete(window, report['counts'])
+            emails += report['counts'].get('emails', 0)
+            written += report['counts'].get('written', 0)
+
+            elapsed = time.perf_counter() - started
+            eta = elapsed / done * (len(pending) - done)
+            logger.info(
+                f"Backfill {account.name}: {window[0]} to {window[1] - timedelta(days=1)} done "
+                f"({report['counts'].get('emails', 0)} emails, {report['counts'].get('written', 0)} written) | "
+                f"{done}/{len(pending)} windows, {emails / elapsed:.1f} emails/s, "
+                f"{elapsed / done:.1f}s/window, ETA {format_duration(eta)}"
+            )
+    finally:
+        fetcher.disconnect()
+
+    elapsed = time.perf_counter() - started
+    return dict(
+        progress.to_dict(),
+        windows=len(windows),
+        seconds=round(elapsed, 3),
+        emails_per_second=round(emails / elapsed, 3) if elapsed and emails else None,
+        this_run={'windows': len(pending), 'emails': emails, 'written': written}
+    )
+
+
+def run_backfill(
+    config: Config,
+    parser: TransactionParser,
+    categorizer: TransactionCategorizer,
+    sheets_pool,
+    report: Dict,
+    since: date,
+    until: Optional[date] = None,
+    window_days: int = BACKFILL_WINDOW_DAYS
+) -> bool:
+    """
+    Backfill every configured account, one after another.
+
+    A failing account does not stop the others; its error is recorded in the report.
+
+    Args:
+        config: Run configuration
+        parser: Transaction parser
+        categorizer: Categorizer
+        sheets_pool: SheetsClientPool, if any account writes to Sheets
+        report: Run report, filled in with each account's backfill
+        since: First day
+        until: Last day, inclusive (default: today)
+        window_days: Days per window
+
+    Returns:
+        True if every account finished
+
+    Raises:
+        ValueError: If the period or window size is invalid
+    """
+    until = until or date.today()
+    date_windows(since, until, window_days)
+    report['backfill'] = {}
+    failed = []
+    for account in config.accounts:
+        try:
+            report['backfill'][account.name] = backfill_account(
+                account, config, parser, categorizer, sheets_pool, since, until, window_days
+            )
+        except Exception as e:
+            logger.error(f"Backfill of {account.name} failed: {e}", exc_info=True)
+            report['backfill'][account.name] = {'error': str(e)}
+            failed.append(account.name)
+    if failed:
+        report['error'] = f"Failed accounts: {', '.join(failed)}"
+        logger.error(f"{report['error']}; run the same command again to resume")
+    return not failed
@@ -0,0 +1,212 @@
+"""Versioned, size-bounded category cache with optional TTL."""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_SCHEMA_VERSION = 2
+
+
+class CategoryCache:
+    """
+    Merchant -> category cache persisted as compact JSON.
+
+    Each entry records the fingerprint of the categorization setup that
+    produced it (categories, model and prompt), when it was inserted and when
+    it was last hit. Entries with a different fingerprint or past their TTL
+    are treated as misses, so they get re-categorized lazily the next time the
+    merchant shows up. The cache is bounded by LRU eviction on save and load.
+    Access is locked, so accounts processed in parallel can share one cache.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fingerprint: str,
+        max_entries: int = 5000,
+        ttl_days: Optional[float] = None,
+        other_ttl_days: Optional[float] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize and load the cache.
+
+        Args:
+            path: Cache file path
+            fingerprint: Hash of the current categorization setup
+            max_entries: Maximum number of entries kept (LRU eviction)
+            ttl_days: Entry lifetime in days, or None for no expiry
+            other_ttl_days: Shorter lifetime for "Other" entries, or None
+            clock: Time source (seconds since epoch)
+        """
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.other_ttl = other_ttl_days * 86400 if other_ttl_days else None
+        self.clock = clock
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.load()
+
+    def _is_fresh(self, entry: Dict, now: float) -> bool:
+        """
+        Check whether an entry is still valid.
+
+        Args:
+            entry: Cache entry
+            now: Current time
+
+        Returns:
+            True if the entry can be served
+        """
+        if entry.get('h') != self.fingerprint:
+            return False
+        ttl = self.other_ttl if entry['c'] == "Other" and self.other_ttl else self.ttl
+        return ttl is None or now - entry['t'] < ttl
+
+    def load(self) -> None:
+        """Load entries from file, dropping stale ones and enforcing the size bound."""
+        with self._lock:
+            self.entries = {}
+            if not self.path.exists():
+                return
+
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load cache: {e}")
+                return
+
+            now = self.clock()
+            if isinstance(data, dict) and data.get('schema') == CACHE_SCHEMA_VERSION:
+                entries = data.get('entries', {})
+            else:
+                # Legacy flat {merchant: category} cache, produced by the current setup
+                entries = {
+                    key: {'c': category, 'h': self.fingerprint, 't': now, 'a': now}
+                    for key, category in data.items()
+                }
+                self.dirty = True
+
+            fresh = {key: entry for key, entry in entries.items() if self._is_fresh(entry, now)}
+            stale = len(entries) - len(fresh)
+            if stale:
+                logger.info(f"Dropped {stale} stale cache entries")
+                self.dirty = True
+
+            self.entries = fresh
+            self._evict()
+            logger.info(f"Loaded {len(self.entries)} cached categories")
+
+    def _evict(self) -> None:
+        """Evict least recently hit entries above the size bound."""
+        excess = len(self.entries) - self.max_entries
+        if excess <= 0:
+            return
+        by_last_hit = sorted(self.entries, key=lambda key: self.entries[key]['a'])
+        for key in by_last_hit[:excess]:
+            del self.entries[key]
+        self.dirty = True
+        logger.info(f"Evicted {excess} least recently used cache entries")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a category.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Category, or None on a miss or stale entry
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            now = self.clock()
+            if not self._is_fresh(entry, now):
+                del self.entries[key]
+                self.dirty = True
+                return None
+
+            entry['a'] = now
+            self.dirty = True
+            return entry['c']
+
+    def set(self, key: str, category: str) -> None:
+        """
+        Store a category.
+
+        Args:
+            key: Cache key
+            category: Category name
+        """
+        with self._lock:
+            now = self.clock()
+            self.entries[key] = {'c': category, 'h': self.fingerprint, 't': now, 'a': now}
+            self.dirty = True
+
+    def save(self) -> None:
+        """Write the cache to disk atomically if it changed."""
+        with self._lock:
+            if not self.dirty:
+                return
+            self._evict()
+            try:
+                tmp_path = self.path.with_name(self.path.name + '.tmp')
+                with open(tmp_path, 'w') as f:
+                    json.dump(
+                        {'schema': CACHE_SCHEMA_VERSION, 'entries': self.entries},
+                        f,
+                        separators=(',', ':')
+                    )
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+                logger.debug("Cache saved")
+            except Exception as e:
+                logger.warning(f"Failed to save cache: {e}")
+
+    @staticmethod
+    def read_labels(path: str) -> Dict[str, str]:
+        """
+        Read merchant -> category labels from a cache file, ignoring freshness.
+
+        Args:
+            path: Cache file path
+
+        Returns:
+            Mapping of cache key -> category
+        """
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get('schema') == CACHE_SCHEMA_VERSION:
+            return {key: entry['c'] for key, entry in data.get('entries', {}).items()}
+        return dict(data)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Iterate over (key, category) pairs."""
+        return ((key, entry['c']) for key, entry in self.entries.items())
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> str:
+        category = self.get(key)
+        if category is None:
+            raise KeyError(key)
+        return category
+
+    def __setitem__(self, key: str, category: str) -> None:
+        self.set(key, category)
+
+    def __len__(self) -> int:
+        return len(self.entries)
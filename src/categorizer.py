@@ -1,58 +1,149 @@
 """Transaction categorizer using rules and LLM fallback."""
+import hashlib
 import json
 import logging
-from typing import Dict, Optional
+import sys
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-
-from anthropic import Anthropic
-
-from .config import MERCHANT_RULES, CATEGORIES, LLM_MODEL, LLM_MAX_TOKENS, CACHE_FILE
+from typing import Dict, List, Optional, Tuple
+
+from .config import (
+    MERCHANT_RULES, CATEGORIES, LLM_MODEL, LLM_MAX_TOKENS, CACHE_FILE,
+    CACHE_MAX_ENTRIES, CACHE_TTL_DAYS, CACHE_OTHER_TTL_DAYS,
+    MODEL_FILE, CLASSIFIER_THRESHOLD, BATCH_JOB_FILE, PENDING_CATEGORY,
+    LLM_MAX_RETRIES, LLM_RETRY_BUDGET,
+    LLM_DEADLINE_SECONDS, LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN
+)
+from .cache import CategoryCache
+from .classifier import MerchantClassifier
+from .llm_client import CircuitBreaker, LLMUnavailableError, ResilientLLMClient
+from .metrics import CategorizerStats, run_metrics
 from .parser import Transaction
 
 logger = logging.getLogger(__name__)
 
+# Batch processing statuses that can still end with results
+BATCH_ACTIVE_STATUSES = ('in_progress', 'canceling')
 
-class TransactionCategorizer:
-    """Categorizes transactions using rules first, then LLM fallback."""
 
-    def __init__(self, api_key: str, cache_file: str = CACHE_FILE):
+def __getattr__(name: str):
+    """Resolve `Anthropic` on first use; the SDK takes over a second to import."""
+    if name == 'Anthropic':
+        from anthropic import Anthropic
+        return Anthropic
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _is_client_error(error: Exception) -> bool:
+    """Whether an API error is a 4xx response, i.e. retrying the same request cannot succeed."""
+    status = getattr(error, 'status_code', None)
+    return isinstance(status, int) and 400 <= status < 500
+
+
+def _category_code(index: int) -> str:
+    """Short reply code for the category at a given index (A, B, ...)."""
+    return chr(ord('A') + index) if index < 26 else f"C{index}"
+
+
+# Categories are addressed by short codes so replies are a single token
+CATEGORY_CODES: Dict[str, str] = {_category_code(i): category for i, category in enumerate(CATEGORIES)}
+
+# Static prefix: identical on every call so the API can serve it from the
+# prompt cache once it is long enough to be cacheable for the model
+SYSTEM_PROMPT = "\n".join([
+    "Categorize Indian bank transactions into exactly one category.",
+    "Categories:",
+    *(f"{code}={category}" for code, category in CATEGORY_CODES.items()),
+    "Reply with just the code."
+])
+
+# Per-transaction suffix
+USER_TEMPLATE = "{merchant} | ₹{amount} | {tx_type}"
+
+
+def setup_fingerprint() -> str:
+    """
+    Hash everything that determines an LLM answer.
+
+    Cache entries produced under a different fingerprint are stale.
+
+    Returns:
+        Short hex digest of categories, model and prompt
+    """
+    setup = json.dumps([CATEGORIES, LLM_MODEL, SYSTEM_PROMPT, USER_TEMPLATE])
+    return hashlib.sha256(setup.encode('utf-8')).hexdigest()[:12]
+
+
+class TransactionCategorizer:
+    """Categorizes transactions using rules, cache and offline model, then LLM fallback."""
+
+    def __init__(
+        self,
+        api_key: str,
+        cache_file: str = CACHE_FILE,
+        model_file: str = MODEL_FILE,
+        model_threshold: float = CLASSIFIER_THRESHOLD,
+        batch_file: str = BATCH_JOB_FILE
+    ):
         """
         Initialize categorizer.
 
         Args:
             api_key: Anthropic API key
             cache_file: Path to cache file
+            model_file: Path to offline classifier model (optional)
+            model_threshold: Minimum classifier confidence to skip the LLM
+            batch_file: Path where pending Message Batches jobs are recorded
         """
-        self.client = Anthropic(api_key=api_key)
-        self.cache_file = Path(cache_file)
-        self.cache: Dict[str, str] = self._load_cache()
-
-    def _load_cache(self) -> Dict[str, str]:
-        """
-        Load category cache from file.
-
-        Returns:
-            Cache dictionary
-        """
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    cache = json.load(f)
-                logger.info(f"Loaded {len(cache)} cached categories")
-                return cache
-            except Exception as e:
-                logger.warning(f"Failed to load cache: {e}")
-                return {}
-        return {}
+        # The SDK client is created on first LLM use (see `client`)
+        self.api_key = api_key
+        self._client = None
+        self.llm = ResilientLLMClient(
+            max_retries=LLM_MAX_RETRIES,
+            retry_budget=LLM_RETRY_BUDGET,
+            deadline=LLM_DEADLINE_SECONDS,
+            breaker=CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+        )
+        self.deferred: List[Transaction] = []
+        self.cache = CategoryCache(
+            cache_file,
+            setup_fingerprint(),
+            max_entries=CACHE_MAX_ENTRIES,
+            ttl_days=CACHE_TTL_DAYS,
+            other_ttl_days=CACHE_OTHER_TTL_DAYS
+        )
+        self.model = MerchantClassifier.load(model_file)
+        self.model_threshold = model_threshold
+        self.batch_file = Path(batch_file)
+        # Batch jobs are read, extended and saved as a whole; serialize accounts sharing them
+        self._batch_lock = threading.Lock()
+        self.stats = CategorizerStats()
+
+    @property
+    def client(self):
+        """Anthropic client, imported and constructed on first use."""
+        if self._client is None:
+            # Through the module attribute, so the lazy import above (or a patch) is used
+            anthropic_class = sys.modules[__name__].Anthropic
+            # Retries are handled by ResilientLLMClient, not the SDK
+            self._client = anthropic_class(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    def new_run(self) -> None:
+        """Clear per-run counters, deferred transactions and LLM limits, keeping caches and the client."""
+        self.deferred = []
+        self.stats = CategorizerStats()
+        self.llm.reset()
 
     def _save_cache(self) -> None:
         """Save category cache to file."""
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=2)
-            logger.debug("Cache saved")
-        except Exception as e:
-            logger.warning(f"Failed to save cache: {e}")
+        self.cache.save()
 
     def _get_cache_key(self, merchant: Optional[str]) -> str:
         """
@@ -92,121 +183,368 @@ class TransactionCategorizer:
 
         return None
 
-    def _llm_category(self, transaction: Transaction) -> str:
+    def _model_category(self, merchant: Optional[str]) -> Optional[str]:
         """
-        Categorize using Claude Haiku.
+        Attempt to categorize using the offline classifier.
+
+        Args:
+            merchant: Merchant name
+
+        Returns:
+            Category name if the model is confident enough, else None
+        """
+        if not self.model or not merchant:
+            return None
+
+        category, confidence = self.model.predict(merchant)
+        if category and confidence >= self.model_threshold:
+            logger.debug(f"Model match: '{merchant}' -> '{category}' ({confidence:.2f})")
+            return category
+
+        return None
+
+    def _build_params(self, transaction: Transaction) -> Dict:
+        """
+        Build Messages API parameters for a transaction.
 
         Args:
             transaction: Transaction object
 
         Returns:
-            Category name
+            Keyword arguments for messages.create
         """
-        merchant = transaction.merchant or "Unknown"
-        amount = transaction.amount
-        tx_type = transaction.tx_type.value
+        prompt = USER_TEMPLATE.format(
+            merchant=transaction.merchant or "Unknown",
+            amount=transaction.amount,
+            tx_type=transaction.tx_type.value
+        )
+        return {
+            'model': LLM_MODEL,
+            'max_tokens': LLM_MAX_TOKENS,
+            'system': [
+                {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ],
+            'messages': [
+                {"role": "user", "content": prompt}
+            ]
+        }
+
+    def _parse_category(self, text: str) -> str:
+        """
+        Validate an LLM reply.
 
-        # Build prompt
-        prompt = f"""Categorize this Indian transaction into exactly one category.
+        Args:
+            text: Raw reply text
 
-Categories: {', '.join(CATEGORIES)}
+        Returns:
+            Category name, or "Other" if the reply is not a known code or category
+        """
+        category = text.strip()
+        category = CATEGORY_CODES.get(category.upper(), category)
+        if category not in CATEGORIES:
+            logger.warning(f"LLM returned invalid category '{category}', using 'Other'")
+            self.stats.count_error('invalid_reply')
+            category = "Other"
+        return category
+
+    def _llm_category(self, transaction: Transaction) -> str:
+        """
+        Categorize using Claude Haiku.
+
+        Args:
+            transaction: Transaction object
 
-Transaction: "{merchant}", ₹{amount}, {tx_type}
+        Returns:
+            Category name
 
-Reply with just the category name."""
+        Raises:
+            LLMUnavailableError: If the API is unreachable (transient failure)
+        """
+        merchant = transaction.merchant or "Unknown"
 
         try:
             logger.debug(f"Calling LLM for: {merchant}")
-            response = self.client.messages.create(
-                model=LLM_MODEL,
-                max_tokens=LLM_MAX_TOKENS,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            # Extract category from response
-            category = response.content[0].text.strip()
-
-            # Validate category
-            if category not in CATEGORIES:
-                logger.warning(f"LLM returned invalid category '{category}', using 'Other'")
-                category = "Other"
+            started = time.perf_counter()
+            response = self.llm.call(self.client.messages.create, **self._build_params(transaction))
+            self.stats.record_call(time.perf_counter() - started, response.usage)
+
+            # Extract and validate category from response
+            category = self._parse_category(response.content[0].text)
 
             logger.debug(f"LLM categorized '{merchant}' as '{category}'")
             return category
 
+        except LLMUnavailableError:
+            self.stats.count_error('unavailable')
+            raise
         except Exception as e:
             logger.error(f"LLM API error: {e}")
+            self.stats.count_error('api_error')
             return "Other"
 
-    def categorize(self, transaction: Transaction) -> str:
+    def _offline_category(self, transaction: Transaction) -> Tuple[Optional[str], Optional[str]]:
         """
-        Categorize a transaction.
+        Categorize without calling the LLM.
+
+        Tries credit heuristics, rules, the cache and the offline classifier.
 
         Args:
             transaction: Transaction object
 
         Returns:
-            Category name
+            Tuple of (category, tier that answered), or (None, None) if the LLM is needed
         """
         # Special handling for credits
         if transaction.tx_type.value == "Credit":
             # Check if it's a salary (large amount)
             if transaction.amount >= 50000:
-                return "Salary"
+                return "Salary", 'credit_heuristic'
             # Check if it's from a known source
             if transaction.merchant:
                 merchant_lower = transaction.merchant.lower()
                 if any(kw in merchant_lower for kw in ['salary', 'payroll', 'employer']):
-                    return "Salary"
+                    return "Salary", 'credit_heuristic'
                 elif any(kw in merchant_lower for kw in ['refund', 'return']):
                     # Use the merchant's category if known, else Other
                     rule_category = self._rule_based_category(transaction.merchant)
-                    return rule_category if rule_category else "Other"
+                    return rule_category if rule_category else "Other", 'credit_heuristic'
 
         # Try rule-based first
         category = self._rule_based_category(transaction.merchant)
         if category:
-            return category
+            return category, 'rule'
 
         # Check cache
-        cache_key = self._get_cache_key(transaction.merchant)
-        if cache_key in self.cache:
+        cached = self.cache.get(self._get_cache_key(transaction.merchant))
+        if cached:
             logger.debug(f"Cache hit for '{transaction.merchant}'")
-            return self.cache[cache_key]
+            return cached, 'cache'
+
+        # Offline classifier (not cached, so retraining can improve answers)
+        category = self._model_category(transaction.merchant)
+        if category:
+            return category, 'model'
+
+        return None, None
+
+    def categorize(self, transaction: Transaction, defer: bool = False) -> str:
+        """
+        Categorize a transaction.
+
+        Args:
+            transaction: Transaction object
+            defer: Return PENDING_CATEGORY instead of calling the LLM
+
+        Returns:
+            Category name, or PENDING_CATEGORY if deferred
+        """
+        category, tier = self._offline_category(transaction)
+        if category:
+            self.stats.count_tier(tier)
+            return category
 
-        # Fallback to LLM
-        category = self._llm_category(transaction)
+        if defer:
+            self.stats.count_tier('deferred')
+            return PENDING_CATEGORY
+
+        # Fallback to LLM; if it is unavailable, defer rather than cache a guess
+        try:
+            category = self._llm_category(transaction)
+        except LLMUnavailableError as e:
+            logger.warning(f"Deferring categorization of '{transaction.merchant}': {e}")
+            self.deferred.append(transaction)
+            self.stats.count_tier('deferred')
+            return PENDING_CATEGORY
+        self.stats.count_tier('llm')
 
         # Update cache
-        self.cache[cache_key] = category
+        self.cache.set(self._get_cache_key(transaction.merchant), category)
         self._save_cache()
 
         return category
 
-    def categorize_batch(self, transactions: list[Transaction]) -> list[Dict]:
+    def categorize_batch(self, transactions: list[Transaction], defer: bool = False) -> list[Dict]:
         """
         Categorize multiple transactions.
 
         Args:
             transactions: List of Transaction objects
+            defer: Mark transactions that need the LLM as PENDING_CATEGORY
+                (see submit_batch and resolve_pending)
 
         Returns:
             List of transaction dictionaries with categories
         """
         categorized = []
-        for tx in transactions:
-            category = self.categorize(tx)
-            categorized.append({
-                'date': tx.date,
-                'amount': tx.amount,
-                'tx_type': tx.tx_type.value,
-                'mode': tx.mode.value,
-                'merchant': tx.merchant,
-                'category': category,
-                'raw_text': tx.raw_text
-            })
-
+        with run_metrics.span('categorize', len(transactions)):
+            for tx in transactions:
+                category = self.categorize(tx, defer=defer)
+                categorized.append({
+                    'date': tx.date,
+                    'amount': tx.amount,
+                    'tx_type': tx.tx_type.value,
+                    'mode': tx.mode.value,
+                    'merchant': tx.merchant,
+                    'category': category,
+                    'raw_text': tx.raw_text
+                })
+
+        # Cache hits refresh last-hit times, which LRU eviction relies on
+        self._save_cache()
         logger.info(f"Categorized {len(categorized)} transactions")
         return categorized
+
+    def _load_batch_jobs(self) -> List[Dict]:
+        """
+        Load pending batch jobs.
+
+        Returns:
+            List of job records
+        """
+        if not self.batch_file.exists():
+            return []
+        try:
+            with open(self.batch_file, 'r') as f:
+                return json.load(f).get('jobs', [])
+        except Exception as e:
+            logger.warning(f"Failed to load batch jobs: {e}")
+            return []
+
+    def _save_batch_jobs(self, jobs: List[Dict]) -> None:
+        """
+        Persist pending batch jobs.
+
+        Args:
+            jobs: List of job records
+        """
+        if not jobs:
+            self.batch_file.unlink(missing_ok=True)
+            return
+        with open(self.batch_file, 'w') as f:
+            json.dump({'jobs': jobs}, f, indent=2)
+
+    def submit_batch(self, transactions: list[Transaction]) -> Optional[str]:
+        """
+        Submit every merchant that needs the LLM as one Message Batches job.
+
+        Merchants already covered offline or by a pending job are skipped.
+        The job ID is persisted so a later run can collect the results.
+
+        Args:
+            transactions: List of Transaction objects
+
+        Returns:
+            Batch ID, or None if nothing needed submitting
+        """
+        with self._batch_lock:
+            jobs = self._load_batch_jobs()
+            in_flight = {key for job in jobs for key in job['keys'].values()}
+
+            requests = []
+            keys: Dict[str, str] = {}
+            for tx in transactions:
+                cache_key = self._get_cache_key(tx.merchant)
+                if cache_key in in_flight or self._offline_category(tx)[0]:
+                    continue
+                in_flight.add(cache_key)
+                # custom_id must match ^[a-zA-Z0-9_-]{1,64}$, merchant names don't
+                custom_id = f"m{len(requests)}"
+                keys[custom_id] = cache_key
+                requests.append({'custom_id': custom_id, 'params': self._build_params(tx)})
+
+            if not requests:
+                logger.info("No merchants need batch categorization")
+                return None
+
+            batch = self.llm.call(self.client.messages.batches.create, requests=requests)
+            jobs.append({
+                'id': batch.id,
+                'submitted_at': datetime.now().isoformat(),
+                'keys': keys
+            })
+            self._save_batch_jobs(jobs)
+
+            logger.info(f"Submitted batch {batch.id} with {len(requests)} merchants")
+            return batch.id
+
+    def poll_batches(self, wait: bool = False, poll_interval: float = 60.0) -> int:
+        """
+        Collect results of finished batch jobs into the cache.
+
+        Args:
+            wait: Block until every pending job has ended
+            poll_interval: Seconds between status checks when waiting
+
+        Returns:
+            Number of cache entries filled
+        """
+        with self._batch_lock:
+            jobs = self._load_batch_jobs()
+            filled = 0
+
+            while jobs:
+                remaining = []
+                for job in jobs:
+                    try:
+                        batch = self.llm.call(self.client.messages.batches.retrieve, job['id'])
+                        if batch.processing_status in BATCH_ACTIVE_STATUSES:
+                            remaining.append(job)
+                            continue
+                        if batch.processing_status != 'ended':
+                            logger.warning(f"Dropping batch {job['id']} ({batch.processing_status})")
+                            continue
+                        entries = list(self.llm.call(self.client.messages.batches.results, job['id']))
+                    except LLMUnavailableError:
+                        raise
+                    except Exception as e:
+                        if not _is_client_error(e):
+                            raise
+                        # Unknown to the API (results expired, key of another
+                        # workspace): its rows stay pending and are resubmitted
+                        logger.warning(f"Dropping batch {job['id']}: {e}")
+                        continue
+
+                    for entry in entries:
+                        cache_key = job['keys'].get(entry.custom_id)
+                        # Errored or expired requests are resubmitted by a later run
+                        if cache_key is None or entry.result.type != 'succeeded':
+                            continue
+                        self.stats.record_batch_result(entry.result.message.usage)
+                        category = self._parse_category(entry.result.message.content[0].text)
+                        self.cache.set(cache_key, category)
+                        filled += 1
+
+                    logger.info(f"Batch {job['id']} ended")
+
+                self._save_batch_jobs(remaining)
+                jobs = remaining
+                if not wait or not jobs:
+                    break
+                time.sleep(poll_interval)
+
+            if filled:
+                self._save_cache()
+                logger.info(f"Filled {filled} cache entries from batch results")
+            return filled
+
+    def resolve_pending(self, rows: list[Dict]) -> int:
+        """
+        Replace PENDING_CATEGORY on categorized rows without calling the LLM.
+
+        Uses the cache (filled by poll_batches) and then the offline classifier.
+
+        Args:
+            rows: Transaction dictionaries from categorize_batch (updated in place)
+
+        Returns:
+            Number of rows resolved
+        """
+        resolved = 0
+        for row in rows:
+            if row['category'] != PENDING_CATEGORY:
+                continue
+            category = self.cache.get(self._get_cache_key(row['merchant'])) or self._model_category(row['merchant'])
+            if category:
+                row['category'] = category
+                resolved += 1
+        return resolved
@@ -0,0 +1,341 @@
+"""Offline merchant classifier trained from cached LLM labels and merchant rules.
+
+Character n-gram TF-IDF vectors with a nearest-centroid decision rule. The
+model is pure Python, small enough to persist as JSON, and is consulted before
+falling back to the LLM.
+
+Usage:
+    python -m src.classifier train      # Train from cache + rules, write model
+    python -m src.classifier evaluate   # Hold-out accuracy and LLM calls avoided
+"""
+import argparse
+import json
+import logging
+import math
+import re
+import sys
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import CategoryCache
+from .config import MERCHANT_RULES, CACHE_FILE, MODEL_FILE, CLASSIFIER_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION = 1
+
+# Categories the LLM uses as a fallback rather than a real label; training on
+# them would teach the model to be confident about "we don't know".
+EXCLUDED_LABELS = {"Other"}
+
+
+class MerchantClassifier:
+    """Character n-gram TF-IDF nearest-centroid classifier for merchant names."""
+
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (2, 4),
+        temperature: float = 0.05,
+        max_features_per_class: int = 400
+    ):
+        """
+        Initialize an untrained classifier.
+
+        Args:
+            ngram_range: Inclusive (min, max) character n-gram lengths
+            temperature: Softmax temperature applied to centroid similarities
+            max_features_per_class: Centroid weights kept per category
+        """
+        self.ngram_range = ngram_range
+        self.temperature = temperature
+        self.max_features_per_class = max_features_per_class
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _normalize(merchant: str) -> str:
+        """
+        Normalize merchant name before n-gram extraction.
+
+        Args:
+            merchant: Raw merchant name
+
+        Returns:
+            Lowercased, punctuation-free name padded with spaces
+        """
+        text = re.sub(r'[^a-z0-9]+', ' ', merchant.lower()).strip()
+        return f" {text} "
+
+    def _ngrams(self, merchant: str) -> Counter:
+        """
+        Count character n-grams of a merchant name.
+
+        Args:
+            merchant: Merchant name
+
+        Returns:
+            Counter of n-gram -> occurrences
+        """
+        text = self._normalize(merchant)
+        low, high = self.ngram_range
+        grams = Counter()
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                grams[text[i:i + n]] += 1
+        return grams
+
+    def _vectorize(self, merchant: str) -> Dict[str, float]:
+        """
+        Build an L2-normalized TF-IDF vector, ignoring unseen n-grams.
+
+        Args:
+            merchant: Merchant name
+
+        Returns:
+            Sparse vector as a dict
+        """
+        vector = {
+            gram: (1.0 + math.log(count)) * self.idf[gram]
+            for gram, count in self._ngrams(merchant).items()
+            if gram in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm == 0:
+            return {}
+        return {gram: w / norm for gram, w in vector.items()}
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> 'MerchantClassifier':
+        """
+        Train the classifier.
+
+        Args:
+            samples: Iterable of (merchant, category) pairs
+
+        Returns:
+            self
+        """
+        samples = [(m, c) for m, c in samples if m and c and c not in EXCLUDED_LABELS]
+        if not samples:
+            raise ValueError("No training samples")
+
+        # Document frequencies
+        doc_freq = Counter()
+        sample_grams = []
+        for merchant, category in samples:
+            grams = self._ngrams(merchant)
+            sample_grams.append((grams, category))
+            doc_freq.update(grams.keys())
+
+        total = len(samples)
+        self.idf = {
+            gram: math.log((1 + total) / (1 + df)) + 1.0
+            for gram, df in doc_freq.items()
+        }
+
+        # Sum normalized vectors per category
+        sums: Dict[str, Dict[str, float]] = {}
+        for grams, category in sample_grams:
+            vector = {gram: (1.0 + math.log(count)) * self.idf[gram] for gram, count in grams.items()}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            centroid = sums.setdefault(category, {})
+            for gram, w in vector.items():
+                centroid[gram] = centroid.get(gram, 0.0) + w / norm
+
+        # Prune to the strongest features and re-normalize
+        self.centroids = {}
+        for category, centroid in sums.items():
+            top = sorted(centroid.items(), key=lambda kv: kv[1], reverse=True)
+            top = top[:self.max_features_per_class]
+            norm = math.sqrt(sum(w * w for _, w in top)) or 1.0
+            self.centroids[category] = {gram: w / norm for gram, w in top}
+
+        # Only keep IDF entries a centroid can actually use
+        used = set()
+        for centroid in self.centroids.values():
+            used.update(centroid)
+        self.idf = {gram: w for gram, w in self.idf.items() if gram in used}
+
+        logger.info(f"Trained classifier on {total} samples, {len(self.centroids)} categories")
+        return self
+
+    def predict(self, merchant: Optional[str]) -> Tuple[Optional[str], float]:
+        """
+        Predict a category for a merchant name.
+
+        Args:
+            merchant: Merchant name
+
+        Returns:
+            Tuple of (category or None, confidence in [0, 1])
+        """
+        if not merchant or not self.centroids:
+            return None, 0.0
+
+        vector = self._vectorize(merchant)
+        if not vector:
+            return None, 0.0
+
+        scores = {
+            category: sum(w * centroid.get(gram, 0.0) for gram, w in vector.items())
+            for category, centroid in self.centroids.items()
+        }
+        best = max(scores, key=scores.get)
+
+        # Softmax over similarities; shifted by the max for numerical stability
+        top = scores[best]
+        exp_sum = sum(math.exp((s - top) / self.temperature) for s in scores.values())
+        return best, 1.0 / exp_sum
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize the model to a compact dictionary.
+
+        Returns:
+            JSON-serializable model
+        """
+        return {
+            'version': MODEL_VERSION,
+            'ngram_range': list(self.ngram_range),
+            'temperature': self.temperature,
+            'idf': {gram: round(w, 4) for gram, w in self.idf.items()},
+            'centroids': {
+                category: {gram: round(w, 4) for gram, w in centroid.items()}
+                for category, centroid in self.centroids.items()
+            }
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Persist the model as compact JSON.
+
+        Args:
+            path: Output file path
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        logger.info(f"Saved classifier model to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> Optional['MerchantClassifier']:
+        """
+        Load a persisted model.
+
+        Args:
+            path: Model file path
+
+        Returns:
+            MerchantClassifier, or None if the file is missing or unreadable
+        """
+        model_path = Path(path)
+        if not model_path.exists():
+            return None
+        try:
+            with open(model_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != MODEL_VERSION:
+                logger.warning(f"Ignoring classifier model with version {data.get('version')}")
+                return None
+            model = cls(ngram_range=tuple(data['ngram_range']), temperature=data['temperature'])
+            model.idf = data['idf']
+            model.centroids = data['centroids']
+            logger.info(f"Loaded classifier model with {len(model.centroids)} categories")
+            return model
+        except Exception as e:
+            logger.warning(f"Failed to load classifier model: {e}")
+            return None
+
+
+def training_samples(cache: Dict[str, str]) -> List[Tuple[str, str]]:
+    """
+    Build training samples from merchant rules and cached LLM labels.
+
+    Args:
+        cache: Mapping (or CategoryCache) of merchant cache key -> category
+
+    Returns:
+        List of (merchant, category) pairs
+    """
+    samples = list(MERCHANT_RULES.items())
+    samples.extend((key, category) for key, category in cache.items() if key != "unknown")
+    return samples
+
+
+def evaluate(
+    cache: Dict[str, str],
+    threshold: float = CLASSIFIER_THRESHOLD,
+    test_fraction: float = 0.2
+) -> Dict:
+    """
+    Evaluate the classifier on a deterministic hold-out split of the cache.
+
+    Args:
+        cache: Mapping of merchant cache key -> category
+        threshold: Confidence threshold for answering without the LLM
+        test_fraction: Fraction of cache entries held out for testing
+
+    Returns:
+        Dictionary of evaluation metrics
+    """
+    buckets = 1000
+    cutoff = int(test_fraction * buckets)
+    train, test = {}, {}
+    for key, category in cache.items():
+        # Stable split so repeated evaluations are comparable
+        if zlib.crc32(key.encode('utf-8')) % buckets < cutoff:
+            test[key] = category
+        else:
+            train[key] = category
+
+    if not test:
+        raise ValueError("Not enough cached labels to evaluate")
+
+    model = MerchantClassifier().fit(training_samples(train))
+
+    correct = answered = answered_correct = 0
+    for merchant, expected in test.items():
+        predicted, confidence = model.predict(merchant)
+        if predicted == expected:
+            correct += 1
+        if predicted and confidence >= threshold:
+            answered += 1
+            if predicted == expected:
+                answered_correct += 1
+
+    return {
+        'train_size': len(train),
+        'test_size': len(test),
+        'threshold': threshold,
+        'accuracy': correct / len(test),
+        'llm_calls_avoided': answered,
+        'llm_calls_avoided_pct': answered / len(test),
+        'accuracy_when_confident': answered_correct / answered if answered else 0.0
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point for training and evaluation."""
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    arg_parser = argparse.ArgumentParser(description="Train or evaluate the offline merchant classifier")
+    arg_parser.add_argument('command', choices=['train', 'evaluate'])
+    arg_parser.add_argument('--cache', default=CACHE_FILE, help="Category cache file")
+    arg_parser.add_argument('--model', default=MODEL_FILE, help="Model output file")
+    arg_parser.add_argument('--threshold', type=float, default=CLASSIFIER_THRESHOLD)
+    arg_parser.add_argument('--test-fraction', type=float, default=0.2)
+    args = arg_parser.parse_args(argv)
+
+    cache = CategoryCache.read_labels(args.cache) if Path(args.cache).exists() else {}
+
+    if args.command == 'train':
+        MerchantClassifier().fit(training_samples(cache)).save(args.model)
+        return 0
+
+    results = evaluate(cache, args.threshold, args.test_fraction)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
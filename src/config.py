@@ -1,7 +1,11 @@
 """Configuration and constants for Gringotts expense tracker."""
+import json
 import os
+import re
+from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional
 
 
 class TxType(Enum):
@@ -181,26 +185,250 @@ IMAP_PORT = 993
 
 # LLM configuration
 LLM_MODEL = 'claude-haiku-4-5-20251001'
-LLM_MAX_TOKENS = 20
+LLM_MAX_TOKENS = 5  # Replies are a single category code
+
+# USD per million tokens for LLM_MODEL, used for per-run cost estimates
+LLM_PRICE_PER_MTOK: Dict[str, float] = {
+    'input': 1.00,
+    'output': 5.00,
+    'cache_read': 0.10,
+    'cache_write': 1.25,
+}
+LLM_BATCH_DISCOUNT = 0.5  # Message Batches are billed at half price
+
+# LLM call resilience
+LLM_MAX_RETRIES = 3           # Retries per call on 429/5xx/connection errors
+LLM_RETRY_BUDGET = 20         # Total retries per run
+LLM_DEADLINE_SECONDS = 300    # No LLM calls after this long into the run
+LLM_BREAKER_THRESHOLD = 5     # Consecutive failed calls before the breaker opens
+LLM_BREAKER_COOLDOWN = 60     # Seconds before the breaker allows a trial call
+
+# Google Sheets writes
+SHEETS_MAX_ROWS_PER_REQUEST = 5000  # Rows per values().batchUpdate request
+SHEETS_WRITES_PER_MINUTE = 60       # Per-user write quota
+SHEETS_MAX_RETRIES = 5              # Retries per request on 429/5xx
+
+# Transaction sinks: comma-separated 'sheets', 'sqlite', 'csv', 'parquet'
+SINKS = 'sheets'
+SQLITE_LEDGER_FILE = 'ledger.sqlite'
+CSV_LEDGER_FILE = 'transactions.csv'
+PARQUET_LEDGER_FILE = 'transactions.parquet'  # Requires pyarrow
+
+# Pipeline: 'batch' runs each stage over everything in turn, 'staged' runs
+# stages concurrently on chunks connected by bounded queues
+PIPELINE_MODE = 'batch'
+PIPELINE_MODES = ('batch', 'staged')
+PIPELINE_QUEUE_SIZE = 4      # Chunks waiting between two stages
+PIPELINE_WRITE_BATCH = 500   # Rows per sink write in staged mode
+
+# Multi-account runs: ACCOUNTS_FILE (JSON or TOML) lists the mailboxes; they
+# are processed concurrently and share the category cache and Sheets clients
+ACCOUNT_WORKERS = 4            # Accounts processed at the same time
+# Below ACCOUNT_WORKERS, so some accounts fetch and parse while others use the clients
+CLIENT_CONCURRENCY = 2         # Concurrent categorize/write calls into shared clients, across accounts
+DEFAULT_ACCOUNT = 'default'    # Name of the account configured by environment variables
+
+# Machine-readable summary of each run
+RUN_REPORT_FILE = 'run_report.json'
+# Per-stage timings and API counters of the same run, in OpenMetrics text format
+METRICS_FILE = 'run_metrics.prom'
+
+# --profile: per-stage pstats, collapsed stacks and memory peaks
+PROFILE_DIR = 'profile'
+PROFILE_TOP = 15                # Hot functions logged per stage
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+
+# serve: stay resident and run on a schedule
+SERVE_INTERVAL_SECONDS = 3600   # Default time between run starts
+
+# In-run deduplication: 'bucket' (same clock hour) or 'sweep' (+/- tolerance)
+DEDUP_MODE = 'bucket'
+DEDUP_TOLERANCE_MINUTES = 5
+
+# Fingerprints of written transactions, for cross-run deduplication
+DEDUP_INDEX_FILE = '.dedup_index.sqlite'
+DEDUP_HORIZON_DAYS = 90  # Must exceed the fetch window
+
+# Per-stage output of the current run, for --resume after a failure
+STATE_DIR = '.gringotts_state'
+
+# backfill: historical import in date windows, with its own journal and progress file
+BACKFILL_STATE_DIR = '.gringotts_backfill'
+BACKFILL_WINDOW_DAYS = 7
 
 # Cache file for categorization
 CACHE_FILE = '.category_cache.json'
+CACHE_MAX_ENTRIES = 5000      # LRU bound on cached merchants
+CACHE_TTL_DAYS = None         # Optional lifetime of cached categories
+CACHE_OTHER_TTL_DAYS = 7      # "Other" is often a fallback, so retry it sooner
+
+# Pending Message Batches jobs for backfill categorization
+BATCH_JOB_FILE = '.category_batch.json'
+
+# Placeholder category for rows waiting on the LLM (never cached)
+PENDING_CATEGORY = "Pending"
+
+# Deferred categorization: write rows straight away, patch pending categories
+# from batch results or the offline tiers on a later run
+DEFER_CATEGORIZATION = False
+PENDING_LOOKBACK_MONTHS = 2  # Monthly tabs scanned for pending rows when no dedup index records them
+
+# Offline classifier consulted before the LLM
+MODEL_FILE = '.category_model.json'
+CLASSIFIER_THRESHOLD = 0.7  # Minimum confidence to skip the LLM
+
+
+@dataclass
+class Account:
+    """One mailbox and the destinations its transactions are written to."""
+    name: str
+    email_address: str
+    email_password: str
+    sinks: List[str]
+    spreadsheet_id: Optional[str] = None
+    imap_server: str = IMAP_SERVER
+    imap_port: int = IMAP_PORT
+
+    def path(self, default: str) -> str:
+        """
+        Per-account variant of a state or ledger path.
+
+        Args:
+            default: Path used by the default account, e.g. '.dedup_index.sqlite'
+
+        Returns:
+            The default path for the default account, otherwise the path with
+            the account name before the suffix ('.dedup_index.home.sqlite')
+        """
+        if self.name == DEFAULT_ACCOUNT:
+            return default
+        path = Path(default)
+        return str(path.with_name(f"{path.stem}.{self.name}{path.suffix}"))
+
+
+def _split_sinks(value) -> List[str]:
+    """Sink names from a comma-separated string or a list."""
+    names = value.split(',') if isinstance(value, str) else value
+    return [name.strip() for name in names if name.strip()]
+
+
+def load_accounts(path: str, default_sinks: List[str]) -> List[Account]:
+    """
+    Read accounts from a JSON or TOML file.
+
+    The file holds a list of account tables under `accounts`. Each needs
+    `name`, `email_address` and `email_password` (or `email_password_env`,
+    the environment variable holding it), plus `spreadsheet_id` when writing
+    to Sheets; `sinks`, `imap_server` and `imap_port` are optional.
+
+    Args:
+        path: Accounts file (.json or .toml)
+        default_sinks: Sinks of accounts that do not list their own
+
+    Returns:
+        Accounts in file order
+
+    Raises:
+        ValueError: If the file is missing, unreadable or malformed, or an account is incomplete
+    """
+    try:
+        text = Path(path).read_text()
+    except OSError as e:
+        raise ValueError(f"Cannot read accounts file {path}: {e}") from e
+    try:
+        if path.endswith('.toml'):
+            import tomllib
+            data = tomllib.loads(text)
+        else:
+            data = json.loads(text)
+    except ImportError as e:
+        raise ValueError("TOML accounts files need Python 3.11+; use JSON instead") from e
+    except Exception as e:
+        raise ValueError(f"Cannot parse accounts file {path}: {e}") from e
+
+    entries = data.get('accounts') if isinstance(data, dict) else data
+    if not entries:
+        raise ValueError(f"No accounts in {path}")
+
+    accounts = []
+    for entry in entries:
+        name = entry.get('name', '')
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', name):
+            raise ValueError(f"Invalid account name {name!r} (use letters, digits, '-' and '_')")
+        if any(account.name == name for account in accounts):
+            raise ValueError(f"Duplicate account name: {name}")
+
+        password = entry.get('email_password')
+        if not password and entry.get('email_password_env'):
+            password = os.getenv(entry['email_password_env'])
+        if not entry.get('email_address') or not password:
+            raise ValueError(f"Account {name} needs email_address and email_password")
+
+        account = Account(
+            name=name,
+            email_address=entry['email_address'],
+            email_password=password,
+            sinks=_split_sinks(entry.get('sinks', default_sinks)),
+            spreadsheet_id=entry.get('spreadsheet_id'),
+            imap_server=entry.get('imap_server', IMAP_SERVER),
+            imap_port=int(entry.get('imap_port', IMAP_PORT))
+        )
+        if 'sheets' in account.sinks and not account.spreadsheet_id:
+            raise ValueError(f"Account {name} writes to Sheets but has no spreadsheet_id")
+        accounts.append(account)
+    return accounts
 
 
 class Config:
-    """Configuration loaded from environment variables."""
+    """Configuration loaded from environment variables (and ACCOUNTS_FILE, if set)."""
 
     def __init__(self):
         """Load configuration from environment variables with validation."""
-        self.email_address = self._get_required_env('EMAIL_ADDRESS')
-        self.email_password = self._get_required_env('EMAIL_PASSWORD')
         self.anthropic_api_key = self._get_required_env('ANTHROPIC_API_KEY')
-        self.google_service_account = self._get_required_env('GOOGLE_SERVICE_ACCOUNT')
-        self.spreadsheet_id = self._get_required_env('SPREADSHEET_ID')
-
-        # Optional configuration
+        self.sinks = _split_sinks(os.getenv('SINKS', SINKS))
         self.imap_server = os.getenv('IMAP_SERVER', IMAP_SERVER)
         self.imap_port = int(os.getenv('IMAP_PORT', str(IMAP_PORT)))
+        self.account_workers = int(os.getenv('ACCOUNT_WORKERS', str(ACCOUNT_WORKERS)))
+        self.client_concurrency = int(os.getenv('CLIENT_CONCURRENCY', str(CLIENT_CONCURRENCY)))
+
+        accounts_file = os.getenv('ACCOUNTS_FILE')
+        if accounts_file:
+            self.accounts = load_accounts(accounts_file, self.sinks)
+            self.email_address = self.email_password = self.spreadsheet_id = None
+        else:
+            self.email_address = self._get_required_env('EMAIL_ADDRESS')
+            self.email_password = self._get_required_env('EMAIL_PASSWORD')
+            self.spreadsheet_id = os.getenv('SPREADSHEET_ID')
+            if 'sheets' in self.sinks:
+                self.spreadsheet_id = self._get_required_env('SPREADSHEET_ID')
+            self.accounts = [Account(
+                name=DEFAULT_ACCOUNT,
+                email_address=self.email_address,
+                email_password=self.email_password,
+                sinks=self.sinks,
+                spreadsheet_id=self.spreadsheet_id,
+                imap_server=self.imap_server,
+                imap_port=self.imap_port
+            )]
+
+        # Google credentials are only needed when writing to Sheets
+        if any('sheets' in account.sinks for account in self.accounts):
+            self.google_service_account = self._get_required_env('GOOGLE_SERVICE_ACCOUNT')
+        else:
+            self.google_service_account = os.getenv('GOOGLE_SERVICE_ACCOUNT')
+
+        # Optional configuration
+        self.dedup_mode = os.getenv('DEDUP_MODE', DEDUP_MODE)
+        self.dedup_tolerance_minutes = float(os.getenv('DEDUP_TOLERANCE_MINUTES', str(DEDUP_TOLERANCE_MINUTES)))
+        self.dedup_horizon_days = float(os.getenv('DEDUP_HORIZON_DAYS', str(DEDUP_HORIZON_DAYS)))
+        self.pipeline_mode = os.getenv('PIPELINE_MODE', PIPELINE_MODE)
+        if self.pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(
+                f"Invalid PIPELINE_MODE {self.pipeline_mode!r} (use {' or '.join(PIPELINE_MODES)})"
+            )
+        self.defer_categorization = os.getenv(
+            'DEFER_CATEGORIZATION', str(DEFER_CATEGORIZATION)
+        ).lower() in ('1', 'true', 'yes')
 
     @staticmethod
     def _get_required_env(key: str) -> str:
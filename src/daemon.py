@@ -0,0 +1,344 @@
+"""Resident mode: run every account on a schedule with warm clients and caches.
+
+`python -m src.main serve` loads the configuration once and keeps the parser
+(compiled patterns), the categorizer (category cache, offline model and LLM
+client), the Sheets service pool and one IMAP connection per account between
+runs, so each run only does the incremental work. SIGHUP reloads the
+configuration; SIGTERM or SIGINT stops once the current run has finished.
+"""
+import logging
+import signal
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+
+from .categorizer import TransactionCategorizer
+from .config import Config
+from .email_fetcher import EmailFetcher
+from .main import finish_report, run_cycle
+from .metrics import run_metrics
+from .parser import TransactionParser
+
+logger = logging.getLogger(__name__)
+
+# (name, lowest, highest) of the five cron fields
+CRON_FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7)]
+
+# A cron expression that has not matched within this many years never will (e.g. 30 February)
+CRON_SEARCH_YEARS = 5
+
+
+class IntervalSchedule:
+    """Runs every `seconds`, start to start; the first run is immediate."""
+
+    def __init__(self, seconds: float):
+        """
+        Initialize schedule.
+
+        Args:
+            seconds: Time between run starts
+
+        Raises:
+            ValueError: If seconds is not positive
+        """
+        if seconds <= 0:
+            raise ValueError(f"Interval must be positive, got {seconds}")
+        self.seconds = seconds
+
+    def next_run(self, last_start: Optional[datetime], now: datetime) -> datetime:
+        """
+        When the next run should start.
+
+        Args:
+            last_start: Start of the previous run (None before the first)
+            now: Current time
+
+        Returns:
+            Start time; in the past if a run overran the interval
+        """
+        if last_start is None:
+            return now
+        return last_start + timedelta(seconds=self.seconds)
+
+    def __str__(self) -> str:
+        return f"every {self.seconds:g}s"
+
+
+def _parse_cron_field(spec: str, name: str, low: int, high: int) -> Set[int]:
+    """
+    Expand one cron field: `*`, numbers, ranges `a-b`, lists and `/step`.
+
+    Raises:
+        ValueError: On syntax errors or values out of range
+    """
+    values: Set[int] = set()
+    for part in spec.split(','):
+        base, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if base == '*':
+                start, end = low, high
+            elif '-' in base:
+                start, end = (int(bound) for bound in base.split('-', 1))
+            else:
+                start = int(base)
+                end = high if step != 1 else start
+        except ValueError:
+            raise ValueError(f"Invalid cron {name} field: {spec!r}")
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Cron {name} field out of range {low}-{high}: {spec!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Runs at the minutes matching a five-field cron expression, in local time."""
+
+    def __init__(self, expression: str):
+        """
+        Initialize schedule.
+
+        Args:
+            expression: 'minute hour day month weekday' (weekday 0-7, Sunday is 0 or 7)
+
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        self.expression = expression
+        parsed = [_parse_cron_field(spec, *field) for spec, field in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron: with both day fields restricted, either may match
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+
+    def _day_matches(self, moment: datetime) -> bool:
+        """Day-of-month / day-of-week test."""
+        day = moment.day in self.days
+        weekday = (moment.isoweekday() % 7) in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day or weekday
+        return day and weekday
+
+    def next_run(self, last_start: Optional[datetime], now: datetime) -> datetime:
+        """
+        First matching minute from now on, after the previous run's minute.
+
+        Args:
+            last_start: Start of the previous run (None before the first)
+            now: Current time
+
+        Returns:
+            Start time
+
+        Raises:
+            ValueError: If the expression never matches
+        """
+        moment = now.replace(second=0, microsecond=0)
+        if moment < now:
+            moment += timedelta(minutes=1)
+        if last_start is not None:
+            moment = max(moment, last_start.replace(second=0, microsecond=0) + timedelta(minutes=1))
+
+        limit = moment.year + CRON_SEARCH_YEARS
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                month_start = moment.replace(day=1, hour=0, minute=0)
+                moment = (month_start + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+    def __str__(self) -> str:
+        return f"cron '{self.expression}'"
+
+
+def _fetcher_settings(fetcher: EmailFetcher) -> tuple:
+    """Connection settings of a fetcher, to tell whether a reload changed them."""
+    return fetcher.email_address, fetcher.password, fetcher.imap_server, fetcher.imap_port
+
+
+class Daemon:
+    """Runs the pipeline on a schedule, keeping components alive between runs."""
+
+    def __init__(self, schedule, load_config: Callable[[], Config] = Config, max_cycles: Optional[int] = None):
+        """
+        Initialize daemon.
+
+        Args:
+            schedule: IntervalSchedule or CronSchedule
+            load_config: Builds the configuration (at start and on SIGHUP)
+            max_cycles: Stop after this many runs (default: run until signalled)
+        """
+        self.schedule = schedule
+        self.load_config = load_config
+        self.max_cycles = max_cycles
+        self.config: Optional[Config] = None
+        # Patterns are compiled once; nothing in them depends on the configuration
+        self.parser = TransactionParser()
+        self.categorizer: Optional[TransactionCategorizer] = None
+        self.sheets_pool = None
+        self.fetchers: Dict[str, EmailFetcher] = {}
+        self.cycles = 0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._reload = False
+
+    def load(self) -> None:
+        """
+        Build or refresh the components from the configuration.
+
+        The categorizer, Sheets pool and IMAP connections are kept unless the
+        settings they depend on changed.
+
+        Raises:
+            ValueError: If the configuration is invalid
+        """
+        config = self.load_config()
+        previous = self.config
+
+        if previous is None or config.anthropic_api_key != previous.anthropic_api_key:
+            if self.categorizer:
+                self.categorizer.cache.save()
+            self.categorizer = TransactionCategorizer(config.anthropic_api_key)
+
+        if previous is None or config.google_service_account != previous.google_service_account:
+            self.sheets_pool = None
+            if config.google_service_account:
+                from .sheets import SheetsClientPool
+                self.sheets_pool = SheetsClientPool(config.google_service_account)
+
+        fetchers = {}
+        for account in config.accounts:
+            fetcher = EmailFetcher(account.email_address, account.email_password,
+                                   account.imap_server, account.imap_port)
+            current = self.fetchers.pop(account.name, None)
+            if current and _fetcher_settings(current) == _fetcher_settings(fetcher):
+                fetcher = current
+            elif current:
+                current.disconnect()
+            fetchers[account.name] = fetcher
+        # Accounts no longer configured
+        for fetcher in self.fetchers.values():
+            fetcher.disconnect()
+        self.fetchers = fetchers
+        self.config = config
+
+    def reload(self) -> None:
+        """Reload the configuration, keeping the current one if the new one is invalid."""
+        logger.info("Reloading configuration...")
+        try:
+            self.load()
+        except ValueError as e:
+            logger.error(f"Configuration error, keeping the previous configuration: {e}")
+            return
+        logger.info(f"Configuration reloaded: {', '.join(self.fetchers)}")
+
+    def run_once(self) -> bool:
+        """
+        Process every account once, writing the run report and metrics.
+
+        Unfinished runs (e.g. the previous cycle failed) are resumed from their journals.
+
+        Returns:
+            True if every account succeeded
+        """
+        self.cycles += 1
+        report = {'started_at': datetime.now().isoformat(), 'counts': {}, 'cycle': self.cycles}
+        run_metrics.reset()
+        self.categorizer.new_run()
+        try:
+            succeeded = run_cycle(
+                self.config, self.parser, self.categorizer, self.sheets_pool, report,
+                resume=True, fetchers=self.fetchers
+            )
+        except Exception as e:
+            logger.error(f"Run {self.cycles} failed: {e}", exc_info=True)
+            report['error'] = str(e)
+            succeeded = False
+        finally:
+            finish_report(report, self.categorizer)
+        logger.info(f"Run {self.cycles} {'completed' if succeeded else 'failed'}")
+        return succeeded
+
+    def request_stop(self, signum: Optional[int] = None, frame=None) -> None:
+        """Stop after the current run (SIGTERM/SIGINT handler)."""
+        if signum is not None:
+            logger.info(f"Received {signal.Signals(signum).name}, stopping after the current run")
+        self._stopping = True
+        self._wake.set()
+
+    def request_reload(self, signum: Optional[int] = None, frame=None) -> None:
+        """Reload the configuration before the next run (SIGHUP handler)."""
+        self._reload = True
+        self._wake.set()
+
+    def _install_signal_handlers(self) -> Dict[int, object]:
+        """Route SIGTERM/SIGINT/SIGHUP to the daemon; returns the previous handlers."""
+        handlers = {signal.SIGTERM: self.request_stop, signal.SIGINT: self.request_stop}
+        if hasattr(signal, 'SIGHUP'):
+            handlers[signal.SIGHUP] = self.request_reload
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+        return {signum: signal.signal(signum, handler) for signum, handler in handlers.items()}
+
+    def _wait_until(self, moment: datetime) -> None:
+        """Sleep until `moment`, handling reloads, or until asked to stop."""
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self.reload()
+            delay = (moment - datetime.now()).total_seconds()
+            if delay <= 0:
+                return
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def serve(self) -> int:
+        """
+        Run until signalled (or max_cycles runs).
+
+        Returns:
+            Process exit code
+
+        Raises:
+            ValueError: If the initial configuration is invalid
+        """
+        self.load()
+        previous_handlers = self._install_signal_handlers()
+        logger.info(f"Serving {len(self.fetchers)} account(s), {self.schedule}")
+        try:
+            last_start = None
+            while not self._stopping:
+                next_run = self.schedule.next_run(last_start, datetime.now())
+                if next_run > datetime.now():
+                    logger.info(f"Next run at {next_run:%Y-%m-%d %H:%M:%S}")
+                self._wait_until(next_run)
+                if self._stopping:
+                    break
+                last_start = datetime.now()
+                self.run_once()
+                if self.max_cycles and self.cycles >= self.max_cycles:
+                    break
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            self.close()
+        logger.info(f"Stopped after {self.cycles} run(s)")
+        return 0
+
+    def close(self) -> None:
+        """Close IMAP connections and save the category cache."""
+        for fetcher in self.fetchers.values():
+            fetcher.disconnect()
+        if self.categorizer:
+            self.categorizer.cache.save()
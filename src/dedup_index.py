@@ -0,0 +1,241 @@
+"""Persistent index of processed messages and written transactions, for cross-run deduplication."""
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from .config import DEDUP_INDEX_FILE, DEDUP_HORIZON_DAYS, PENDING_CATEGORY
+from .deduplicator import _field, transaction_fingerprint
+from .email_fetcher import RawEmail
+from .parser import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Stay well under SQLite's bound-parameter limit
+_QUERY_CHUNK = 500
+
+
+class DedupIndex:
+    """SQLite-backed sets of processed message keys and written transaction fingerprints."""
+
+    def __init__(self, path: str = DEDUP_INDEX_FILE, horizon_days: float = DEDUP_HORIZON_DAYS):
+        """
+        Open (or create) the index.
+
+        Args:
+            path: SQLite database file
+            horizon_days: Entries for transactions older than this are pruned
+        """
+        self.path = path
+        self.horizon_days = horizon_days
+        # Shared by pipeline stages running in different threads
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS written ('
+            'fingerprint TEXT PRIMARY KEY, tx_time REAL NOT NULL, written_at REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS idx_written_tx_time ON written(tx_time)')
+        # Keys are 'uid:<uidvalidity>:<uid>' or 'mid:<message-id>'
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS seen_messages ('
+            'key TEXT PRIMARY KEY, seen_at REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS idx_seen_at ON seen_messages(seen_at)')
+        # Transactions written with PENDING_CATEGORY, until a back-fill patches them
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS pending ('
+            'fingerprint TEXT PRIMARY KEY, tx_time REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    def _known(self, values: List[str], table: str = 'written', column: str = 'fingerprint') -> Set[str]:
+        """
+        Look up which values are already indexed.
+
+        Args:
+            values: Keys to check
+            table: Table to search
+            column: Key column
+
+        Returns:
+            Subset present in the index
+        """
+        known = set()
+        with self._lock:
+            for i in range(0, len(values), _QUERY_CHUNK):
+                chunk = values[i:i + _QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.connection.execute(
+                    f'SELECT {column} FROM {table} WHERE {column} IN ({placeholders})', chunk
+                )
+                known.update(row[0] for row in rows)
+        return known
+
+    def seen_uids(self, uidvalidity: str, uids: List[str]) -> Set[str]:
+        """
+        Find IMAP UIDs processed by an earlier run.
+
+        Args:
+            uidvalidity: Mailbox UIDVALIDITY (UIDs are only stable within it)
+            uids: UIDs to check
+
+        Returns:
+            Subset of uids already processed
+        """
+        keys = {f'uid:{uidvalidity}:{uid}': uid for uid in uids}
+        return {keys[key] for key in self._known(list(keys), 'seen_messages', 'key')}
+
+    def seen_message_ids(self, message_ids: List[str]) -> Set[str]:
+        """
+        Find Message-IDs processed by an earlier run.
+
+        Args:
+            message_ids: Message-ID header values
+
+        Returns:
+            Subset of message_ids already processed
+        """
+        keys = {f'mid:{mid}': mid for mid in message_ids}
+        return {keys[key] for key in self._known(list(keys), 'seen_messages', 'key')}
+
+    def mark_seen(self, emails: Iterable[RawEmail], uidvalidity: Optional[str]) -> None:
+        """
+        Record fetched messages as processed.
+
+        Args:
+            emails: Fetched RawEmail objects
+            uidvalidity: Mailbox UIDVALIDITY the UIDs belong to
+        """
+        now = time.time()
+        rows = []
+        for raw_email in emails:
+            if raw_email.uid and uidvalidity:
+                rows.append((f'uid:{uidvalidity}:{raw_email.uid}', now))
+            if raw_email.message_id:
+                rows.append((f'mid:{raw_email.message_id}', now))
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO seen_messages (key, seen_at) VALUES (?, ?)', rows
+            )
+
+    def filter_new(self, transactions: List[Union[Dict, Transaction]]) -> List[Union[Dict, Transaction]]:
+        """
+        Drop transactions written by a previous run.
+
+        Args:
+            transactions: Transaction dictionaries or objects
+
+        Returns:
+            Transactions not yet in the index, in their original order
+        """
+        if not transactions:
+            return []
+
+        fingerprints = [transaction_fingerprint(tx) for tx in transactions]
+        known = self._known(list(set(fingerprints)))
+        fresh = [tx for tx, fp in zip(transactions, fingerprints) if fp not in known]
+
+        skipped = len(transactions) - len(fresh)
+        if skipped:
+            logger.info(f"Skipped {skipped} transactions already written by a previous run")
+        return fresh
+
+    def add(self, transactions: Iterable[Union[Dict, Transaction]]) -> None:
+        """
+        Record transactions as written.
+
+        Args:
+            transactions: Transaction dictionaries or objects
+        """
+        now = time.time()
+        rows = []
+        for tx in transactions:
+            rows.append((transaction_fingerprint(tx), _field(tx, 'date').timestamp(), now))
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO written (fingerprint, tx_time, written_at) VALUES (?, ?, ?)',
+                rows
+            )
+        logger.debug(f"Indexed {len(rows)} written transactions")
+
+    def add_pending(self, rows: Iterable[Dict]) -> None:
+        """
+        Record written rows whose category is still PENDING_CATEGORY.
+
+        Args:
+            rows: Categorized transaction dictionaries (others are ignored)
+        """
+        pending = [
+            (transaction_fingerprint(row), row['date'].timestamp())
+            for row in rows if row['category'] == PENDING_CATEGORY
+        ]
+        if not pending:
+            return
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO pending (fingerprint, tx_time) VALUES (?, ?)', pending
+            )
+
+    def pending(self) -> Dict[str, datetime]:
+        """
+        Transactions recorded as written with a pending category.
+
+        Returns:
+            Mapping of fingerprint -> transaction date
+        """
+        with self._lock:
+            rows = self.connection.execute('SELECT fingerprint, tx_time FROM pending').fetchall()
+        return {fingerprint: datetime.fromtimestamp(tx_time) for fingerprint, tx_time in rows}
+
+    def clear_pending(self, fingerprints: Iterable[str]) -> None:
+        """
+        Forget pending transactions once patched (or no longer held by any sink).
+
+        Args:
+            fingerprints: Transaction fingerprints
+        """
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM pending WHERE fingerprint = ?', [(fingerprint,) for fingerprint in fingerprints]
+            )
+
+    def prune(self) -> int:
+        """
+        Delete entries older than the horizon.
+
+        Returns:
+            Number of entries deleted
+        """
+        cutoff = time.time() - self.horizon_days * 86400
+        with self._lock, self.connection:
+            deleted = self.connection.execute('DELETE FROM written WHERE tx_time < ?', (cutoff,)).rowcount
+            deleted += self.connection.execute(
+                'DELETE FROM seen_messages WHERE seen_at < ?', (cutoff,)
+            ).rowcount
+        if deleted:
+            logger.info(f"Pruned {deleted} dedup index entries older than {self.horizon_days} days")
+        return deleted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM written').fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
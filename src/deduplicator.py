@@ -1,40 +1,131 @@
 """Transaction deduplicator to remove duplicate transactions."""
+import hashlib
 import logging
-from typing import Dict, List, Tuple
+import re
+from collections import deque
+from datetime import timezone
+from difflib import SequenceMatcher
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .config import DEDUP_MODE, DEDUP_TOLERANCE_MINUTES, PaymentMode
+from .metrics import run_metrics
+from .parser import Transaction
 
 logger = logging.getLogger(__name__)
 
 
+def _field(transaction: Union[Dict, Transaction], name: str) -> Any:
+    """
+    Read a field from a transaction dictionary or Transaction object.
+
+    Enum values (tx_type, mode) are returned as their string value.
+
+    Args:
+        transaction: Transaction dictionary or object
+        name: Field name
+
+    Returns:
+        Field value
+    """
+    if isinstance(transaction, dict):
+        value = transaction[name]
+    else:
+        value = getattr(transaction, name)
+    return value.value if isinstance(value, Enum) else value
+
+
+def transaction_fingerprint(transaction: Union[Dict, Transaction]) -> str:
+    """
+    Stable identifier of a transaction across runs.
+
+    Built from amount, type, minute-precision time (UTC when timezone-aware)
+    and merchant, so the same alert fetched twice gets the same fingerprint.
+
+    Args:
+        transaction: Transaction dictionary or object
+
+    Returns:
+        16-character hex fingerprint
+    """
+    date = _field(transaction, 'date')
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    merchant = (_field(transaction, 'merchant') or '').strip().lower()
+    key = '|'.join([
+        f"{float(_field(transaction, 'amount')):.2f}",
+        _field(transaction, 'tx_type'),
+        date.strftime('%Y-%m-%dT%H:%M'),
+        merchant
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
 class TransactionDeduplicator:
-    """Removes duplicate transactions based on amount, type, and date."""
+    """
+    Removes duplicate transactions based on amount, type, and date.
+
+    Two modes are available:
+      - 'bucket': same amount and type within the same clock hour
+      - 'sweep': same amount and type within +/- tolerance_minutes, sorted by
+        (amount, type, time) and swept in O(n log n). Known merchants or modes
+        that clearly differ keep transactions apart; among several candidates
+        the most similar merchant/mode, then the nearest in time, wins.
+    """
+
+    # Merchants less similar than this are treated as different payees
+    MERCHANT_MATCH_THRESHOLD = 0.5
+
+    def __init__(self, mode: str = DEDUP_MODE, tolerance_minutes: float = DEDUP_TOLERANCE_MINUTES):
+        """
+        Initialize deduplicator.
+
+        Args:
+            mode: 'bucket' or 'sweep'
+            tolerance_minutes: Time tolerance for 'sweep' mode
+        """
+        if mode not in ('bucket', 'sweep'):
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.mode = mode
+        self.tolerance_seconds = tolerance_minutes * 60
 
     @staticmethod
-    def _create_dedup_key(transaction: Dict) -> Tuple:
+    def _create_dedup_key(transaction: Union[Dict, Transaction]) -> Tuple:
         """
         Create deduplication key for a transaction.
 
         Args:
-            transaction: Transaction dictionary
+            transaction: Transaction dictionary or object
 
         Returns:
             Tuple of (amount, tx_type, date_hour)
         """
         # Use hour-level precision for date to catch duplicates
         # within the same hour (e.g., email + SMS notifications)
-        date_hour = transaction['date'].strftime('%Y-%m-%d-%H')
+        date_hour = _field(transaction, 'date').strftime('%Y-%m-%d-%H')
 
         return (
-            transaction['amount'],
-            transaction['tx_type'],
+            _field(transaction, 'amount'),
+            _field(transaction, 'tx_type'),
             date_hour
         )
 
-    def deduplicate(self, transactions: List[Dict]) -> List[Dict]:
+    def deduplicate(
+        self,
+        transactions: List[Union[Dict, Transaction]],
+        seen_keys: Optional[set] = None
+    ) -> List[Union[Dict, Transaction]]:
         """
         Remove duplicate transactions.
 
+        Runs on parsed Transaction objects (before categorization, so the LLM
+        is never asked about a duplicate) or on categorized dictionaries.
+
         Args:
-            transactions: List of transaction dictionaries
+            transactions: List of transaction dictionaries or objects
+            seen_keys: 'bucket' mode only: keys from earlier chunks of the same
+                stream, updated in place, so chunks can be deduplicated one at a
+                time with the same result as the whole list
 
         Returns:
             Deduplicated list of transactions
@@ -42,7 +133,31 @@ class TransactionDeduplicator:
         if not transactions:
             return []
 
-        seen_keys = set()
+        if self.mode == 'sweep' and seen_keys is not None:
+            raise ValueError("Sweep mode needs the whole batch and cannot run incrementally")
+
+        with run_metrics.span('deduplicate', len(transactions)):
+            if self.mode == 'sweep':
+                return self._deduplicate_sweep(transactions)
+            return self._deduplicate_buckets(transactions, seen_keys)
+
+    def _deduplicate_buckets(
+        self,
+        transactions: List[Union[Dict, Transaction]],
+        seen_keys: Optional[set]
+    ) -> List[Union[Dict, Transaction]]:
+        """
+        Drop transactions whose bucket key was already seen.
+
+        Args:
+            transactions: List of transaction dictionaries or objects
+            seen_keys: Keys from earlier chunks, updated in place (or None)
+
+        Returns:
+            Deduplicated list of transactions
+        """
+        if seen_keys is None:
+            seen_keys = set()
         unique_transactions = []
         duplicate_count = 0
 
@@ -54,7 +169,9 @@ class TransactionDeduplicator:
                 unique_transactions.append(tx)
             else:
                 duplicate_count += 1
-                logger.debug(f"Duplicate found: ₹{tx['amount']} {tx['tx_type']} on {tx['date']}")
+                logger.debug(
+                    f"Duplicate found: ₹{_field(tx, 'amount')} {_field(tx, 'tx_type')} on {_field(tx, 'date')}"
+                )
 
         if duplicate_count > 0:
             logger.info(f"Removed {duplicate_count} duplicate transactions")
@@ -62,3 +179,102 @@ class TransactionDeduplicator:
             logger.info("No duplicates found")
 
         return unique_transactions
+
+    @staticmethod
+    def _normalize_merchant(merchant: Optional[str]) -> str:
+        """Lowercase a merchant name and strip punctuation and UPI handles."""
+        if not merchant:
+            return ''
+        merchant = merchant.lower().split('@')[0]
+        return re.sub(r'[^a-z0-9]+', ' ', merchant).strip()
+
+    def _similarity(self, a: Union[Dict, Transaction], b: Union[Dict, Transaction]) -> Optional[Tuple[float, int]]:
+        """
+        Score how likely two same-amount, same-type transactions are one payment.
+
+        Args:
+            a: Transaction dictionary or object
+            b: Transaction dictionary or object
+
+        Returns:
+            (merchant similarity, mode match) for ranking, or None if they differ
+        """
+        merchant_a = self._normalize_merchant(_field(a, 'merchant'))
+        merchant_b = self._normalize_merchant(_field(b, 'merchant'))
+        if merchant_a and merchant_b:
+            if merchant_a in merchant_b or merchant_b in merchant_a:
+                merchant_score = 1.0
+            else:
+                merchant_score = SequenceMatcher(None, merchant_a, merchant_b).ratio()
+            if merchant_score < self.MERCHANT_MATCH_THRESHOLD:
+                return None
+        else:
+            # One side unknown (e.g. an SMS forward without a payee)
+            merchant_score = 0.5
+
+        mode_a, mode_b = _field(a, 'mode'), _field(b, 'mode')
+        unknown = PaymentMode.UNKNOWN.value
+        if mode_a != unknown and mode_b != unknown and mode_a != mode_b:
+            return None
+        return merchant_score, int(mode_a == mode_b)
+
+    def _deduplicate_sweep(self, transactions: List[Union[Dict, Transaction]]) -> List[Union[Dict, Transaction]]:
+        """
+        Time-tolerant dedup by sorted sweep.
+
+        Args:
+            transactions: List of transaction dictionaries or objects
+
+        Returns:
+            Deduplicated list, in original order
+        """
+        order = sorted(
+            range(len(transactions)),
+            key=lambda i: (
+                _field(transactions[i], 'amount'),
+                _field(transactions[i], 'tx_type'),
+                _field(transactions[i], 'date').timestamp(),
+                i
+            )
+        )
+
+        kept = []
+        window: deque = deque()  # (timestamp, index) of kept transactions in the current group
+        group = None
+        for i in order:
+            tx = transactions[i]
+            key = (_field(tx, 'amount'), _field(tx, 'tx_type'))
+            ts = _field(tx, 'date').timestamp()
+            if key != group:
+                group = key
+                window.clear()
+
+            # Kept transactions too old to match anything from here on
+            while window and ts - window[0][0] > self.tolerance_seconds:
+                window.popleft()
+
+            best = None
+            for kept_ts, j in window:
+                score = self._similarity(transactions[j], tx)
+                if score is None:
+                    continue
+                rank = (score, -(ts - kept_ts))
+                if best is None or rank > best[0]:
+                    best = (rank, j)
+
+            if best is None:
+                kept.append(i)
+                window.append((ts, i))
+            else:
+                logger.debug(
+                    f"Duplicate found: ₹{_field(tx, 'amount')} {_field(tx, 'tx_type')} on "
+                    f"{_field(tx, 'date')} matches {_field(transactions[best[1]], 'date')}"
+                )
+
+        duplicate_count = len(transactions) - len(kept)
+        if duplicate_count > 0:
+            logger.info(f"Removed {duplicate_count} duplicate transactions")
+        else:
+            logger.info("No duplicates found")
+
+        return [transactions[i] for i in sorted(kept)]
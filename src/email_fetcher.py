@@ -4,15 +4,21 @@ import email
 from email.message import Message
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Protocol, Set
 import logging
 import re
+import ssl
 
 from .config import BANK_SENDERS
+from .metrics import run_metrics
 
 logger = logging.getLogger(__name__)
 
 
+# UIDs per UID FETCH command
+FETCH_BATCH_SIZE = 50
+
+
 @dataclass
 class RawEmail:
     """Structured representation of a raw email."""
@@ -20,12 +26,25 @@ class RawEmail:
     sender: str
     body: str
     date: datetime
+    message_id: Optional[str] = None
+    uid: Optional[str] = None
+
+
+class SeenMessages(Protocol):
+    """Store of messages processed by earlier runs."""
+
+    def seen_uids(self, uidvalidity: str, uids: List[str]) -> Set[str]:
+        """Return the subset of UIDs already processed."""
+
+    def seen_message_ids(self, message_ids: List[str]) -> Set[str]:
+        """Return the subset of Message-IDs already processed."""
 
 
 class EmailFetcher:
     """Fetches transaction emails via IMAP."""
 
-    def __init__(self, email_address: str, password: str, imap_server: str = 'imap.gmail.com', imap_port: int = 993):
+    def __init__(self, email_address: str, password: str, imap_server: str = 'imap.gmail.com', imap_port: int = 993,
+                 ssl_context: Optional[ssl.SSLContext] = None):
         """
         Initialize email fetcher.
 
@@ -34,18 +53,21 @@ class EmailFetcher:
             password: Email password or app password
             imap_server: IMAP server address
             imap_port: IMAP server port
+            ssl_context: TLS settings (None: system defaults with certificate checks)
         """
         self.email_address = email_address
         self.password = password
         self.imap_server = imap_server
         self.imap_port = imap_port
+        self.ssl_context = ssl_context
         self.connection = None
+        self.uidvalidity: Optional[str] = None
 
     def connect(self) -> None:
         """Establish IMAP connection."""
         try:
             logger.info(f"Connecting to IMAP server {self.imap_server}:{self.imap_port}")
-            self.connection = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
+            self.connection = imaplib.IMAP4_SSL(self.imap_server, self.imap_port, ssl_context=self.ssl_context)
             self.connection.login(self.email_address, self.password)
             logger.info("Successfully connected to IMAP server")
         except imaplib.IMAP4.error as e:
@@ -55,6 +77,17 @@ class EmailFetcher:
             logger.error(f"Unexpected error during IMAP connection: {e}")
             raise
 
+    def ensure_connected(self) -> None:
+        """Connect, or check a connection kept open between runs and reconnect if it dropped."""
+        if self.connection:
+            try:
+                self.connection.noop()
+                return
+            except (imaplib.IMAP4.error, OSError) as e:
+                logger.info(f"IMAP connection lost ({e}), reconnecting")
+                self.connection = None
+        self.connect()
+
     def disconnect(self) -> None:
         """Close IMAP connection."""
         if self.connection:
@@ -64,34 +97,38 @@ class EmailFetcher:
                 logger.info("Disconnected from IMAP server")
             except:
                 pass
+            self.connection = None
 
-    def _build_search_query(self, since_date: datetime) -> str:
+    def _build_search_query(self, since_date: datetime, before_date: Optional[datetime] = None) -> str:
         """
         Build IMAP search query for multiple senders.
 
         Args:
             since_date: Fetch emails since this date
+            before_date: Only emails before this date (exclusive), if given
 
         Returns:
             IMAP search query string
         """
-        # Format date for IMAP (DD-Mon-YYYY)
-        date_str = since_date.strftime('%d-%b-%Y')
+        # Format date for IMAP (DD-Mon-YYYY); SINCE and BEFORE compare whole days
+        dates = f"SINCE {since_date.strftime('%d-%b-%Y')}"
+        if before_date:
+            dates += f" BEFORE {before_date.strftime('%d-%b-%Y')}"
 
         # Build OR query for multiple senders
         # IMAP OR syntax: (OR (OR FROM "a" FROM "b") FROM "c")
         if not BANK_SENDERS:
-            return f'SINCE {date_str}'
+            return dates
 
         if len(BANK_SENDERS) == 1:
-            return f'(SINCE {date_str} FROM "{BANK_SENDERS[0]}")'
+            return f'({dates} FROM "{BANK_SENDERS[0]}")'
 
         # Build nested OR structure
         query = f'FROM "{BANK_SENDERS[0]}"'
         for sender in BANK_SENDERS[1:]:
             query = f'(OR {query} FROM "{sender}")'
 
-        return f'(SINCE {date_str} {query})'
+        return f'({dates} {query})'
 
     def _extract_body(self, msg: Message) -> str:
         """
@@ -143,85 +180,174 @@ class EmailFetcher:
 
         return body.strip()
 
-    def fetch_emails(self, hours: int = 25) -> List[RawEmail]:
+    def _select_inbox(self) -> None:
+        """Select INBOX and remember its UIDVALIDITY."""
+        self.connection.select('INBOX')
+        _, data = self.connection.response('UIDVALIDITY')
+        self.uidvalidity = data[0].decode() if data and data[0] else None
+
+    def _parse_message(self, uid: Optional[str], raw: bytes) -> RawEmail:
         """
-        Fetch transaction emails from the last N hours.
+        Build a RawEmail from RFC822 bytes.
 
         Args:
-            hours: Number of hours to look back (default: 25)
+            uid: IMAP UID of the message
+            raw: Full message bytes
 
         Returns:
-            List of RawEmail objects
+            RawEmail object
+        """
+        msg = email.message_from_bytes(raw)
+
+        # Parse date
+        date_str = msg.get('Date', '')
+        try:
+            date = email.utils.parsedate_to_datetime(date_str)
+        except:
+            date = datetime.now()
+
+        message_id = msg.get('Message-ID')
+        return RawEmail(
+            subject=msg.get('Subject', ''),
+            sender=msg.get('From', ''),
+            body=self._extract_body(msg),
+            date=date,
+            message_id=message_id.strip() if message_id else None,
+            uid=uid
+        )
+
+    def _fetch_uids(self, uids: List[str]) -> Iterable[RawEmail]:
+        """
+        Download messages in batches of UIDs, one UID FETCH per batch.
+
+        Args:
+            uids: Message UIDs
+
+        Yields:
+            RawEmail objects
+        """
+        for i in range(0, len(uids), FETCH_BATCH_SIZE):
+            chunk = uids[i:i + FETCH_BATCH_SIZE]
+            run_metrics.count('api_calls', api='imap')
+            try:
+                with run_metrics.span('fetch') as span:
+                    status, msg_data = self.connection.uid('FETCH', ','.join(chunk), '(UID RFC822)')
+                    bodies = [part[1] for part in msg_data or [] if isinstance(part, tuple)]
+                    span.items = len(bodies)
+                run_metrics.count('bytes_fetched', sum(len(body) for body in bodies))
+            except Exception as e:
+                logger.warning(f"Failed to fetch emails {chunk[0]}..{chunk[-1]}: {e}")
+                continue
+            if status != 'OK':
+                logger.warning(f"Failed to fetch emails {chunk[0]}..{chunk[-1]}")
+                continue
+
+            for part in msg_data:
+                # Message parts are (envelope, body) tuples; b')' separates them
+                if not isinstance(part, tuple):
+                    continue
+                uid_match = re.search(rb'UID (\d+)', part[0])
+                uid = uid_match.group(1).decode() if uid_match else None
+                try:
+                    yield self._parse_message(uid, part[1])
+                except Exception as e:
+                    logger.warning(f"Error processing email {uid}: {e}")
+
+    def iter_email_batches(
+        self,
+        hours: int = 25,
+        seen: Optional[SeenMessages] = None,
+        since: Optional[datetime] = None,
+        before: Optional[datetime] = None
+    ) -> Iterator[List[RawEmail]]:
+        """
+        Fetch transaction emails from the last N hours, one download batch at a time.
+
+        Args:
+            hours: Number of hours to look back (default: 25)
+            seen: Messages processed by earlier runs; their UIDs are skipped
+                before download and their Message-IDs after
+            since: Fetch from this day instead of the last N hours (backfill)
+            before: Only emails from days before this one
+
+        Yields:
+            Non-empty lists of RawEmail objects, one per distinct Message-ID
         """
         if not self.connection:
             raise RuntimeError("Not connected to IMAP server. Call connect() first.")
 
         try:
             # Select inbox
-            self.connection.select('INBOX')
+            self._select_inbox()
 
             # Calculate since date
-            since_date = datetime.now() - timedelta(hours=hours)
-            search_query = self._build_search_query(since_date)
+            since_date = since or datetime.now() - timedelta(hours=hours)
+            search_query = self._build_search_query(since_date, before)
 
-            logger.info(f"Searching for emails since {since_date.strftime('%Y-%m-%d %H:%M')}")
+            until = f" until {before.strftime('%Y-%m-%d')}" if before else ''
+            logger.info(f"Searching for emails since {since_date.strftime('%Y-%m-%d %H:%M')}{until}")
             logger.debug(f"IMAP search query: {search_query}")
 
-            # Search for emails
-            status, messages = self.connection.search(None, search_query)
+            # Search for emails by UID, which is stable across sessions
+            status, messages = self.connection.uid('SEARCH', None, search_query)
 
             if status != 'OK':
                 logger.error(f"IMAP search failed: {status}")
-                return []
-
-            email_ids = messages[0].split()
-            logger.info(f"Found {len(email_ids)} emails")
-
-            if not email_ids:
-                return []
-
-            # Fetch emails
-            raw_emails = []
-            for email_id in email_ids:
-                try:
-                    status, msg_data = self.connection.fetch(email_id, '(RFC822)')
-                    if status != 'OK':
-                        logger.warning(f"Failed to fetch email {email_id}")
-                        continue
-
-                    # Parse email
-                    msg = email.message_from_bytes(msg_data[0][1])
-
-                    # Extract fields
-                    subject = msg.get('Subject', '')
-                    sender = msg.get('From', '')
-                    body = self._extract_body(msg)
-
-                    # Parse date
-                    date_str = msg.get('Date', '')
-                    try:
-                        date = email.utils.parsedate_to_datetime(date_str)
-                    except:
-                        date = datetime.now()
-
-                    raw_emails.append(RawEmail(
-                        subject=subject,
-                        sender=sender,
-                        body=body,
-                        date=date
-                    ))
+                return
+
+            uids = [uid.decode() for uid in messages[0].split()]
+            logger.info(f"Found {len(uids)} emails")
+
+            # Skip messages processed by earlier runs before downloading them
+            if seen is not None and self.uidvalidity and uids:
+                already = seen.seen_uids(self.uidvalidity, uids)
+                if already:
+                    logger.info(f"Skipping {len(already)} emails processed by a previous run")
+                    uids = [uid for uid in uids if uid not in already]
+
+            # Fetch emails, dropping repeated Message-IDs
+            message_ids = set()
+            for i in range(0, len(uids), FETCH_BATCH_SIZE):
+                batch = []
+                batch_ids = []
+                for raw_email in self._fetch_uids(uids[i:i + FETCH_BATCH_SIZE]):
+                    if raw_email.message_id:
+                        if raw_email.message_id in message_ids:
+                            logger.debug(f"Duplicate Message-ID {raw_email.message_id}")
+                            continue
+                        message_ids.add(raw_email.message_id)
+                        batch_ids.append(raw_email.message_id)
+                    batch.append(raw_email)
 
-                except Exception as e:
-                    logger.warning(f"Error processing email {email_id}: {e}")
-                    continue
+                if seen is not None and batch_ids:
+                    already = seen.seen_message_ids(batch_ids)
+                    if already:
+                        logger.info(f"Skipping {len(already)} emails with already processed Message-IDs")
+                        batch = [e for e in batch if e.message_id not in already]
 
-            logger.info(f"Successfully fetched {len(raw_emails)} emails")
-            return raw_emails
+                if batch:
+                    yield batch
 
         except Exception as e:
             logger.error(f"Error fetching emails: {e}")
             raise
 
+    def fetch_emails(self, hours: int = 25, seen: Optional[SeenMessages] = None) -> List[RawEmail]:
+        """
+        Fetch transaction emails from the last N hours.
+
+        Args:
+            hours: Number of hours to look back (default: 25)
+            seen: Messages processed by earlier runs; their UIDs are skipped
+                before download and their Message-IDs after
+
+        Returns:
+            List of RawEmail objects, one per distinct Message-ID
+        """
+        raw_emails = [raw_email for batch in self.iter_email_batches(hours, seen) for raw_email in batch]
+        logger.info(f"Successfully fetched {len(raw_emails)} emails")
+        return raw_emails
+
     def __enter__(self):
         """Context manager entry."""
         self.connect()
@@ -0,0 +1,262 @@
+"""Stage journal: each stage's output is saved locally so a failed run can resume.
+
+Every stage appends its output chunks to a JSON-lines file in the state
+directory, and is marked complete in a manifest once its input is exhausted.
+`--resume` reloads the output of the last completed stage and runs only the
+stages after it. The journal is cleared when a run finishes.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .config import STATE_DIR, TxType, PaymentMode
+from .deduplicator import transaction_fingerprint
+from .email_fetcher import RawEmail
+from .parser import Transaction
+from .pipeline import Stage
+
+logger = logging.getLogger(__name__)
+
+# Stages in run order; 'fetch' is the pipeline source
+STAGE_ORDER = ['fetch', 'parse', 'dedup', 'categorize', 'write']
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def _encode_email(raw_email: RawEmail) -> Dict:
+    """Serialize a fetched email."""
+    return dict(asdict(raw_email), date=raw_email.date.isoformat())
+
+
+def _decode_email(record: Dict) -> RawEmail:
+    """Restore a fetched email."""
+    return RawEmail(**dict(record, date=datetime.fromisoformat(record['date'])))
+
+
+def _encode_transaction(tx: Transaction) -> Dict:
+    """Serialize a parsed transaction."""
+    return dict(asdict(tx), tx_type=tx.tx_type.value, mode=tx.mode.value, date=tx.date.isoformat())
+
+
+def _decode_transaction(record: Dict) -> Transaction:
+    """Restore a parsed transaction."""
+    return Transaction(**dict(
+        record,
+        tx_type=TxType(record['tx_type']),
+        mode=PaymentMode(record['mode']),
+        date=datetime.fromisoformat(record['date'])
+    ))
+
+
+def _encode_row(row: Dict) -> Dict:
+    """Serialize a categorized row."""
+    return dict(row, date=row['date'].isoformat())
+
+
+def _decode_row(record: Dict) -> Dict:
+    """Restore a categorized row."""
+    return dict(record, date=datetime.fromisoformat(record['date']))
+
+
+# Stage name -> (encode, decode); written rows are journaled as fingerprints only
+CODECS: Dict[str, tuple] = {
+    'fetch': (_encode_email, _decode_email),
+    'parse': (_encode_transaction, _decode_transaction),
+    'dedup': (_encode_transaction, _decode_transaction),
+    'categorize': (_encode_row, _decode_row),
+    'write': (transaction_fingerprint, lambda fingerprint: fingerprint),
+}
+
+
+class RunJournal:
+    """Per-stage output files and a manifest of completed stages."""
+
+    def __init__(self, state_dir: str = STATE_DIR):
+        """
+        Initialize journal.
+
+        Args:
+            state_dir: Directory holding the journal files
+        """
+        self.state_dir = Path(state_dir)
+        self._lock = threading.Lock()
+        self.manifest = self._read_manifest()
+
+    @property
+    def _manifest_path(self) -> Path:
+        """Path of the manifest file."""
+        return self.state_dir / MANIFEST_FILE
+
+    def _stage_path(self, stage: str) -> Path:
+        """Path of a stage's output file."""
+        return self.state_dir / f'{stage}.jsonl'
+
+    def _read_manifest(self) -> Dict:
+        """Load the manifest, or an empty one."""
+        try:
+            return json.loads(self._manifest_path.read_text())
+        except FileNotFoundError:
+            return {'completed': []}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable journal manifest: {e}")
+            return {'completed': []}
+
+    def _write_manifest(self) -> None:
+        """Save the manifest atomically."""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp_path, self._manifest_path)
+
+    def start(self) -> None:
+        """Discard any previous journal and begin a new one."""
+        if self.manifest['completed']:
+            logger.warning(
+                f"Discarding journal of an unfinished run (completed: {', '.join(self.manifest['completed'])})"
+            )
+        self.clear()
+        self.manifest = {'completed': [], 'started_at': datetime.now().isoformat()}
+        self._write_manifest()
+
+    def clear(self) -> None:
+        """Delete the journal files."""
+        for stage in STAGE_ORDER:
+            self._stage_path(stage).unlink(missing_ok=True)
+        self._manifest_path.unlink(missing_ok=True)
+        self.manifest = {'completed': []}
+
+    def rewind(self, stage: str) -> None:
+        """
+        Drop the partial output of the stages after `stage`, before re-running them.
+
+        Written fingerprints are kept: those rows stay written whatever happens next.
+
+        Args:
+            stage: Last completed stage
+        """
+        rerun = STAGE_ORDER[STAGE_ORDER.index(stage) + 1:]
+        for name in rerun:
+            if name != 'write':
+                self._stage_path(name).unlink(missing_ok=True)
+        with self._lock:
+            self.manifest['completed'] = [name for name in self.manifest['completed'] if name not in rerun]
+            self._write_manifest()
+
+    def last_completed(self) -> Optional[str]:
+        """
+        Latest stage (in run order) whose output is complete.
+
+        Returns:
+            Stage name, or None if no stage has completed
+        """
+        completed = [stage for stage in STAGE_ORDER if stage in self.manifest['completed']]
+        return completed[-1] if completed else None
+
+    def get(self, key: str, default=None):
+        """Read a value saved with set()."""
+        return self.manifest.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        """Save a run-level value (e.g. the mailbox UIDVALIDITY) in the manifest."""
+        with self._lock:
+            self.manifest[key] = value
+            self._write_manifest()
+
+    def record(self, stage: str, items: List) -> List:
+        """
+        Append a stage's output chunk.
+
+        Args:
+            stage: Stage name
+            items: Output items
+
+        Returns:
+            The same items, so calls can be chained
+        """
+        if items:
+            encode = CODECS[stage][0]
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            with open(self._stage_path(stage), 'a') as f:
+                for item in items:
+                    f.write(json.dumps(encode(item)) + '\n')
+        return items
+
+    def complete(self, stage: str) -> None:
+        """
+        Mark a stage's output as complete.
+
+        Args:
+            stage: Stage name
+        """
+        with self._lock:
+            if stage not in self.manifest['completed']:
+                self.manifest['completed'].append(stage)
+                self._write_manifest()
+
+    def load(self, stage: str) -> List:
+        """
+        Read a stage's journaled output.
+
+        A partially written last line (e.g. after a crash mid-write) is skipped.
+
+        Args:
+            stage: Stage name
+
+        Returns:
+            Decoded items, in the order they were recorded
+        """
+        decode = CODECS[stage][1]
+        items = []
+        try:
+            with open(self._stage_path(stage)) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping truncated {stage} journal entry")
+                        continue
+                    items.append(decode(record))
+        except FileNotFoundError:
+            pass
+        return items
+
+    def journal_source(self, source: Iterable[List], stage: str = 'fetch') -> Iterator[List]:
+        """
+        Journal chunks from a pipeline source, marking it complete when exhausted.
+
+        Args:
+            source: Iterable of chunks
+            stage: Name to journal the chunks under
+
+        Yields:
+            The source's chunks
+        """
+        for chunk in source:
+            yield self.record(stage, chunk)
+        self.complete(stage)
+
+    def journal_stage(self, stage: Stage) -> Stage:
+        """
+        Wrap a pipeline stage so its output is journaled.
+
+        Args:
+            stage: Stage named after one of STAGE_ORDER
+
+        Returns:
+            Stage with the same name that records its output and marks itself
+            complete once its finish step has run
+        """
+        def process(chunk: List) -> List:
+            return self.record(stage.name, stage.process(chunk))
+
+        def finish() -> List:
+            output = self.record(stage.name, stage.finish() if stage.finish else [])
+            self.complete(stage.name)
+            return output
+
+        return Stage(stage.name, process, finish=finish)
@@ -0,0 +1,256 @@
+"""Resilient wrapper for LLM API calls: retries, deadline and circuit breaker."""
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM cannot be reached within the retry budget or deadline."""
+
+
+class CircuitBreaker:
+    """
+    Stops calls after consecutive failures, then lets a trial call through after a cooldown.
+
+    Thread-safe: accounts processed in parallel share one breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures before opening
+            reset_timeout: Seconds to stay open before allowing a trial call
+            clock: Monotonic time source
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # Thread making the single trial call while half-open
+        self._prober: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: 'closed', 'open' or 'half-open'."""
+        opened_at = self.opened_at
+        if opened_at is None:
+            return 'closed'
+        if self.clock() - opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """
+        Whether a call may be attempted.
+
+        Once half-open, only the first thread to ask is let through (its own
+        retries included) until it records a success or a failure.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            if self._prober is None:
+                self._prober = threading.get_ident()
+            return self._prober == threading.get_ident()
+
+    def release(self) -> None:
+        """End this thread's trial call without an outcome, letting another thread try."""
+        with self._lock:
+            if self._prober == threading.get_ident():
+                self._prober = None
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._prober = None
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening (or re-opening) the breaker at the threshold."""
+        with self._lock:
+            self._prober = None
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+                self.opened_at = self.clock()
+
+
+class ResilientLLMClient:
+    """
+    Executes LLM API calls with exponential backoff, a run deadline and a circuit breaker.
+
+    Transient failures (connection errors, 408/409/429 and 5xx) are retried
+    with full-jitter backoff, honoring retry-after headers. When the per-call
+    retries, the run-level retry budget or the deadline run out, or the breaker
+    is open, LLMUnavailableError is raised so callers can defer the work
+    instead of recording a fallback answer. Other errors are re-raised as-is.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        retry_budget: int = 20,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline: Optional[float] = 300.0,
+        breaker: Optional[CircuitBreaker] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        jitter: Callable[[], float] = random.random
+    ):
+        """
+        Initialize resilient client.
+
+        Args:
+            max_retries: Retries per call
+            retry_budget: Total retries allowed for the whole run
+            base_delay: Initial backoff in seconds
+            max_delay: Backoff cap in seconds
+            deadline: Seconds from construction (or reset) after which no calls are made
+            breaker: Circuit breaker (a default one is created if omitted)
+            sleep: Sleep function
+            clock: Monotonic time source
+            jitter: Returns a float in [0, 1)
+        """
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.deadline = deadline
+        self.deadline_at = clock() + deadline if deadline is not None else None
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.sleep = sleep
+        self.jitter = jitter
+        self.retries = 0
+        # The retry budget is shared by every thread calling through this client
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """
+        Check whether an error is transient.
+
+        Args:
+            error: Exception raised by the API call
+
+        Returns:
+            True if the call should be retried
+        """
+        # Imported here: the SDK is already loaded once an API call has failed
+        from anthropic import APIConnectionError
+
+        if isinstance(error, APIConnectionError):
+            return True
+        status = getattr(error, 'status_code', None)
+        return isinstance(status, int) and (status in RETRYABLE_STATUS or status >= 500)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """
+        Read the server's requested delay from the error response.
+
+        Args:
+            error: Exception raised by the API call
+
+        Returns:
+            Delay in seconds, or None if not provided
+        """
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+        try:
+            if headers.get('retry-after-ms'):
+                return float(headers['retry-after-ms']) / 1000
+            if headers.get('retry-after'):
+                return float(headers['retry-after'])
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    def _remaining(self) -> float:
+        """Seconds left before the run deadline."""
+        if self.deadline_at is None:
+            return float('inf')
+        return self.deadline_at - self.clock()
+
+    def reset(self) -> None:
+        """Start a new run: restart the deadline, refill the retry budget and close the breaker."""
+        with self._lock:
+            self.retries = 0
+            self.deadline_at = self.clock() + self.deadline if self.deadline is not None else None
+        self.breaker.record_success()
+
+    def _take_retry(self) -> bool:
+        """Use one retry of the run's budget, if any is left."""
+        with self._lock:
+            if self.retries >= self.retry_budget:
+                return False
+            self.retries += 1
+            return True
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call an API function with retries.
+
+        Args:
+            func: API function, e.g. client.messages.create
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            Whatever func returns
+
+        Raises:
+            LLMUnavailableError: If the call could not be completed
+        """
+        attempt = 0
+        while True:
+            if self._remaining() <= 0:
+                raise LLMUnavailableError("Run deadline exceeded")
+            if not self.breaker.allow():
+                raise LLMUnavailableError("Circuit breaker open")
+
+            run_metrics.count('api_calls', api='anthropic')
+            try:
+                result = func(*args, **kwargs)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                if not self._is_retryable(e):
+                    self.breaker.release()
+                    raise
+
+                if attempt >= self.max_retries or not self._take_retry():
+                    self.breaker.record_failure()
+                    raise LLMUnavailableError(f"Giving up after {attempt + 1} attempts: {e}") from e
+
+                backoff = self.jitter() * min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = max(backoff, self._retry_after(e) or 0.0)
+                if delay >= self._remaining():
+                    self.breaker.record_failure()
+                    raise LLMUnavailableError(f"Retry would pass run deadline: {e}") from e
+
+                attempt += 1
+                run_metrics.count('api_retries', api='anthropic')
+                logger.warning(f"LLM call failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                self.sleep(delay)
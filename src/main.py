@@ -1,14 +1,31 @@
 """Main orchestrator for Gringotts expense tracker."""
+import argparse
+import json
 import logging
 import sys
-from datetime import datetime
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
 
-from .config import Config
+from .config import (
+    ACCOUNT_WORKERS, BACKFILL_WINDOW_DAYS, DEDUP_INDEX_FILE, METRICS_FILE, PENDING_CATEGORY, PIPELINE_WRITE_BATCH,
+    PROFILE_DIR, PROFILE_TOP, RUN_REPORT_FILE, SERVE_INTERVAL_SECONDS, STATE_DIR, Account, Config, PaymentMode,
+    TxType
+)
 from .email_fetcher import EmailFetcher
-from .parser import TransactionParser
+from .parser import Transaction, TransactionParser
 from .categorizer import TransactionCategorizer
-from .deduplicator import TransactionDeduplicator
-from .sheets import SheetsWriter
+from .llm_client import LLMUnavailableError
+from .deduplicator import TransactionDeduplicator, transaction_fingerprint
+from .dedup_index import DedupIndex
+from .journal import STAGE_ORDER, RunJournal
+from .metrics import run_metrics
+from .pipeline import Pipeline, Stage
+from .profiling import StageProfiler
+from .sinks import MultiSink, create_sinks
 
 
 def setup_logging():
@@ -20,75 +37,454 @@ def setup_logging():
     )
 
 
-def main():
-    """Main entry point for Gringotts."""
-    setup_logging()
+def write_run_report(report: Dict, path: str = RUN_REPORT_FILE) -> None:
+    """
+    Write the machine-readable run report.
+
+    Args:
+        report: Report dictionary
+        path: Output file path
+    """
     logger = logging.getLogger(__name__)
+    try:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        logger.info(f"Run report written to {path}")
+    except Exception as e:
+        logger.warning(f"Failed to write run report: {e}")
 
-    logger.info("=" * 60)
-    logger.info("Gringotts - Automated Expense Tracker")
-    logger.info("=" * 60)
 
+def write_metrics(path: str = METRICS_FILE) -> None:
+    """
+    Write the run's stage timings and counters in OpenMetrics text format.
+
+    Args:
+        path: Output file path
+    """
+    logger = logging.getLogger(__name__)
     try:
-        # 1. Load configuration
-        logger.info("Loading configuration...")
-        config = Config()
+        run_metrics.write_openmetrics(path)
+        logger.info(f"Run metrics written to {path}")
+    except Exception as e:
+        logger.warning(f"Failed to write run metrics: {e}")
 
-        # 2. Initialize components
-        logger.info("Initializing components...")
-        parser = TransactionParser()
-        categorizer = TransactionCategorizer(config.anthropic_api_key)
-        deduplicator = TransactionDeduplicator()
-        sheets_writer = SheetsWriter(
-            config.google_service_account,
-            config.spreadsheet_id
+
+def write_profile(profiler: StageProfiler) -> Dict:
+    """
+    Write the per-stage profiles of a --profile run.
+
+    Args:
+        profiler: Profiler that ran the stages
+
+    Returns:
+        Per-stage profile summary for the run report
+    """
+    logger = logging.getLogger(__name__)
+    profiler.stop()
+    try:
+        return profiler.write()
+    except Exception as e:
+        logger.warning(f"Failed to write profiles: {e}")
+        return {}
+
+
+class TransactionStages:
+    """
+    The parse, dedup, categorize and write stages of a run, with their counters.
+
+    With incremental=True (staged pipeline) every stage works chunk by chunk:
+    in-run dedup carries its keys across chunks and sink writes go out in
+    micro-batches of write_batch rows. 'sweep' dedup needs the whole batch, so
+    in that mode the dedup stage buffers until the input ends.
+
+    `limit`, shared by every account of a run, caps how many stages call the
+    shared categorizer and sinks at the same time.
+    """
+
+    def __init__(
+        self,
+        parser: TransactionParser,
+        deduplicator: TransactionDeduplicator,
+        dedup_index: DedupIndex,
+        categorizer: TransactionCategorizer,
+        sinks: MultiSink,
+        defer: bool = False,
+        incremental: bool = False,
+        write_batch: int = PIPELINE_WRITE_BATCH,
+        limit: Optional[threading.Semaphore] = None
+    ):
+        """
+        Initialize stages.
+
+        Args:
+            parser: Transaction parser
+            deduplicator: In-run deduplicator
+            dedup_index: Cross-run index of written transactions
+            categorizer: Categorizer
+            sinks: Sinks to write to
+            defer: Categorize without the LLM (deferred categorization)
+            incremental: Process chunks as they arrive (staged pipeline)
+            write_batch: Rows per sink write when incremental
+            limit: Semaphore held while categorizing or writing (default: no cap)
+        """
+        self.parser = parser
+        self.deduplicator = deduplicator
+        self.dedup_index = dedup_index
+        self.categorizer = categorizer
+        self.sinks = sinks
+        self.defer = defer
+        self.incremental = incremental
+        self.write_batch = write_batch
+        self.limit = limit or nullcontext()
+
+        self.counts = {'parsed': 0, 'unique': 0, 'written': 0}
+        self.written_by_sink: Counter = Counter()
+        # Unique transactions as parsed, for batch submission in deferred mode
+        self.categorized: List[Transaction] = []
+        self._dedup_keys: set = set()
+        self._dedup_buffer: List[Transaction] = []
+        self._write_buffer: List[Dict] = []
+
+    def stages(self) -> List[Stage]:
+        """
+        Build the pipeline stages.
+
+        Returns:
+            Stages in order
+        """
+        if self.incremental and self.deduplicator.mode == 'bucket':
+            dedup = Stage('dedup', self._dedup_chunk)
+        else:
+            dedup = Stage('dedup', self._buffer_dedup, finish=self._dedup_all)
+        return [
+            Stage('parse', self._parse),
+            dedup,
+            Stage('categorize', self._categorize),
+            Stage('write', self._buffer_write, finish=self._flush_writes)
+        ]
+
+    def _parse(self, emails: List) -> List[Transaction]:
+        """Parse stage: emails -> transactions."""
+        transactions = self.parser.parse_batch(emails)
+        self.counts['parsed'] += len(transactions)
+        return transactions
+
+    def _dedup_chunk(self, transactions: List[Transaction]) -> List[Transaction]:
+        """Dedup stage (incremental): drop transactions seen in earlier runs or chunks."""
+        unique = self.deduplicator.deduplicate(
+            self.dedup_index.filter_new(transactions), seen_keys=self._dedup_keys
         )
+        self.counts['unique'] += len(unique)
+        return unique
 
-        # 3. Fetch emails
-        logger.info("Fetching emails from the last 25 hours...")
-        with EmailFetcher(
-            config.email_address,
-            config.email_password,
-            config.imap_server,
-            config.imap_port
-        ) as fetcher:
-            emails = fetcher.fetch_emails(hours=25)
+    def _buffer_dedup(self, transactions: List[Transaction]) -> List[Transaction]:
+        """Dedup stage (whole batch): collect transactions not written by earlier runs."""
+        self._dedup_buffer.extend(self.dedup_index.filter_new(transactions))
+        return []
 
-        if not emails:
-            logger.info("No emails found. Exiting.")
-            return 0
+    def _dedup_all(self) -> List[Transaction]:
+        """Dedup stage (whole batch): deduplicate everything collected."""
+        unique = self.deduplicator.deduplicate(self._dedup_buffer)
+        self._dedup_buffer = []
+        self.counts['unique'] += len(unique)
+        return unique
+
+    def _categorize(self, transactions: List[Transaction]) -> List[Dict]:
+        """Categorize stage: transactions -> row dictionaries."""
+        self.categorized.extend(transactions)
+        with self.limit:
+            return self.categorizer.categorize_batch(transactions, defer=self.defer)
+
+    def _buffer_write(self, rows: List[Dict]) -> List[Dict]:
+        """Write stage: collect rows, writing a micro-batch once it is full."""
+        self._write_buffer.extend(rows)
+        if self.incremental and len(self._write_buffer) >= self.write_batch:
+            return self._flush_writes()
+        return []
+
+    def _flush_writes(self) -> List[Dict]:
+        """Write stage: write collected rows to every sink and index them."""
+        rows = self.dedup_index.filter_new(self._write_buffer)
+        self._write_buffer = []
+        if not rows:
+            return []
+        with self.limit:
+            written = self.sinks.write(rows)
+        self.dedup_index.add(rows)
+        self.dedup_index.add_pending(rows)
+        self.counts['written'] += max(written.values())
+        self.written_by_sink.update(written)
+        return rows
+
+
+def submit_pending(categorizer: TransactionCategorizer, transactions: List[Transaction]) -> None:
+    """
+    Submit transactions that need the LLM as a batch job, tolerating an outage.
+
+    Args:
+        categorizer: Categorizer
+        transactions: Transactions (ones answerable offline are skipped)
+    """
+    try:
+        categorizer.submit_batch(transactions)
+    except LLMUnavailableError as e:
+        # Rows stay pending; the next back-fill resubmits them
+        logging.getLogger(__name__).warning(f"Could not submit batch: {e}")
+
+
+def _row_transaction(row: Dict) -> Transaction:
+    """Rebuild the Transaction of a written row, for categorization."""
+    return Transaction(
+        amount=row['amount'],
+        tx_type=TxType(row['tx_type']),
+        mode=PaymentMode(row['mode']),
+        merchant=row['merchant'],
+        date=row['date'],
+        raw_text=''
+    )
+
+
+def backfill_categories(
+    categorizer: TransactionCategorizer,
+    sinks: MultiSink,
+    defer: bool = True,
+    dedup_index: Optional[DedupIndex] = None
+) -> int:
+    """
+    Resolve rows written with PENDING_CATEGORY and patch them in place.
+
+    Rows are pending in deferred mode, or when the LLM was unavailable during
+    the run that wrote them. Finished batch results are collected first. Rows
+    the cache or offline classifier still cannot answer are (re)submitted as
+    a batch job to be patched by a later run, or with defer=False sent to the
+    LLM now.
+
+    Args:
+        categorizer: Categorizer holding the cache and batch jobs
+        sinks: Sinks to patch (sinks without pending support are skipped)
+        defer: Leave unresolved rows to the Batches API rather than calling the LLM
+        dedup_index: Index recording which rows were written as pending; sinks
+            are only read when it holds some (default: always read them)
+
+    Returns:
+        Number of rows patched across all sinks
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        categorizer.poll_batches()
+    except Exception as e:
+        # Results are collected by a later run; this one still fetches new mail
+        logger.warning(f"Could not collect batch results: {e}")
+
+    recorded = dedup_index.pending() if dedup_index is not None else None
+    if recorded is not None and not recorded:
+        return 0
+
+    patched = 0
+    unresolved: Dict[str, Dict] = {}
+    for sink in sinks.sinks:
+        rows = sink.pending_rows(recorded.values() if recorded else None)
+        if not rows:
+            continue
+        categorizer.resolve_pending(rows)
+        if not defer:
+            for row in rows:
+                if row['category'] == PENDING_CATEGORY:
+                    # Still pending (and retried next run) if the LLM is down again
+                    row['category'] = categorizer.categorize(_row_transaction(row))
+        categories = {row['id']: row['category'] for row in rows if row['category'] != PENDING_CATEGORY}
+        if categories:
+            patched += sink.update_categories(categories)
+        unresolved.update((row['id'], row) for row in rows if row['category'] == PENDING_CATEGORY)
+
+    if recorded:
+        # Patched, or held by no sink that supports patching
+        dedup_index.clear_pending(fingerprint for fingerprint in recorded if fingerprint not in unresolved)
+    if unresolved and defer:
+        submit_pending(categorizer, [_row_transaction(row) for row in unresolved.values()])
+
+    if patched:
+        logger.info(f"Patched {patched} pending categories")
+    return patched
+
+
+def resume_input(journal: RunJournal, stage: str) -> List:
+    """
+    Output of a completed stage, as input for the stages after it.
+
+    Categorized rows whose write was journaled before the failure are dropped.
+
+    Args:
+        journal: Journal of the failed run
+        stage: Last completed stage
+
+    Returns:
+        Items to feed to the next stage
+    """
+    items = journal.load(stage)
+    if stage == 'categorize':
+        written = set(journal.load('write'))
+        items = [row for row in items if transaction_fingerprint(row) not in written]
+    return items
+
+
+def run_account(
+    account: Account,
+    config: Config,
+    report: Dict,
+    parser: TransactionParser,
+    categorizer: TransactionCategorizer,
+    sheets_pool=None,
+    resume: bool = False,
+    profiler: Optional[StageProfiler] = None,
+    fetcher: Optional[EmailFetcher] = None,
+    window: Optional[Tuple[datetime, datetime]] = None,
+    state_dir: Optional[str] = None,
+    limit: Optional[threading.Semaphore] = None,
+    patch_pending: bool = True
+) -> List[Dict]:
+    """
+    Fetch, parse, deduplicate, categorize and write one account's transactions.
+
+    The parser, categorizer and Sheets pool may be shared with other accounts
+    running at the same time; the dedup index, journal and sinks are the
+    account's own.
+
+    Args:
+        account: Mailbox and destinations
+        config: Run configuration
+        report: Report dictionary for this account, filled in as the run goes
+        parser: Transaction parser
+        categorizer: Categorizer
+        sheets_pool: SheetsClientPool, required if the account writes to Sheets
+        resume: Continue the account's unfinished run from its journal
+        profiler: Profile each stage (--profile)
+        fetcher: IMAP fetcher kept connected between runs (serve mode); by
+            default a connection is opened and closed for this run
+        window: Fetch the days in [start, end) instead of the last 25 hours (backfill)
+        state_dir: Journal directory (default: the account's STATE_DIR)
+        limit: Semaphore shared with the other accounts of the run, held while
+            categorizing or writing (default: no cap)
+        patch_pending: Patch rows left pending by earlier runs before fetching
 
-        # 4. Parse transactions
-        logger.info("Parsing transactions...")
-        transactions = parser.parse_batch(emails)
+    Returns:
+        Rows written (or that would have been, had they been new)
+    """
+    logger = logging.getLogger(__name__)
+    report.setdefault('counts', {})
+    dedup_index = None
+    sinks = None
+
+    try:
+        deduplicator = TransactionDeduplicator(config.dedup_mode, config.dedup_tolerance_minutes)
+        dedup_index = DedupIndex(account.path(DEDUP_INDEX_FILE), horizon_days=config.dedup_horizon_days)
+        dedup_index.prune()
+        sinks = MultiSink(create_sinks(account.sinks, account, sheets_pool))
 
-        if not transactions:
-            logger.info("No transactions parsed from emails. Exiting.")
-            return 0
+        # Patch rows left pending by earlier runs (deferred mode, or an LLM outage)
+        if patch_pending:
+            logger.info(f"Back-filling pending categories ({account.name})...")
+            report['counts']['backfilled'] = backfill_categories(
+                categorizer, sinks, defer=config.defer_categorization, dedup_index=dedup_index
+            )
+
+        # 3-7. Fetch, parse, deduplicate (against previous runs, then within
+        # this run, so the LLM never sees a duplicate), categorize and write
+        stages = TransactionStages(
+            parser, deduplicator, dedup_index, categorizer, sinks,
+            defer=config.defer_categorization,
+            incremental=config.pipeline_mode == 'staged',
+            limit=limit
+        )
+        # Every stage's output is journaled, so a failed run can be resumed
+        journal = RunJournal(state_dir or account.path(STATE_DIR))
+        resume_from = journal.last_completed() if resume else None
+        # A journal only resumes the period it was recorded for
+        period = [window[0].isoformat(), window[1].isoformat()] if window else None
+        if resume_from is not None and journal.get('window') != period:
+            logger.warning(f"Not resuming {account.name}: its unfinished run covered another period")
+            resume_from = None
+        journaled = [journal.journal_stage(stage) for stage in stages.stages()]
+        if profiler:
+            journaled = [profiler.stage(stage) for stage in journaled]
 
-        # 5. Categorize transactions
-        logger.info("Categorizing transactions...")
-        categorized_transactions = categorizer.categorize_batch(transactions)
+        def run_pipeline(stage_list: List[Stage], source) -> List[Dict]:
+            if not stage_list:
+                return []
+            pipeline = Pipeline(stage_list)
+            if config.pipeline_mode == 'staged':
+                return pipeline.run(source)
+            return pipeline.run_inline(source)
 
-        # 6. Deduplicate
-        logger.info("Removing duplicates...")
-        unique_transactions = deduplicator.deduplicate(categorized_transactions)
+        unique_transactions = []
+        emails = []
+        if resume_from is not None:
+            logger.info(f"Resuming unfinished run of {account.name} after its '{resume_from}' stage...")
+            report['resumed_from'] = resume_from
+            resumed_emails = journal.load('fetch')
+            remaining = [stage for stage in journaled
+                         if STAGE_ORDER.index(stage.name) > STAGE_ORDER.index(resume_from)]
+            source = [resume_input(journal, resume_from)]
+            journal.rewind(resume_from)
+            unique_transactions = run_pipeline(remaining, source)
+            dedup_index.mark_seen(resumed_emails, journal.get('uidvalidity'))
+            emails.extend(resumed_emails)
+            # Mail that arrived since the failed run is fetched below, as in any run;
+            # the messages just processed are skipped as seen
+        journal.start()
+        if period:
+            journal.set('window', period)
 
-        if not unique_transactions:
-            logger.info("No unique transactions after deduplication. Exiting.")
-            return 0
+        fetching = f"{window[0]:%Y-%m-%d} to {window[1]:%Y-%m-%d}" if window else "the last 25 hours"
+        logger.info(f"Fetching emails for {account.name} from {fetching} ({config.pipeline_mode} pipeline)...")
+        since, before = window or (None, None)
+        if fetcher is not None:
+            fetcher.ensure_connected()
+            connection = nullcontext(fetcher)
+        else:
+            connection = EmailFetcher(
+                account.email_address,
+                account.email_password,
+                account.imap_server,
+                account.imap_port
+            )
+        fetched_emails = []
+        with connection as fetcher:
+            def source():
+                for batch in fetcher.iter_email_batches(hours=25, seen=dedup_index, since=since, before=before):
+                    fetched_emails.extend(batch)
+                    yield batch
+                journal.set('uidvalidity', fetcher.uidvalidity)
+
+            fetched = journal.journal_source(source())
+            if profiler:
+                fetched = profiler.source(fetched)
+            unique_transactions += run_pipeline(journaled, fetched)
+            dedup_index.mark_seen(fetched_emails, fetcher.uidvalidity)
+        emails.extend(fetched_emails)
+
+        report['counts']['emails'] = len(emails)
+        report['counts'].update(stages.counts)
+        report['written_by_sink'] = dict(stages.written_by_sink)
+
+        if not emails:
+            logger.info(f"No emails found for {account.name}.")
+            journal.clear()
+            return []
 
-        # 7. Write to Google Sheets
-        logger.info("Writing to Google Sheets...")
-        written_count = sheets_writer.append_transactions(unique_transactions)
+        # Rows are out; hand what still needs the LLM to the Batches API
+        if config.defer_categorization:
+            submit_pending(categorizer, stages.categorized)
+        journal.clear()
 
         # 8. Print summary
         logger.info("=" * 60)
-        logger.info("Summary:")
+        logger.info(f"Summary ({account.name}):")
         logger.info(f"  Emails fetched: {len(emails)}")
-        logger.info(f"  Transactions parsed: {len(transactions)}")
-        logger.info(f"  After deduplication: {len(unique_transactions)}")
-        logger.info(f"  Written to Google Sheets: {written_count}")
+        logger.info(f"  Transactions parsed: {stages.counts['parsed']}")
+        logger.info(f"  After deduplication: {stages.counts['unique']}")
+        for name in account.sinks:
+            logger.info(f"  Written to {name}: {stages.written_by_sink.get(name, 0)}")
         logger.info("=" * 60)
 
         # Print transaction breakdown by category
@@ -113,6 +509,250 @@ def main():
         logger.info(f"Total Credits: ₹{total_credit:,.2f}")
         logger.info(f"Net: ₹{total_credit - total_debit:,.2f}")
         logger.info("=" * 60)
+        return unique_transactions
+
+    finally:
+        if dedup_index:
+            dedup_index.close()
+        if sinks:
+            sinks.close()
+
+
+def run_accounts(
+    accounts: List[Account],
+    config: Config,
+    parser: TransactionParser,
+    categorizer: TransactionCategorizer,
+    sheets_pool=None,
+    resume: bool = False,
+    workers: int = ACCOUNT_WORKERS,
+    profiler: Optional[StageProfiler] = None,
+    fetchers: Optional[Dict[str, EmailFetcher]] = None,
+    limit: Optional[threading.Semaphore] = None
+) -> Dict[str, Dict]:
+    """
+    Run several accounts concurrently, sharing the parser, categorizer and Sheets pool.
+
+    A failing account does not stop the others; its error is recorded in its report.
+
+    Args:
+        accounts: Accounts to process
+        config: Run configuration
+        parser: Shared transaction parser
+        categorizer: Shared categorizer (and its cache)
+        sheets_pool: Shared SheetsClientPool
+        resume: Continue unfinished runs from their journals
+        workers: Accounts processed at the same time
+        profiler: Profile each stage (--profile)
+        fetchers: Connected fetchers by account name, reused between runs (serve mode)
+        limit: Semaphore capping concurrent categorize/write calls across accounts
+
+    Returns:
+        Mapping of account name -> account report
+    """
+    logger = logging.getLogger(__name__)
+    reports: Dict[str, Dict] = {account.name: {'counts': {}} for account in accounts}
+    fetchers = fetchers or {}
+
+    def run(account: Account) -> None:
+        try:
+            run_account(
+                account, config, reports[account.name], parser, categorizer, sheets_pool, resume, profiler,
+                fetcher=fetchers.get(account.name), limit=limit
+            )
+        except Exception as e:
+            logger.error(f"Account {account.name} failed: {e}", exc_info=True)
+            reports[account.name]['error'] = str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='account') as pool:
+        list(pool.map(run, accounts))
+    return reports
+
+
+def run_cycle(
+    config: Config,
+    parser: TransactionParser,
+    categorizer: TransactionCategorizer,
+    sheets_pool,
+    report: Dict,
+    resume: bool = False,
+    profiler: Optional[StageProfiler] = None,
+    fetchers: Optional[Dict[str, EmailFetcher]] = None
+) -> bool:
+    """
+    Process every configured account once: a nightly run, or one cycle of `serve`.
+
+    Args:
+        config: Run configuration
+        parser: Transaction parser
+        categorizer: Categorizer
+        sheets_pool: SheetsClientPool, if any account writes to Sheets
+        report: Run report, filled in as the run goes
+        resume: Continue unfinished runs from their journals
+        profiler: Profile each stage (--profile)
+        fetchers: Connected fetchers by account name, reused between runs (serve mode)
+
+    Returns:
+        True if every account succeeded
+
+    Raises:
+        Exception: Whatever a single configured account raised
+    """
+    logger = logging.getLogger(__name__)
+    fetchers = fetchers or {}
+
+    if len(config.accounts) == 1:
+        account = config.accounts[0]
+        run_account(
+            account, config, report, parser, categorizer, sheets_pool, resume, profiler,
+            fetcher=fetchers.get(account.name)
+        )
+    else:
+        logger.info(f"Processing {len(config.accounts)} accounts, {config.account_workers} at a time...")
+        report['accounts'] = run_accounts(
+            config.accounts, config, parser, categorizer, sheets_pool,
+            resume=resume, workers=config.account_workers, profiler=profiler, fetchers=fetchers,
+            limit=threading.BoundedSemaphore(config.client_concurrency)
+        )
+        failed = [name for name, account_report in report['accounts'].items() if 'error' in account_report]
+        if failed:
+            report['error'] = f"Failed accounts: {', '.join(failed)}"
+            logger.error(report['error'])
+            return False
+
+    if categorizer.deferred:
+        logger.info(f"Deferred (LLM unavailable): {len(categorizer.deferred)}")
+    for line in categorizer.stats.summary_lines():
+        logger.info(line)
+    logger.info("=" * 60)
+    return True
+
+
+def finish_report(
+    report: Dict,
+    categorizer: Optional[TransactionCategorizer] = None,
+    profiler: Optional[StageProfiler] = None
+) -> None:
+    """
+    Complete a run's report with categorizer stats, metrics and profiles, and write it out.
+
+    Args:
+        report: Run report
+        categorizer: Categorizer used by the run, if it got that far
+        profiler: Profiler of a --profile run
+    """
+    report['finished_at'] = datetime.now().isoformat()
+    if categorizer:
+        report['categorizer'] = categorizer.stats.to_dict()
+        run_metrics.add_histogram('llm_latency_seconds', categorizer.stats.llm_latency)
+    report.update(run_metrics.to_dict())
+    if profiler:
+        report['profile'] = write_profile(profiler)
+    write_run_report(report)
+    write_metrics()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Main entry point for Gringotts.
+
+    Args:
+        argv: Command-line arguments (default: sys.argv[1:])
+
+    Returns:
+        Process exit code
+    """
+    arg_parser = argparse.ArgumentParser(description="Fetch, categorize and record bank transactions")
+    arg_parser.add_argument(
+        '--resume', action='store_true',
+        help="Continue an unfinished run from its last completed stage"
+    )
+    arg_parser.add_argument(
+        '--profile', action='store_true',
+        help=f"Profile each stage: pstats and collapsed-stack files in {PROFILE_DIR}/, hot functions in the log"
+    )
+    arg_parser.add_argument(
+        '--profile-memory', action='store_true',
+        help="With --profile, also record peak memory per stage (tracemalloc)"
+    )
+    arg_parser.add_argument(
+        '--profile-top', type=int, default=PROFILE_TOP, metavar='N',
+        help="Hot functions listed per stage"
+    )
+    commands = arg_parser.add_subparsers(dest='command', metavar='{serve,backfill}')
+    serve_parser = commands.add_parser(
+        'serve', help="Stay resident and run on a schedule, keeping clients and caches warm"
+    )
+    schedule = serve_parser.add_mutually_exclusive_group()
+    schedule.add_argument(
+        '--interval', type=float, default=SERVE_INTERVAL_SECONDS, metavar='SECONDS',
+        help="Seconds from the start of one run to the next (first run immediately)"
+    )
+    schedule.add_argument(
+        '--cron', metavar='EXPR',
+        help="Five-field cron expression in local time, e.g. '0 2 * * *'"
+    )
+    backfill_parser = commands.add_parser(
+        'backfill', help="Import past transactions, one date window at a time (resumable)"
+    )
+    backfill_parser.add_argument(
+        '--since', type=date.fromisoformat, required=True, metavar='YYYY-MM-DD', help="First day to import"
+    )
+    backfill_parser.add_argument(
+        '--until', type=date.fromisoformat, metavar='YYYY-MM-DD', help="Last day to import (default: today)"
+    )
+    backfill_parser.add_argument(
+        '--window-days', type=int, default=BACKFILL_WINDOW_DAYS, metavar='N', help="Days per window"
+    )
+    args = arg_parser.parse_args(argv)
+
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    logger.info("=" * 60)
+    logger.info("Gringotts - Automated Expense Tracker")
+    logger.info("=" * 60)
+
+    if args.command == 'serve':
+        from .daemon import CronSchedule, Daemon, IntervalSchedule
+        try:
+            schedule = CronSchedule(args.cron) if args.cron else IntervalSchedule(args.interval)
+            return Daemon(schedule).serve()
+        except ValueError as e:
+            logger.error(f"Configuration error: {e}")
+            return 1
+
+    report = {'started_at': datetime.now().isoformat(), 'counts': {}}
+    run_metrics.reset()
+    categorizer = None
+    profiler = None
+    if args.profile or args.profile_memory:
+        profiler = StageProfiler(top=args.profile_top, memory=args.profile_memory)
+        profiler.start()
+
+    try:
+        # 1. Load configuration
+        logger.info("Loading configuration...")
+        config = Config()
+
+        # 2. Initialize components shared by every account
+        logger.info("Initializing components...")
+        parser = TransactionParser()
+        categorizer = TransactionCategorizer(config.anthropic_api_key)
+        sheets_pool = None
+        if config.google_service_account:
+            from .sheets import SheetsClientPool
+            sheets_pool = SheetsClientPool(config.google_service_account)
+
+        if args.command == 'backfill':
+            from .backfill import run_backfill
+            succeeded = run_backfill(
+                config, parser, categorizer, sheets_pool, report, args.since, args.until, args.window_days
+            )
+        else:
+            succeeded = run_cycle(config, parser, categorizer, sheets_pool, report, args.resume, profiler)
+        if not succeeded:
+            return 1
 
         logger.info("Gringotts run completed successfully!")
         return 0
@@ -122,7 +762,10 @@ def main():
         return 1
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
+        report['error'] = str(e)
         return 1
+    finally:
+        finish_report(report, categorizer, profiler)
 
 
 if __name__ == '__main__':
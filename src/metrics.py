@@ -0,0 +1,466 @@
+"""Lightweight metrics: latency histograms, token usage, categorizer counters and run spans."""
+import bisect
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import LLM_PRICE_PER_MTOK, LLM_BATCH_DISCOUNT
+
+# Upper bounds in seconds, Prometheus-style; the last bucket is +Inf
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Stage spans range from sub-millisecond parsing to minutes of fetching
+STAGE_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025) + DEFAULT_LATENCY_BUCKETS + (60.0, 300.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in seconds, optionally keeping every duration."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, keep_samples: bool = False):
+        """
+        Initialize histogram.
+
+        Args:
+            buckets: Sorted bucket upper bounds in seconds
+            keep_samples: Also keep every duration, so percentiles are exact (benchmarks)
+        """
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.samples: Optional[List[float]] = [] if keep_samples else None
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record one duration.
+
+        Args:
+            seconds: Observed duration
+        """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        if self.samples is not None:
+            self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Compute a percentile from the kept samples, or estimate it within its bucket.
+
+        The estimate interpolates linearly across the bucket, narrowed to the
+        observed min and max, so durations clustered in one bucket still get
+        distinct percentiles.
+
+        Args:
+            q: Percentile in [0, 100]
+
+        Returns:
+            Duration, or None if nothing was observed
+        """
+        if not self.count:
+            return None
+
+        if self.samples:
+            ordered = sorted(self.samples)
+            position = q / 100 * (len(ordered) - 1)
+            below = int(position)
+            above = min(below + 1, len(ordered) - 1)
+            return ordered[below] + (ordered[above] - ordered[below]) * (position - below)
+
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = max(self.buckets[i - 1] if i > 0 else 0.0, self.min)
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+        return self.max
+
+    def to_openmetrics(self, name: str) -> List[str]:
+        """
+        Render the histogram as OpenMetrics sample lines.
+
+        Args:
+            name: Metric family name
+
+        Returns:
+            Lines, including the TYPE line
+        """
+        lines = [f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_count {self.count}")
+        lines.append(f"{name}_sum {self.sum:.6f}")
+        return lines
+
+    def to_dict(self) -> Dict:
+        """
+        Summarize the histogram.
+
+        Returns:
+            JSON-serializable summary
+        """
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1]
+            }
+        }
+
+
+@dataclass
+class LLMUsage:
+    """Token usage accumulated from Messages API responses."""
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+
+    def add(self, usage) -> None:
+        """
+        Accumulate a response's usage block.
+
+        Args:
+            usage: The `usage` field of a Messages API response
+        """
+        self.calls += 1
+        for name in ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+            value = getattr(usage, name, None)
+            if isinstance(value, int):
+                setattr(self, name, getattr(self, name) + value)
+
+    def cost_usd(self, discount: float = 1.0) -> float:
+        """
+        Estimate spend from token counts.
+
+        Args:
+            discount: Price multiplier (e.g. LLM_BATCH_DISCOUNT)
+
+        Returns:
+            Cost in US dollars
+        """
+        prices = LLM_PRICE_PER_MTOK
+        cost = (
+            self.input_tokens * prices['input']
+            + self.output_tokens * prices['output']
+            + self.cache_read_input_tokens * prices['cache_read']
+            + self.cache_creation_input_tokens * prices['cache_write']
+        ) / 1_000_000
+        return cost * discount
+
+    def to_dict(self, discount: float = 1.0) -> Dict:
+        """
+        Summarize usage.
+
+        Args:
+            discount: Price multiplier for the cost estimate
+
+        Returns:
+            JSON-serializable summary
+        """
+        return {
+            'calls': self.calls,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cache_read_input_tokens': self.cache_read_input_tokens,
+            'cache_creation_input_tokens': self.cache_creation_input_tokens,
+            'cost_usd': round(self.cost_usd(discount), 6)
+        }
+
+
+# Categorization tiers, in the order they are tried
+TIERS = ('credit_heuristic', 'rule', 'cache', 'model', 'llm', 'deferred')
+
+
+@dataclass
+class CategorizerStats:
+    """
+    Per-run counters for TransactionCategorizer.
+
+    Accounts processed in parallel share one categorizer, so updates go
+    through the locked methods below.
+    """
+    tiers: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    llm_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    usage: LLMUsage = field(default_factory=LLMUsage)
+    batch_usage: LLMUsage = field(default_factory=LLMUsage)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def count_tier(self, tier: str) -> None:
+        """Count a transaction answered by a tier."""
+        with self._lock:
+            self.tiers[tier] += 1
+
+    def count_error(self, kind: str) -> None:
+        """Count an LLM error."""
+        with self._lock:
+            self.errors[kind] += 1
+
+    def record_call(self, seconds: float, usage) -> None:
+        """
+        Record a synchronous LLM call.
+
+        Args:
+            seconds: Call latency
+            usage: The `usage` field of the response
+        """
+        with self._lock:
+            self.llm_latency.observe(seconds)
+            self.usage.add(usage)
+
+    def record_batch_result(self, usage) -> None:
+        """Record the usage of one Message Batches result."""
+        with self._lock:
+            self.batch_usage.add(usage)
+
+    def to_dict(self) -> Dict:
+        """
+        Summarize the run.
+
+        Returns:
+            JSON-serializable summary
+        """
+        with self._lock:
+            return {
+                'tiers': {tier: self.tiers.get(tier, 0) for tier in TIERS},
+                'errors': dict(self.errors),
+                'llm_latency_seconds': self.llm_latency.to_dict(),
+                'usage': self.usage.to_dict(),
+                'batch_usage': self.batch_usage.to_dict(LLM_BATCH_DISCOUNT)
+            }
+
+    def summary_lines(self) -> List[str]:
+        """
+        Human-readable summary for logs.
+
+        Returns:
+            List of lines
+        """
+        lines = ["Categorization tiers:"]
+        lines += [f"  {tier}: {self.tiers.get(tier, 0)}" for tier in TIERS]
+        if self.llm_latency.count:
+            lines.append(
+                f"LLM latency: p50 {self.llm_latency.percentile(50):.2f}s, "
+                f"p95 {self.llm_latency.percentile(95):.2f}s over {self.llm_latency.count} calls"
+            )
+        if self.usage.calls:
+            lines.append(
+                f"LLM tokens: {self.usage.input_tokens} input / {self.usage.output_tokens} output / "
+                f"{self.usage.cache_read_input_tokens} cache-read, ~${self.usage.cost_usd():.4f}"
+            )
+        if self.errors:
+            lines.append("LLM errors: " + ", ".join(f"{k}={v}" for k, v in sorted(self.errors.items())))
+        return lines
+
+
+@dataclass
+class Span:
+    """One timed unit of work; set `items` to the number of items handled."""
+    name: str
+    items: int = 0
+
+
+@dataclass
+class StageTiming:
+    """Accumulated spans of one stage."""
+    calls: int = 0
+    seconds: float = 0.0
+    items: int = 0
+    errors: int = 0
+    latency: LatencyHistogram = field(default_factory=lambda: LatencyHistogram(STAGE_LATENCY_BUCKETS))
+
+    def to_dict(self) -> Dict:
+        """
+        Summarize the stage.
+
+        Returns:
+            JSON-serializable summary
+        """
+        return {
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'items': self.items,
+            'items_per_second': round(self.items / self.seconds, 3) if self.seconds else None,
+            'errors': self.errors,
+            'p50_seconds': self.latency.percentile(50),
+            'p95_seconds': self.latency.percentile(95),
+            'p99_seconds': self.latency.percentile(99)
+        }
+
+
+class RunMetrics:
+    """
+    Per-run stage spans and labelled counters, safe to use from pipeline threads.
+
+    Components record into the module-level `run_metrics` instance; main()
+    resets it at the start of a run and exports it at the end.
+    """
+
+    PREFIX = 'gringotts'
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self._lock = threading.Lock()
+        self.stages: Dict[str, StageTiming] = {}
+        self.counters: Counter = Counter()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        # Keep every span duration for exact percentiles (benchmarks)
+        self.keep_samples = False
+
+    def reset(self) -> None:
+        """Drop everything recorded so far."""
+        with self._lock:
+            self.stages = {}
+            self.counters = Counter()
+            self.histograms = {}
+
+    @contextmanager
+    def span(self, name: str, items: int = 0) -> Iterator[Span]:
+        """
+        Time a block of work under a stage name.
+
+        Args:
+            name: Stage name, e.g. 'fetch'
+            items: Items handled (can also be set on the yielded Span)
+
+        Yields:
+            Span whose `items` can be updated inside the block
+        """
+        span = Span(name, items)
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield span
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                timing = self.stages.get(name)
+                if timing is None:
+                    timing = self.stages[name] = StageTiming(
+                        latency=LatencyHistogram(STAGE_LATENCY_BUCKETS, keep_samples=self.keep_samples)
+                    )
+                timing.calls += 1
+                timing.seconds += elapsed
+                timing.items += span.items
+                timing.errors += int(failed)
+                timing.latency.observe(elapsed)
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: Counter name, e.g. 'api_calls'
+            value: Amount to add
+            **labels: Label values, e.g. api='sheets'
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def add_histogram(self, name: str, histogram: LatencyHistogram) -> None:
+        """
+        Include a histogram (e.g. LLM latency) in the export.
+
+        Args:
+            name: Metric name without prefix
+            histogram: Histogram to export
+        """
+        with self._lock:
+            self.histograms[name] = histogram
+
+    @staticmethod
+    def _labels(labels: Tuple) -> str:
+        """Render labels as {k="v",...} (empty string if none)."""
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+    def to_dict(self) -> Dict:
+        """
+        Summarize the run.
+
+        Returns:
+            JSON-serializable summary
+        """
+        with self._lock:
+            counters: Dict[str, Dict[str, float]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                label = ','.join(f'{k}={v}' for k, v in labels) or 'total'
+                counters.setdefault(name, {})[label] = value
+            return {
+                'stages': {name: timing.to_dict() for name, timing in self.stages.items()},
+                'counters': counters
+            }
+
+    def to_openmetrics(self) -> str:
+        """
+        Render everything in the OpenMetrics text format.
+
+        Returns:
+            Exposition text, terminated by '# EOF'
+        """
+        prefix = self.PREFIX
+        lines = []
+        with self._lock:
+            for metric, attribute, unit in (
+                ('stage_seconds', 'seconds', 'seconds'),
+                ('stage_items', 'items', None),
+                ('stage_calls', 'calls', None),
+                ('stage_errors', 'errors', None),
+            ):
+                lines.append(f"# TYPE {prefix}_{metric} counter")
+                if unit:
+                    lines.append(f"# UNIT {prefix}_{metric} {unit}")
+                for name, timing in self.stages.items():
+                    lines.append(f'{prefix}_{metric}_total{{stage="{name}"}} {getattr(timing, attribute)}')
+
+            families: Dict[str, List[str]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                families.setdefault(name, []).append(f"{prefix}_{name}_total{self._labels(labels)} {value}")
+            for name, samples in families.items():
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                lines.extend(samples)
+
+            for name, histogram in self.histograms.items():
+                lines.extend(histogram.to_openmetrics(f"{prefix}_{name}"))
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str) -> None:
+        """
+        Write the OpenMetrics exposition to a file.
+
+        Args:
+            path: Output file path
+        """
+        with open(path, 'w') as f:
+            f.write(self.to_openmetrics())
+
+
+# Shared by all components of a run
+run_metrics = RunMetrics()
@@ -7,6 +7,7 @@ import logging
 from email.header import decode_header
 
 from .config import PATTERNS, SUBJECT_PATTERNS, TxType, PaymentMode
+from .metrics import run_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -254,10 +255,11 @@ class TransactionParser:
             List of Transaction objects
         """
         transactions = []
-        for raw_email in emails:
-            transaction = self.parse(raw_email.body, raw_email.date, raw_email.subject)
-            if transaction:
-                transactions.append(transaction)
+        with run_metrics.span('parse', len(emails)):
+            for raw_email in emails:
+                transaction = self.parse(raw_email.body, raw_email.date, raw_email.subject)
+                if transaction:
+                    transactions.append(transaction)
 
         logger.info(f"Parsed {len(transactions)} transactions from {len(emails)} emails")
         return transactions
@@ -0,0 +1,219 @@
+"""Staged pipeline: each stage is a worker thread, connected by bounded queues.
+
+Chunks flow from a source iterator through the stages in order, so parsing
+starts on the first fetched chunk and LLM calls overlap with fetching. Bounded
+queues keep a fast stage from running far ahead of a slow one. The same
+stages can run inline (one chunk holding everything, stage after stage),
+which is the batch path.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from .config import PIPELINE_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+class PipelineStopped(Exception):
+    """Raised inside workers when another stage has failed."""
+
+
+class Stage:
+    """One pipeline step."""
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[List], List],
+        finish: Optional[Callable[[], List]] = None
+    ):
+        """
+        Initialize stage.
+
+        Args:
+            name: Stage name, for logs and errors
+            process: Maps an input chunk to an output chunk (may be empty)
+            finish: Called once after the last chunk; returns items still
+                buffered by the stage (e.g. a partial micro-batch)
+        """
+        self.name = name
+        self.process = process
+        self.finish = finish
+        self.chunks = 0
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_seconds = 0.0
+
+    def _timed(self, func: Callable, *args) -> List:
+        """Run process/finish, recording busy time and item counts."""
+        started = time.perf_counter()
+        output = func(*args) or []
+        self.busy_seconds += time.perf_counter() - started
+        self.items_out += len(output)
+        return output
+
+    def run_chunk(self, chunk: List) -> List:
+        """Process one chunk."""
+        self.chunks += 1
+        self.items_in += len(chunk)
+        return self._timed(self.process, chunk)
+
+    def run_finish(self) -> List:
+        """Flush buffered items at end of input."""
+        return self._timed(self.finish) if self.finish else []
+
+
+class Pipeline:
+    """Runs stages over chunks from a source, threaded or inline."""
+
+    def __init__(self, stages: Sequence[Stage], queue_size: int = PIPELINE_QUEUE_SIZE,
+                 poll_interval: float = 0.1):
+        """
+        Initialize pipeline.
+
+        Args:
+            stages: Stages in order
+            queue_size: Maximum chunks waiting between two stages
+            poll_interval: Seconds between checks for a failed stage while blocked
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def run_inline(self, source: Iterable[List]) -> List:
+        """
+        Batch path: gather the whole source, then run each stage once over it.
+
+        Args:
+            source: Iterable of chunks
+
+        Returns:
+            Output items of the last stage
+        """
+        items = [item for chunk in source for item in chunk]
+        for stage in self.stages:
+            items = (stage.run_chunk(items) if items else []) + stage.run_finish()
+        self._log_stats()
+        return items
+
+    def run(self, source: Iterable[List]) -> List:
+        """
+        Run the source and every stage in their own threads.
+
+        Args:
+            source: Iterable of chunks, consumed in a worker thread
+
+        Returns:
+            Output items of the last stage, in order
+
+        Raises:
+            Exception: The first error raised by the source or a stage, after
+                every worker has stopped
+        """
+        self._stop.clear()
+        self._error = None
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results: queue.Queue = queue.Queue()
+        outboxes = queues[1:] + [results]
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), name='pipeline-source')]
+        threads += [
+            threading.Thread(target=self._work, args=(stage, inbox, outbox), name=f'pipeline-{stage.name}')
+            for stage, inbox, outbox in zip(self.stages, queues, outboxes)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+        output = []
+        while True:
+            chunk = results.get_nowait()
+            if chunk is _DONE:
+                break
+            output.extend(chunk)
+        self._log_stats()
+        return output
+
+    def _fail(self, where: str, error: BaseException) -> None:
+        """Record the first error and tell every worker to stop."""
+        with self._error_lock:
+            if self._error is None:
+                logger.error(f"Pipeline stage {where} failed: {error}")
+                self._error = error
+        self._stop.set()
+
+    def _put(self, outbox: queue.Queue, item) -> None:
+        """Put with back-pressure, giving up if the pipeline is stopping."""
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                outbox.put(item, timeout=self.poll_interval)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, inbox: queue.Queue):
+        """Get the next chunk, giving up if the pipeline is stopping."""
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                return inbox.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+
+    def _feed(self, source: Iterable[List], outbox: queue.Queue) -> None:
+        """Source worker: push chunks into the first queue."""
+        try:
+            for chunk in source:
+                if chunk:
+                    self._put(outbox, list(chunk))
+            self._put(outbox, _DONE)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail('source', e)
+
+    def _work(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        """Stage worker: process chunks until end of stream."""
+        try:
+            while True:
+                chunk = self._get(inbox)
+                if chunk is _DONE:
+                    break
+                output = stage.run_chunk(chunk)
+                if output:
+                    self._put(outbox, output)
+            output = stage.run_finish()
+            if output:
+                self._put(outbox, output)
+            self._put(outbox, _DONE)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(stage.name, e)
+
+    def _log_stats(self) -> None:
+        """Log per-stage throughput."""
+        for stage in self.stages:
+            logger.info(
+                f"Stage {stage.name}: {stage.items_in} in / {stage.items_out} out "
+                f"in {stage.chunks} chunk(s), busy {stage.busy_seconds:.2f}s"
+            )
@@ -0,0 +1,289 @@
+"""Per-stage profiling for --profile: cProfile stats, sampled stacks and memory peaks.
+
+Each pipeline stage (and the fetch source) is run under its own cProfile
+profiler; calls of the same stage are merged into one pstats file. A
+background thread samples the stacks of threads running a stage, which gives
+collapsed-stack files for flamegraph tools (flamegraph.pl, speedscope).
+With memory=True, tracemalloc records each stage's peak allocation and what
+its largest call allocated, by source line.
+
+From Python 3.12 only one cProfile profiler can be active in a process, so
+profiled calls run one at a time, even in the staged pipeline or with several
+accounts. Stage timings of such runs lose their overlap; tracemalloc peaks
+still include allocations of threads outside a stage, so memory figures are
+exact in single-account batch runs and approximate otherwise.
+"""
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from pathlib import Path
+from types import FrameType
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_TOP
+from .pipeline import Stage
+
+logger = logging.getLogger(__name__)
+
+# Held by every profiled call: cProfile allows one active profiler per process (3.12+)
+_PROFILE_LOCK = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    """Collapsed-stack label of a frame: module:function."""
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Samples the Python stacks of threads that are inside a stage."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        """
+        Initialize sampler.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        # Stage name -> Counter of 'outer;...;inner' stacks
+        self.stacks: Dict[str, Counter] = defaultdict(Counter)
+        # Thread ident -> (stage name, frame the stage was entered from)
+        self._active: Dict[int, Tuple[str, FrameType]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the sampling thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the sampling thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def enter(self, stage: str, root: FrameType) -> None:
+        """Start attributing the calling thread's samples to a stage."""
+        self._active[threading.get_ident()] = (stage, root)
+
+    def exit(self) -> None:
+        """Stop attributing the calling thread's samples."""
+        self._active.pop(threading.get_ident(), None)
+
+    def _sample_loop(self) -> None:
+        """Thread body: sample until stopped."""
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """Record the current stack of every thread inside a stage."""
+        frames = sys._current_frames()
+        for ident, (stage, root) in list(self._active.items()):
+            frame = frames.get(ident)
+            labels = []
+            while frame is not None and frame is not root:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[stage][';'.join(reversed(labels))] += 1
+
+
+class StageProfiler:
+    """Profiles pipeline stages and writes per-stage reports."""
+
+    def __init__(
+        self,
+        output_dir: str = PROFILE_DIR,
+        top: int = PROFILE_TOP,
+        memory: bool = False,
+        sample_interval: float = PROFILE_SAMPLE_INTERVAL
+    ):
+        """
+        Initialize profiler.
+
+        Args:
+            output_dir: Directory for the per-stage files
+            top: Hot functions logged (and reported) per stage
+            memory: Track peak memory per stage with tracemalloc
+            sample_interval: Seconds between stack samples
+        """
+        self.output_dir = Path(output_dir)
+        self.top = top
+        self.memory = memory
+        self.sampler = StackSampler(sample_interval)
+        self.stats: Dict[str, pstats.Stats] = {}
+        self.calls: Counter = Counter()
+        self.peak_memory: Dict[str, int] = {}
+        # Stage -> allocation growth by line during its largest call
+        self.memory_growth: Dict[str, List[tracemalloc.StatisticDiff]] = {}
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        """Start sampling (and memory tracing)."""
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling (and memory tracing, if started here)."""
+        self.sampler.stop()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def run(self, name: str, func: Callable, *args):
+        """
+        Call func(*args) as part of a stage, profiling it.
+
+        Waits for profiled calls in other threads to finish first.
+
+        Args:
+            name: Stage name
+            func: Stage function
+            *args: Its arguments
+
+        Returns:
+            What func returns
+        """
+        with _PROFILE_LOCK:
+            tracing = self.memory and tracemalloc.is_tracing()
+            if tracing:
+                before = tracemalloc.take_snapshot()
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            profile = cProfile.Profile()
+            self.sampler.enter(name, sys._getframe())
+            profile.enable()
+            try:
+                return func(*args)
+            finally:
+                profile.disable()
+                self.sampler.exit()
+                with self._lock:
+                    self.calls[name] += 1
+                    if name in self.stats:
+                        self.stats[name].add(profile)
+                    else:
+                        self.stats[name] = pstats.Stats(profile)
+                if tracing:
+                    self._record_memory(name, tracemalloc.get_traced_memory()[1] - baseline, before)
+
+    def _record_memory(self, name: str, peak: int, before: tracemalloc.Snapshot) -> None:
+        """Keep a stage's highest peak, with what that call allocated."""
+        with self._lock:
+            if peak <= self.peak_memory.get(name, -1):
+                return
+            self.peak_memory[name] = peak
+        growth = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+        with self._lock:
+            self.memory_growth[name] = growth[:self.top]
+
+    def stage(self, stage: Stage) -> Stage:
+        """
+        Wrap a pipeline stage so its process and finish calls are profiled.
+
+        Args:
+            stage: Stage to wrap
+
+        Returns:
+            Stage with the same name
+        """
+        def process(chunk: List) -> List:
+            return self.run(stage.name, stage.process, chunk)
+
+        def finish() -> List:
+            return self.run(stage.name, stage.finish)
+
+        return Stage(stage.name, process, finish=finish if stage.finish else None)
+
+    def source(self, source: Iterable[List], name: str = 'fetch') -> Iterator[List]:
+        """
+        Profile the production of each chunk of a pipeline source.
+
+        Args:
+            source: Iterable of chunks
+            name: Stage name to report the source under
+
+        Yields:
+            The source's chunks
+        """
+        iterator = iter(source)
+        while True:
+            try:
+                chunk = self.run(name, next, iterator)
+            except StopIteration:
+                return
+            yield chunk
+
+    def hot_functions(self, name: str) -> List[Dict]:
+        """
+        Functions with the most own time in a stage.
+
+        Args:
+            name: Stage name
+
+        Returns:
+            Up to `top` entries of function, calls, own and cumulative seconds
+        """
+        entries = []
+        for func, (_, ncalls, tottime, cumtime, _) in self.stats[name].stats.items():
+            entries.append({
+                'function': pstats.func_std_string(pstats.func_strip_path(func)),
+                'calls': ncalls,
+                'seconds': round(tottime, 6),
+                'cumulative_seconds': round(cumtime, 6)
+            })
+        entries.sort(key=lambda entry: entry['seconds'], reverse=True)
+        return entries[:self.top]
+
+    def write(self) -> Dict[str, Dict]:
+        """
+        Write each stage's pstats, collapsed-stack and memory files, and log its hot functions.
+
+        Returns:
+            Mapping of stage -> summary for the run report
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        summary = {}
+        for name in self.stats:
+            stats_path = self.output_dir / f'{name}.pstats'
+            self.stats[name].dump_stats(stats_path)
+            stacks_path = self.output_dir / f'{name}.collapsed'
+            with open(stacks_path, 'w') as f:
+                for stack, count in self.sampler.stacks[name].most_common():
+                    f.write(f"{stack} {count}\n")
+
+            hot = self.hot_functions(name)
+            summary[name] = {
+                'calls': self.calls[name],
+                'seconds': round(self.stats[name].total_tt, 6),
+                'samples': sum(self.sampler.stacks[name].values()),
+                'pstats_file': str(stats_path),
+                'collapsed_file': str(stacks_path),
+                'hot_functions': hot
+            }
+
+            logger.info(f"Profile of stage {name}: {self.calls[name]} call(s), {self.stats[name].total_tt:.3f}s")
+            if name in self.peak_memory:
+                memory_path = self.output_dir / f'{name}.memory.txt'
+                memory_path.write_text(''.join(f"{stat}\n" for stat in self.memory_growth.get(name, [])))
+                summary[name]['peak_memory_bytes'] = self.peak_memory[name]
+                summary[name]['memory_file'] = str(memory_path)
+                logger.info(f"  Peak memory: {self.peak_memory[name] / 2 ** 20:.1f} MiB")
+            logger.info(f"  {'own s':>9} {'cum s':>9} {'calls':>8}  function")
+            for entry in hot:
+                logger.info(
+                    f"  {entry['seconds']:>9.3f} {entry['cumulative_seconds']:>9.3f} "
+                    f"{entry['calls']:>8}  {entry['function']}"
+                )
+        logger.info(f"Profiles written to {self.output_dir}/")
+        return summary
@@ -1,119 +1,312 @@
 """Google Sheets writer for transaction data."""
 import json
 import logging
-from typing import Dict, List
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from .config import (
+    SHEETS_MAX_ROWS_PER_REQUEST, SHEETS_MAX_RETRIES, SHEETS_WRITES_PER_MINUTE,
+    PENDING_CATEGORY, PENDING_LOOKBACK_MONTHS
+)
+from .deduplicator import transaction_fingerprint
+from .metrics import run_metrics
+from .sheets_client import SheetsRequestExecutor
+from .sheets_discovery import load_document
+from .sinks import TransactionSink
+
 logger = logging.getLogger(__name__)
 
+# Rows a new tab starts with (matches the Sheets UI default)
+DEFAULT_GRID_ROWS = 1000
+
+
+def a1_range(sheet_name: str, cells: str) -> str:
+    """
+    Build an A1 range with a quoted sheet name.
+
+    Args:
+        sheet_name: Tab title
+        cells: Cell range, e.g. 'A2:F10'
 
-class SheetsWriter:
+    Returns:
+        Range such as "'January 2026'!A2:F10"
+    """
+    return "'{}'!{}".format(sheet_name.replace("'", "''"), cells)
+
+
+class SheetsWriter(TransactionSink):
     """Writes transactions to Google Sheets with monthly tabs."""
 
+    name = 'sheets'
     SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-    HEADER_ROW = ['Date', 'Amount', 'Credit/Debit', 'Mode', 'Category', 'Merchant']
-
-    def __init__(self, credentials_json: str, spreadsheet_id: str):
+    # The last column holds the transaction fingerprint and is hidden
+    HEADER_ROW = ['Date', 'Amount', 'Credit/Debit', 'Mode', 'Category', 'Merchant', 'Transaction ID']
+    ID_COLUMN = 'G'
+    ID_COLUMN_INDEX = 6
+
+    def __init__(
+        self,
+        credentials_json: str,
+        spreadsheet_id: str,
+        service=None,
+        executor: Optional[SheetsRequestExecutor] = None,
+        pool: Optional['SheetsClientPool'] = None
+    ):
         """
         Initialize Sheets writer.
 
         Args:
             credentials_json: JSON string of service account credentials
             spreadsheet_id: Google Sheet ID
+            service: Prebuilt Sheets service (skips authentication)
+            executor: Request executor (retries and write quota)
+            pool: Pool the service is returned to on close()
         """
         self.spreadsheet_id = spreadsheet_id
+        self._credentials_json = credentials_json
+        self._service = service
+        self._pool = pool
+        self.executor = executor or SheetsRequestExecutor(
+            max_retries=SHEETS_MAX_RETRIES,
+            writes_per_minute=SHEETS_WRITES_PER_MINUTE
+        )
+
+        # Tab metadata, fetched once per writer: title -> sheetId / grid rows
+        self._sheet_ids: Optional[Dict[str, int]] = None
+        self._grid_rows: Dict[str, int] = {}
+        # Rows in use per tab (header included), read once per tab then tracked
+        self._used_rows: Dict[str, int] = {}
+        # Tab -> transaction fingerprint -> row number, from the hidden ID column
+        self._row_index: Dict[str, Dict[str, int]] = {}
+        # Existing tabs that predate the ID column
+        self._needs_id_header: set = set()
+        # Transaction fingerprint -> (tab, row) of rows found by pending_rows()
+        self._pending_cells: Dict[str, tuple] = {}
+
+    @property
+    def service(self):
+        """Sheets service, authenticated and built on first use."""
+        if self._service is None:
+            self._service = self._build_service()
+        return self._service
+
+    def _build_service(self):
+        """
+        Authenticate and build the Sheets service from the bundled discovery document.
+
+        Returns:
+            Sheets v4 service
+        """
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build_from_document
 
-        # Parse credentials
         try:
-            creds_dict = json.loads(credentials_json)
+            creds_dict = json.loads(self._credentials_json)
             credentials = service_account.Credentials.from_service_account_info(
                 creds_dict, scopes=self.SCOPES
             )
-            self.service = build('sheets', 'v4', credentials=credentials)
+            service = build_from_document(load_document(), credentials=credentials)
             logger.info("Successfully authenticated with Google Sheets")
+            return service
         except Exception as e:
             logger.error(f"Failed to authenticate with Google Sheets: {e}")
             raise
 
-    def _get_existing_sheets(self) -> List[str]:
+    def _get_existing_sheets(self) -> Dict[str, int]:
         """
-        Get list of existing sheet names.
+        Get existing sheets, fetching spreadsheet metadata only on first use.
 
         Returns:
-            List of sheet names
+            Mapping of sheet name -> sheetId
         """
-        try:
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
+        if self._sheet_ids is not None:
+            return self._sheet_ids
 
-            sheet_names = [sheet['properties']['title'] for sheet in spreadsheet['sheets']]
-            return sheet_names
+        try:
+            spreadsheet = self.executor.execute(lambda: self.service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                fields='sheets.properties(sheetId,title,gridProperties.rowCount)'
+            ))
+
+            self._sheet_ids = {}
+            for sheet in spreadsheet.get('sheets', []):
+                properties = sheet['properties']
+                self._sheet_ids[properties['title']] = properties['sheetId']
+                self._grid_rows[properties['title']] = properties.get('gridProperties', {}).get(
+                    'rowCount', DEFAULT_GRID_ROWS
+                )
+            return self._sheet_ids
         except HttpError as e:
             logger.error(f"Error fetching spreadsheet metadata: {e}")
             raise
 
-    def _create_sheet(self, sheet_name: str) -> None:
+    def _load_tab_index(self, sheet_names: List[str]) -> None:
         """
-        Create a new sheet with header row.
+        Read row counts and transaction IDs of existing tabs with one batchGet.
+
+        Only column A (to count rows) and the hidden ID column are read.
 
         Args:
-            sheet_name: Name of the sheet to create
+            sheet_names: Existing tabs that are not indexed yet
         """
+        if not sheet_names:
+            return
+
+        ranges = []
+        for name in sheet_names:
+            ranges.append(a1_range(name, 'A:A'))
+            ranges.append(a1_range(name, f"{self.ID_COLUMN}:{self.ID_COLUMN}"))
+
         try:
-            # Create sheet
-            request_body = {
-                'requests': [{
-                    'addSheet': {
-                        'properties': {
-                            'title': sheet_name
-                        }
-                    }
-                }]
+            response = self.executor.execute(lambda: self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=ranges,
+                majorDimension='COLUMNS',
+                fields='valueRanges(values)'
+            ))
+        except HttpError as e:
+            logger.error(f"Error reading transaction IDs: {e}")
+            raise
+
+        value_ranges = response.get('valueRanges', [])
+        for i, name in enumerate(sheet_names):
+            dates = value_ranges[2 * i].get('values', []) if 2 * i < len(value_ranges) else []
+            ids = value_ranges[2 * i + 1].get('values', []) if 2 * i + 1 < len(value_ranges) else []
+            dates = dates[0] if dates else []
+            ids = ids[0] if ids else []
+
+            self._used_rows[name] = len(dates)
+            header = self.HEADER_ROW[self.ID_COLUMN_INDEX]
+            self._row_index[name] = {
+                fingerprint: row
+                for row, fingerprint in enumerate(ids, start=1)
+                if fingerprint and fingerprint != header
             }
+            if dates and (not ids or ids[0] != header):
+                self._needs_id_header.add(name)
 
-            self.service.spreadsheets().batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body=request_body
-            ).execute()
+    def _prepare_sheets(self, rows_needed: Dict[str, int]) -> None:
+        """
+        Make sure every target tab exists and has room, in a single batchUpdate.
 
-            logger.info(f"Created sheet: {sheet_name}")
+        Missing tabs are created with a header row; tabs whose grid is too
+        small for the new rows are extended.
 
-            # Add header row
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A1:F1",
-                valueInputOption='RAW',
-                body={'values': [self.HEADER_ROW]}
-            ).execute()
+        Args:
+            rows_needed: Mapping of sheet name -> number of rows to be written
+        """
+        existing = self._get_existing_sheets()
+        missing = [name for name in rows_needed if name not in existing]
+        self._load_tab_index([name for name in rows_needed if name in existing and name not in self._used_rows])
+
+        # Choose sheetIds up front so header rows can go in the same request
+        next_id = max(existing.values(), default=0) + 1
+        new_ids = {name: next_id + i for i, name in enumerate(missing)}
+
+        requests = []
+        for name, sheet_id in new_ids.items():
+            requests.append({
+                'addSheet': {
+                    'properties': {
+                        'sheetId': sheet_id,
+                        'title': name,
+                        'gridProperties': {'rowCount': max(DEFAULT_GRID_ROWS, 1 + rows_needed[name])}
+                    }
+                }
+            })
+            requests.append({
+                'updateCells': {
+                    'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                    'rows': [{
+                        'values': [{'userEnteredValue': {'stringValue': h}} for h in self.HEADER_ROW]
+                    }],
+                    'fields': 'userEnteredValue'
+                }
+            })
+            requests.append(self._hide_id_column_request(sheet_id))
+
+        # Tabs written before the ID column existed get its header and are hidden
+        upgraded = [name for name in rows_needed if name in self._needs_id_header]
+        for name in upgraded:
+            requests.append({
+                'updateCells': {
+                    'start': {'sheetId': existing[name], 'rowIndex': 0, 'columnIndex': self.ID_COLUMN_INDEX},
+                    'rows': [{
+                        'values': [{'userEnteredValue': {'stringValue': self.HEADER_ROW[self.ID_COLUMN_INDEX]}}]
+                    }],
+                    'fields': 'userEnteredValue'
+                }
+            })
+            requests.append(self._hide_id_column_request(existing[name]))
+
+        grow = {}
+        for name in rows_needed:
+            if name in existing:
+                shortfall = self._used_rows[name] + rows_needed[name] - self._grid_rows[name]
+                if shortfall > 0:
+                    grow[name] = shortfall
+                    requests.append({
+                        'appendDimension': {
+                            'sheetId': existing[name],
+                            'dimension': 'ROWS',
+                            'length': shortfall
+                        }
+                    })
 
-            logger.info(f"Added header row to {sheet_name}")
+        if not requests:
+            return
 
+        try:
+            self.executor.execute(lambda: self.service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'requests': requests}
+            ), write=True)
         except HttpError as e:
-            logger.error(f"Error creating sheet {sheet_name}: {e}")
+            logger.error(f"Error preparing sheets: {e}")
+            # Metadata may be stale (e.g. a tab created concurrently)
+            self._sheet_ids = None
+            self._used_rows = {}
+            self._row_index = {}
             raise
 
-    def _get_or_create_sheet(self, month_year: str) -> str:
+        for name, sheet_id in new_ids.items():
+            existing[name] = sheet_id
+            self._grid_rows[name] = max(DEFAULT_GRID_ROWS, 1 + rows_needed[name])
+            self._used_rows[name] = 1
+            self._row_index[name] = {}
+        self._needs_id_header.difference_update(upgraded)
+        for name, shortfall in grow.items():
+            self._grid_rows[name] += shortfall
+
+        if missing:
+            logger.info(f"Created sheets with header rows: {', '.join(missing)}")
+
+    def _hide_id_column_request(self, sheet_id: int) -> Dict:
         """
-        Get or create sheet for a given month.
+        Build the batchUpdate request hiding the transaction ID column.
 
         Args:
-            month_year: Month and year string (e.g., "January 2026")
+            sheet_id: Tab sheetId
 
         Returns:
-            Sheet name
+            updateDimensionProperties request
         """
-        existing_sheets = self._get_existing_sheets()
-
-        if month_year not in existing_sheets:
-            logger.info(f"Sheet '{month_year}' doesn't exist, creating it")
-            self._create_sheet(month_year)
-
-        return month_year
+        return {
+            'updateDimensionProperties': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'dimension': 'COLUMNS',
+                    'startIndex': self.ID_COLUMN_INDEX,
+                    'endIndex': self.ID_COLUMN_INDEX + 1
+                },
+                'properties': {'hiddenByUser': True},
+                'fields': 'hiddenByUser'
+            }
+        }
 
     @staticmethod
     def _format_transaction_row(tx: Dict) -> List:
@@ -132,23 +325,37 @@ class SheetsWriter:
             tx['tx_type'],                           # Credit/Debit
             tx['mode'],                              # UPI/Card/NEFT/Wallet
             tx['category'],                          # LLM-assigned category
-            tx['merchant'] or 'Unknown'              # Merchant name
+            tx['merchant'] or 'Unknown',             # Merchant name
+            transaction_fingerprint(tx)              # Hidden transaction ID
         ]
 
-    def append_transactions(self, transactions: List[Dict]) -> int:
+    def append_transactions(self, transactions: List[Dict], update_existing: bool = False) -> int:
         """
         Append transactions to appropriate monthly sheets.
 
+        Rows are keyed by a transaction fingerprint in the hidden ID column, so
+        transactions already in their month's tab are skipped (or rewritten in
+        place with update_existing) instead of appended again. Rows for every
+        month go out in a single values().batchUpdate against precomputed
+        ranges, split into several requests only for large batches.
+
         Args:
             transactions: List of transaction dictionaries
+            update_existing: Overwrite rows already in the sheet instead of skipping them
 
         Returns:
-            Number of transactions written
+            Number of rows appended or updated
         """
         if not transactions:
             logger.info("No transactions to write")
             return 0
 
+        with run_metrics.span('write_sheets') as span:
+            span.items = self._append(transactions, update_existing)
+        return span.items
+
+    def _append(self, transactions: List[Dict], update_existing: bool) -> int:
+        """Write or update rows for append_transactions(); returns rows written."""
         # Group transactions by month
         transactions_by_month: Dict[str, List[Dict]] = {}
         for tx in transactions:
@@ -157,30 +364,268 @@ class SheetsWriter:
                 transactions_by_month[month_year] = []
             transactions_by_month[month_year].append(tx)
 
-        # Write to each monthly sheet
+        # Create missing tabs and grow full ones in one request (sized for the
+        # worst case where every transaction is new)
+        self._prepare_sheets({name: len(txs) for name, txs in transactions_by_month.items()})
+
+        # New rows go below the rows already in use, known rows are updated in place
+        pending: List[Dict] = []
+        skipped = 0
+        for sheet_name, month_transactions in transactions_by_month.items():
+            index = self._row_index[sheet_name]
+            new_rows = []
+            start_row = self._used_rows[sheet_name] + 1
+            for tx in month_transactions:
+                row = self._format_transaction_row(tx)
+                fingerprint = row[self.ID_COLUMN_INDEX]
+                if fingerprint in index:
+                    if update_existing:
+                        pending.append({'sheet': sheet_name, 'start': index[fingerprint], 'values': [row]})
+                    else:
+                        skipped += 1
+                    continue
+                index[fingerprint] = start_row + len(new_rows)
+                new_rows.append(row)
+
+            if new_rows:
+                pending.append({'sheet': sheet_name, 'start': start_row, 'values': new_rows})
+                self._used_rows[sheet_name] = start_row + len(new_rows) - 1
+
+        if skipped:
+            logger.info(f"Skipped {skipped} transactions already in the sheet")
+
         total_written = 0
-        for month_year, month_transactions in transactions_by_month.items():
+        while pending:
+            data = self._take_chunk(pending)
+            started = time.perf_counter()
             try:
-                # Get or create sheet
-                sheet_name = self._get_or_create_sheet(month_year)
-
-                # Format rows
-                rows = [self._format_transaction_row(tx) for tx in month_transactions]
-
-                # Append to sheet
-                self.service.spreadsheets().values().append(
+                self.executor.execute(lambda: self.service.spreadsheets().values().batchUpdate(
                     spreadsheetId=self.spreadsheet_id,
-                    range=f"{sheet_name}!A:F",
-                    valueInputOption='RAW',
-                    insertDataOption='INSERT_ROWS',
-                    body={'values': rows}
-                ).execute()
-
-                logger.info(f"Wrote {len(rows)} transactions to {sheet_name}")
-                total_written += len(rows)
-
+                    body={'valueInputOption': 'RAW', 'data': data}
+                ), write=True)
             except HttpError as e:
-                logger.error(f"Error writing to sheet {month_year}: {e}")
+                logger.error(f"Error writing to sheets: {e}")
+                # Tracked row counts and IDs can no longer be trusted
+                self._used_rows = {}
+                self._row_index = {}
                 raise
+            elapsed = time.perf_counter() - started
+
+            rows_in_request = self._consume(pending, data)
+            logger.info(
+                f"Wrote {rows_in_request} transactions to {len(data)} range(s) in {elapsed:.2f}s "
+                f"({rows_in_request / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+            total_written += rows_in_request
 
         return total_written
+
+    def write(self, transactions: List[Dict]) -> int:
+        """Sink interface: append transactions, skipping rows already in the sheet."""
+        return self.append_transactions(transactions)
+
+    def close(self) -> None:
+        """Return the service to the pool, if the writer came from one."""
+        if self._pool is not None and self._service is not None:
+            self._pool.release(self._service)
+            self._service = None
+
+    def pending_rows(
+        self, dates: Optional[Iterable[datetime]] = None, months: int = PENDING_LOOKBACK_MONTHS
+    ) -> List[Dict]:
+        """
+        Find rows written with PENDING_CATEGORY in monthly tabs.
+
+        Args:
+            dates: Dates of the transactions recorded as written pending; only
+                their months' tabs are scanned, however old
+            months: Without dates, number of monthly tabs to scan, counting
+                back from this month
+
+        Returns:
+            Transaction dictionaries (with 'id') whose category is pending
+        """
+        existing = self._get_existing_sheets()
+        if dates is not None:
+            candidates = [
+                datetime(year, month, 1).strftime('%B %Y')
+                for year, month in sorted({(date.year, date.month) for date in dates}, reverse=True)
+            ]
+        else:
+            candidates = []
+            year, month = datetime.now().year, datetime.now().month
+            for _ in range(months):
+                candidates.append(datetime(year, month, 1).strftime('%B %Y'))
+                year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        titles = [title for title in candidates if title in existing]
+
+        if not titles:
+            return []
+
+        try:
+            response = self.executor.execute(lambda: self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=[a1_range(title, 'A:G') for title in titles],
+                valueRenderOption='UNFORMATTED_VALUE',
+                fields='valueRanges(values)'
+            ))
+        except HttpError as e:
+            logger.error(f"Error reading pending rows: {e}")
+            raise
+
+        rows = []
+        for title, value_range in zip(titles, response.get('valueRanges', [])):
+            for row_number, values in enumerate(value_range.get('values', []), start=1):
+                if len(values) <= self.ID_COLUMN_INDEX or values[4] != PENDING_CATEGORY:
+                    continue
+                rows.append({
+                    'id': values[6],
+                    'date': datetime.strptime(values[0], '%Y-%m-%d %H:%M'),
+                    'amount': float(values[1]),
+                    'tx_type': values[2],
+                    'mode': values[3],
+                    'category': values[4],
+                    'merchant': values[5]
+                })
+                self._pending_cells[values[6]] = (title, row_number)
+
+        logger.info(f"Found {len(rows)} pending rows in {len(titles)} sheet(s)")
+        return rows
+
+    def update_categories(self, categories: Dict[str, str]) -> int:
+        """
+        Patch the Category cell of rows found by pending_rows(), in one request.
+
+        Args:
+            categories: Mapping of transaction fingerprint -> category
+
+        Returns:
+            Number of cells updated
+        """
+        data = [
+            {'range': a1_range(title, f"E{row}"), 'values': [[category]]}
+            for fingerprint, category in categories.items()
+            if fingerprint in self._pending_cells
+            for title, row in [self._pending_cells[fingerprint]]
+        ]
+        if not data:
+            return 0
+
+        try:
+            self.executor.execute(lambda: self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'valueInputOption': 'RAW', 'data': data}
+            ), write=True)
+        except HttpError as e:
+            logger.error(f"Error updating categories: {e}")
+            raise
+
+        for fingerprint in categories:
+            self._pending_cells.pop(fingerprint, None)
+        logger.info(f"Updated {len(data)} pending categories")
+        return len(data)
+
+    @staticmethod
+    def _take_chunk(pending: List[Dict]) -> List[Dict]:
+        """
+        Build the value ranges of the next write request from pending writes.
+
+        Takes pending writes in order, up to SHEETS_MAX_ROWS_PER_REQUEST rows,
+        splitting the last one if needed. Nothing is removed from `pending`.
+
+        Args:
+            pending: Writes as {'sheet', 'start', 'values'}
+
+        Returns:
+            ValueRange dictionaries for values().batchUpdate
+        """
+        data = []
+        budget = SHEETS_MAX_ROWS_PER_REQUEST
+        for write in pending:
+            if budget <= 0:
+                break
+            values = write['values'][:budget]
+            end_row = write['start'] + len(values) - 1
+            data.append({
+                'range': a1_range(write['sheet'], f"A{write['start']}:G{end_row}"),
+                'values': values
+            })
+            budget -= len(values)
+        return data
+
+    @staticmethod
+    def _consume(pending: List[Dict], data: List[Dict]) -> int:
+        """
+        Remove written rows from the pending writes.
+
+        Args:
+            pending: Writes as {'sheet', 'start', 'values'}
+            data: ValueRanges that were written, as built by _take_chunk
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        for value_range in data:
+            count = len(value_range['values'])
+            write = pending[0]
+            if count == len(write['values']):
+                pending.pop(0)
+            else:
+                write['values'] = write['values'][count:]
+                write['start'] += count
+            written += count
+        return written
+
+
+class SheetsClientPool:
+    """
+    Sheets services and one request executor shared by the writers of several accounts.
+
+    Building and authenticating a service is the expensive part of a writer,
+    and a service must not be used by two threads at once, so each writer
+    borrows an idle service (or builds one on first use) and gives it back on
+    close(). The executor is shared because the write quota belongs to the
+    service account, not to a spreadsheet.
+    """
+
+    def __init__(self, credentials_json: str, executor: Optional[SheetsRequestExecutor] = None):
+        """
+        Initialize an empty pool.
+
+        Args:
+            credentials_json: JSON string of service account credentials
+            executor: Shared request executor (retries and write quota)
+        """
+        self.credentials_json = credentials_json
+        self.executor = executor or SheetsRequestExecutor(
+            max_retries=SHEETS_MAX_RETRIES,
+            writes_per_minute=SHEETS_WRITES_PER_MINUTE
+        )
+        self._idle: List = []
+        self._lock = threading.Lock()
+
+    def writer(self, spreadsheet_id: str) -> SheetsWriter:
+        """
+        Create a writer that borrows a pooled service.
+
+        Args:
+            spreadsheet_id: Google Sheet ID
+
+        Returns:
+            SheetsWriter; close it to return the service
+        """
+        with self._lock:
+            service = self._idle.pop() if self._idle else None
+        return SheetsWriter(self.credentials_json, spreadsheet_id, service=service,
+                            executor=self.executor, pool=self)
+
+    def release(self, service) -> None:
+        """
+        Return a service for reuse.
+
+        Args:
+            service: Service built or borrowed by a writer
+        """
+        with self._lock:
+            self._idle.append(service)
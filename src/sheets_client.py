@@ -0,0 +1,196 @@
+"""Quota-aware executor for Google Sheets API requests: retries and write rate limiting."""
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from googleapiclient.errors import HttpError
+
+from .metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, capacity: float, rate: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a full bucket.
+
+        Args:
+            capacity: Maximum tokens (burst size)
+            rate: Tokens added per second
+            clock: Monotonic time source
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def _refill(self) -> None:
+        """Add the tokens accrued since the last update."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """Consume one token (call once wait_time() is zero)."""
+        self._refill()
+        self.tokens -= 1
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the server reports the quota as exhausted."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class SheetsRequestExecutor:
+    """
+    Executes Sheets API requests with exponential backoff and a write quota.
+
+    Only 429 and 5xx responses are retried, with full-jitter backoff that
+    honors retry-after. Write requests additionally take a token from a bucket
+    sized to the per-minute write quota, and a 429 drains the bucket so the
+    following writes slow down too. Other errors, and errors left after the
+    last retry, are re-raised unchanged.
+
+    Requests are passed as builders called once per attempt, so every retry
+    sends a freshly built request object.
+
+    The write quota belongs to the service account, so writers for several
+    spreadsheets can share one executor; quota waits and the retry and
+    throttling counters are serialized.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 64.0,
+        writes_per_minute: float = 60,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        jitter: Callable[[], float] = random.random
+    ):
+        """
+        Initialize executor.
+
+        Args:
+            max_retries: Retries per request
+            base_delay: Initial backoff in seconds
+            max_delay: Backoff cap in seconds
+            writes_per_minute: Write requests allowed per minute
+            sleep: Sleep function
+            clock: Monotonic time source
+            jitter: Returns a float in [0, 1)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.write_quota = TokenBucket(writes_per_minute, writes_per_minute / 60, clock)
+        self._quota_lock = threading.Lock()
+        self.sleep = sleep
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self.jitter = jitter
+
+    @staticmethod
+    def _status(error: Exception) -> Optional[int]:
+        """HTTP status of a googleapiclient error, if any."""
+        if not isinstance(error, HttpError):
+            return None
+        return getattr(error.resp, 'status', None)
+
+    @classmethod
+    def _is_retryable(cls, error: Exception) -> bool:
+        """
+        Check whether an error is a quota or server error.
+
+        Args:
+            error: Exception raised by execute()
+
+        Returns:
+            True if the request should be retried
+        """
+        status = cls._status(error)
+        return isinstance(status, int) and (status == 429 or status >= 500)
+
+    @staticmethod
+    def _retry_after(error: HttpError) -> Optional[float]:
+        """
+        Read the server's requested delay from the error response.
+
+        Args:
+            error: HttpError raised by execute()
+
+        Returns:
+            Delay in seconds, or None if not provided
+        """
+        try:
+            value = error.resp.get('retry-after')
+            return float(value) if value else None
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def _wait_for_quota(self) -> None:
+        """Block until the write quota allows another request, then take it."""
+        with self._quota_lock:
+            delay = self.write_quota.wait_time()
+            if delay > 0:
+                logger.info(f"Sheets write quota reached, waiting {delay:.1f}s")
+                self.throttled_seconds += delay
+                run_metrics.count('throttled_seconds', delay, api='sheets')
+                self.sleep(delay)
+            self.write_quota.take()
+
+    def execute(self, build: Callable[[], Any], write: bool = False) -> Any:
+        """
+        Build and execute a request with retries.
+
+        Args:
+            build: Returns a request object with execute(), e.g.
+                lambda: service.spreadsheets().get(...); called on every attempt
+            write: Whether the request counts against the write quota
+
+        Returns:
+            The response of execute()
+
+        Raises:
+            HttpError: If the request fails with a non-retryable error or
+                keeps failing after max_retries
+        """
+        attempt = 0
+        while True:
+            if write:
+                self._wait_for_quota()
+
+            run_metrics.count('api_calls', api='sheets')
+            try:
+                with run_metrics.span('sheets_request', items=1):
+                    return build().execute()
+            except Exception as e:
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                with self._quota_lock:
+                    if self._status(e) == 429:
+                        self.write_quota.drain()
+                    self.retries += 1
+
+                backoff = self.jitter() * min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = max(backoff, self._retry_after(e) or 0.0)
+                attempt += 1
+                run_metrics.count('api_retries', api='sheets')
+                logger.warning(
+                    f"Sheets request failed (HTTP {self._status(e)}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                self.sleep(delay)
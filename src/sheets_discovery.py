@@ -0,0 +1,91 @@
+"""Bundled, trimmed Sheets v4 discovery document.
+
+discovery.build() loads the full Sheets discovery document (~300 KB) and
+renders docstrings for every method and schema the first time a resource is
+used. SheetsWriter only needs a handful of methods, so a trimmed document is
+bundled and passed to build_from_document(): no network access and almost no
+parsing at startup.
+
+Regenerate after upgrading google-api-python-client:
+    python -m src.sheets_discovery
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+DOCUMENT_FILE = Path(__file__).with_name('sheets_v4_discovery.json')
+
+# Resource path -> methods used by SheetsWriter
+METHODS = {
+    ('spreadsheets',): ['get', 'batchUpdate'],
+    ('spreadsheets', 'values'): ['append', 'update', 'batchUpdate', 'batchGet'],
+}
+
+
+def trim_document(document: Dict) -> Dict:
+    """
+    Keep only the methods in METHODS and stub out their schemas.
+
+    Request and response bodies are not validated client-side, so each
+    referenced schema is reduced to a bare object.
+
+    Args:
+        document: Full discovery document
+
+    Returns:
+        Trimmed discovery document
+    """
+    trimmed = {key: value for key, value in document.items() if key not in ('resources', 'schemas', 'methods')}
+    trimmed['parameters'] = {
+        name: {k: v for k, v in param.items() if k not in ('description', 'enumDescriptions')}
+        for name, param in document.get('parameters', {}).items()
+    }
+    trimmed['resources'] = {}
+    schemas = set()
+
+    for path, method_names in METHODS.items():
+        source, target = document, trimmed
+        for name in path:
+            source = source['resources'][name]
+            target = target['resources'].setdefault(name, {'resources': {}})
+        target['methods'] = {}
+        for method_name in method_names:
+            method = dict(source['methods'][method_name])
+            method.pop('description', None)
+            method['parameters'] = {
+                name: {k: v for k, v in param.items() if k not in ('description', 'enumDescriptions')}
+                for name, param in method.get('parameters', {}).items()
+            }
+            for body in ('request', 'response'):
+                if body in method:
+                    schemas.add(method[body]['$ref'])
+            target['methods'][method_name] = method
+
+    trimmed['schemas'] = {name: {'id': name, 'type': 'object'} for name in sorted(schemas)}
+    return trimmed
+
+
+def load_document() -> str:
+    """
+    Read the bundled discovery document.
+
+    Returns:
+        Discovery document as a JSON string, for build_from_document()
+    """
+    return DOCUMENT_FILE.read_text()
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Regenerate the bundled document from the installed client library."""
+    import googleapiclient
+
+    source = Path(googleapiclient.__file__).parent / 'discovery_cache' / 'documents' / 'sheets.v4.json'
+    document = trim_document(json.loads(source.read_text()))
+    DOCUMENT_FILE.write_text(json.dumps(document, indent=1, sort_keys=True) + '\n')
+    print(f"Wrote {DOCUMENT_FILE} ({DOCUMENT_FILE.stat().st_size} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""Destinations for categorized transactions: the sink interface and local backends.
+
+SheetsWriter is the Google Sheets sink. The local sinks write the same rows to
+a SQLite ledger, a CSV file or a Parquet file (requires pyarrow), for offline
+analytics and network-free runs. All sinks are keyed by transaction
+fingerprint, so writing the same transaction twice leaves one row.
+"""
+import csv
+import logging
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .config import SQLITE_LEDGER_FILE, CSV_LEDGER_FILE, PARQUET_LEDGER_FILE, PENDING_CATEGORY
+from .deduplicator import transaction_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Column order shared by the local sinks
+LEDGER_COLUMNS = ['id', 'date', 'amount', 'tx_type', 'mode', 'category', 'merchant']
+
+
+def ledger_row(tx: Dict) -> Dict:
+    """
+    Flatten a categorized transaction for the local sinks.
+
+    Args:
+        tx: Transaction dictionary
+
+    Returns:
+        Dictionary with LEDGER_COLUMNS keys
+    """
+    return {
+        'id': transaction_fingerprint(tx),
+        'date': tx['date'].strftime('%Y-%m-%d %H:%M'),
+        'amount': tx['amount'],
+        'tx_type': tx['tx_type'],
+        'mode': tx['mode'],
+        'category': tx['category'],
+        'merchant': tx['merchant'] or 'Unknown'
+    }
+
+
+class TransactionSink(ABC):
+    """Destination for categorized transactions."""
+
+    name = 'sink'
+
+    @abstractmethod
+    def write(self, transactions: List[Dict]) -> int:
+        """
+        Write transactions, skipping ones the sink already holds.
+
+        Args:
+            transactions: List of transaction dictionaries
+
+        Returns:
+            Number of transactions written
+        """
+
+    def pending_rows(self, dates: Optional[Iterable[datetime]] = None) -> List[Dict]:
+        """
+        Rows written with PENDING_CATEGORY, for sinks that support patching.
+
+        Args:
+            dates: Dates of the transactions recorded as written pending, so a
+                sink can limit its scan to them (default: scan recent rows)
+
+        Returns:
+            Transaction dictionaries with an 'id' (fingerprint) key
+        """
+        return []
+
+    def update_categories(self, categories: Dict[str, str]) -> int:
+        """
+        Replace the category of rows returned by pending_rows().
+
+        Args:
+            categories: Mapping of transaction fingerprint -> category
+
+        Returns:
+            Number of rows updated
+        """
+        return 0
+
+    def close(self) -> None:
+        """Flush and release resources."""
+
+
+class SQLiteSink(TransactionSink):
+    """SQLite ledger indexed on date, merchant and category."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = SQLITE_LEDGER_FILE):
+        """
+        Open (or create) the ledger.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        # Written from a MultiSink worker thread, one thread at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS transactions ('
+            'id TEXT PRIMARY KEY, date TEXT NOT NULL, amount REAL NOT NULL, tx_type TEXT NOT NULL, '
+            'mode TEXT NOT NULL, category TEXT NOT NULL, merchant TEXT NOT NULL'
+            ')'
+        )
+        for column in ('date', 'merchant', 'category'):
+            self.connection.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_transactions_{column} ON transactions({column})'
+            )
+        self.connection.commit()
+
+    def write(self, transactions: List[Dict]) -> int:
+        """Insert transactions, ignoring known fingerprints."""
+        before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR IGNORE INTO transactions ({', '.join(LEDGER_COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in LEDGER_COLUMNS)})",
+                [ledger_row(tx) for tx in transactions]
+            )
+        written = self.connection.total_changes - before
+        logger.info(f"Wrote {written} transactions to {self.path}")
+        return written
+
+    def pending_rows(self, dates: Optional[Iterable[datetime]] = None) -> List[Dict]:
+        """Rows whose category is still pending (the category index makes dates unnecessary)."""
+        self.connection.row_factory = sqlite3.Row
+        try:
+            rows = self.connection.execute(
+                'SELECT * FROM transactions WHERE category = ?', (PENDING_CATEGORY,)
+            ).fetchall()
+        finally:
+            self.connection.row_factory = None
+        return [
+            dict(row, date=datetime.strptime(row['date'], '%Y-%m-%d %H:%M'))
+            for row in rows
+        ]
+
+    def update_categories(self, categories: Dict[str, str]) -> int:
+        """Set categories by fingerprint, in one transaction."""
+        before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE transactions SET category = ? WHERE id = ?',
+                [(category, fingerprint) for fingerprint, category in categories.items()]
+            )
+        return self.connection.total_changes - before
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+
+class CSVSink(TransactionSink):
+    """Append-only CSV file with a header row (pending categories are not patched)."""
+
+    name = 'csv'
+
+    def __init__(self, path: str = CSV_LEDGER_FILE):
+        """
+        Initialize sink.
+
+        Args:
+            path: CSV file, created with a header on first write
+        """
+        self.path = Path(path)
+        self._ids = None
+
+    def _known_ids(self) -> set:
+        """Fingerprints already in the file, read on first write."""
+        if self._ids is None:
+            self._ids = set()
+            if self.path.exists():
+                with open(self.path, newline='') as f:
+                    self._ids = {row['id'] for row in csv.DictReader(f)}
+        return self._ids
+
+    def write(self, transactions: List[Dict]) -> int:
+        """Append transactions not yet in the file."""
+        known = self._known_ids()
+        rows = []
+        for tx in transactions:
+            row = ledger_row(tx)
+            if row['id'] not in known:
+                known.add(row['id'])
+                rows.append(row)
+
+        new_file = not self.path.exists()
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=LEDGER_COLUMNS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+        logger.info(f"Wrote {len(rows)} transactions to {self.path}")
+        return len(rows)
+
+
+class ParquetSink(TransactionSink):
+    """
+    Parquet file, rewritten on every write.
+
+    Parquet files cannot be appended to, so the existing rows are read on
+    first write and the whole file is replaced before new rows are reported
+    as written. Pending categories are not patched. Requires pyarrow.
+    """
+
+    name = 'parquet'
+
+    def __init__(self, path: str = PARQUET_LEDGER_FILE):
+        """
+        Initialize sink.
+
+        Args:
+            path: Parquet file
+
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The Parquet sink requires pyarrow (pip install pyarrow)") from e
+        self.path = Path(path)
+        self._rows = None
+
+    def _known_rows(self) -> Dict[str, Dict]:
+        """Rows already in the file by fingerprint, read on first write."""
+        if self._rows is None:
+            import pyarrow.parquet as pq
+
+            self._rows = {}
+            if self.path.exists():
+                self._rows = {row['id']: row for row in pq.read_table(self.path).to_pylist()}
+        return self._rows
+
+    def write(self, transactions: List[Dict]) -> int:
+        """Rewrite the file with transactions not yet in it."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        known = self._known_rows()
+        fresh: Dict[str, Dict] = {}
+        for tx in transactions:
+            row = ledger_row(tx)
+            if row['id'] not in known:
+                fresh.setdefault(row['id'], row)
+        if not fresh:
+            return 0
+
+        # Written aside and renamed, so a failed write leaves the old file intact
+        partial = self.path.with_name(self.path.name + '.partial')
+        pq.write_table(pa.Table.from_pylist(list(known.values()) + list(fresh.values())), partial)
+        os.replace(partial, self.path)
+        known.update(fresh)
+
+        logger.info(f"Wrote {len(fresh)} transactions to {self.path}")
+        return len(fresh)
+
+
+class MultiSink:
+    """Writes to several sinks concurrently."""
+
+    def __init__(self, sinks: Sequence[TransactionSink]):
+        """
+        Initialize fan-out.
+
+        Args:
+            sinks: Sinks to write to
+        """
+        if not sinks:
+            raise ValueError("At least one sink is required")
+        self.sinks = list(sinks)
+
+    def write(self, transactions: List[Dict]) -> Dict[str, int]:
+        """
+        Write transactions to every sink in parallel.
+
+        Every sink gets its chance to write even if another one fails.
+
+        Args:
+            transactions: List of transaction dictionaries
+
+        Returns:
+            Mapping of sink name -> transactions written
+
+        Raises:
+            Exception: The first sink error, after all sinks have finished
+        """
+        if len(self.sinks) == 1:
+            return {self.sinks[0].name: self.sinks[0].write(transactions)}
+
+        with ThreadPoolExecutor(max_workers=len(self.sinks)) as pool:
+            futures = [(sink, pool.submit(sink.write, transactions)) for sink in self.sinks]
+
+        results, errors = {}, []
+        for sink, future in futures:
+            try:
+                results[sink.name] = future.result()
+            except Exception as e:
+                logger.error(f"Sink {sink.name} failed: {e}")
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return results
+
+    def close(self) -> None:
+        """Close every sink."""
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.warning(f"Failed to close sink {sink.name}: {e}")
+
+
+def create_sinks(names: Sequence[str], account=None, sheets_pool=None) -> List[TransactionSink]:
+    """
+    Build sinks by name.
+
+    Args:
+        names: Sink names: 'sheets', 'sqlite', 'csv' or 'parquet'
+        account: Account whose spreadsheet and ledger files to use
+            (default: the default ledger files)
+        sheets_pool: SheetsClientPool, required for 'sheets'
+
+    Returns:
+        List of sinks
+    """
+    def path(default: str) -> str:
+        return account.path(default) if account else default
+
+    sinks = []
+    for name in names:
+        if name == 'sheets':
+            sinks.append(sheets_pool.writer(account.spreadsheet_id))
+        elif name == 'sqlite':
+            sinks.append(SQLiteSink(path(SQLITE_LEDGER_FILE)))
+        elif name == 'csv':
+            sinks.append(CSVSink(path(CSV_LEDGER_FILE)))
+        elif name == 'parquet':
+            sinks.append(ParquetSink(path(PARQUET_LEDGER_FILE)))
+        else:
+            raise ValueError(f"Unknown sink: {name}")
+    return sinks
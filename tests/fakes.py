@@ -0,0 +1,347 @@
+"""In-memory stand-ins for external services used by tests and benchmarks."""
+import itertools
+import re
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+
+def _text_message(text: str, input_tokens: int = 0) -> SimpleNamespace:
+    """Build an object shaped like an Anthropic Message with one text block."""
+    return SimpleNamespace(
+        content=[SimpleNamespace(type='text', text=text)],
+        usage=SimpleNamespace(
+            input_tokens=input_tokens,
+            output_tokens=1,
+            cache_read_input_tokens=0,
+            cache_creation_input_tokens=0
+        )
+    )
+
+
+def _prompt_tokens(params: Dict) -> int:
+    """Rough token count of a request (4 characters per token)."""
+    text = ''.join(block['text'] for block in params.get('system', []))
+    text += ''.join(message['content'] for message in params['messages'])
+    return len(text) // 4
+
+
+class FakeBatches:
+    """Imitates the Message Batches endpoint (client.messages.batches)."""
+
+    def __init__(self, responder: Callable[[Dict], str], polls_until_ended: int = 1):
+        """
+        Args:
+            responder: Maps request params to the reply text
+            polls_until_ended: retrieve() calls before a batch reports 'ended'
+        """
+        self.responder = responder
+        self.polls_until_ended = polls_until_ended
+        self.batches: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+
+    def create(self, requests: List[Dict]) -> SimpleNamespace:
+        batch_id = f"msgbatch_{next(self._ids):04d}"
+        self.batches[batch_id] = {'requests': list(requests), 'polls': 0}
+        return SimpleNamespace(id=batch_id, processing_status='in_progress')
+
+    def retrieve(self, batch_id: str) -> SimpleNamespace:
+        batch = self.batches[batch_id]
+        batch['polls'] += 1
+        ended = batch['polls'] >= self.polls_until_ended
+        return SimpleNamespace(id=batch_id, processing_status='ended' if ended else 'in_progress')
+
+    def results(self, batch_id: str):
+        for request in self.batches[batch_id]['requests']:
+            yield SimpleNamespace(
+                custom_id=request['custom_id'],
+                result=SimpleNamespace(
+                    type='succeeded',
+                    message=_text_message(
+                        self.responder(request['params']), _prompt_tokens(request['params'])
+                    )
+                )
+            )
+
+
+class FakeMessages:
+    """Imitates client.messages with a synchronous create() and batches."""
+
+    def __init__(self, responder: Callable[[Dict], str], polls_until_ended: int = 1):
+        self.responder = responder
+        self.calls: List[Dict] = []
+        self.batches = FakeBatches(responder, polls_until_ended)
+
+    def create(self, **params) -> SimpleNamespace:
+        self.calls.append(params)
+        return _text_message(self.responder(params), _prompt_tokens(params))
+
+
+class FakeAnthropic:
+    """Minimal Anthropic client stand-in."""
+
+    def __init__(self, responder: Callable[[Dict], str] = lambda params: "Other", polls_until_ended: int = 1):
+        self.messages = FakeMessages(responder, polls_until_ended)
+
+
+class FakeIMAP:
+    """imaplib.IMAP4_SSL stand-in serving an in-memory INBOX."""
+
+    def __init__(self, messages: List[bytes], uidvalidity: str = '1', first_uid: int = 101,
+                 latency: float = 0.0, bandwidth: float = None):
+        """
+        Args:
+            messages: RFC822 message bytes, in arrival order
+            uidvalidity: Mailbox UIDVALIDITY
+            first_uid: UID of the first message
+            latency: Seconds added to every UID command (round trip)
+            bandwidth: Bytes per second for FETCH responses (None: unlimited)
+        """
+        self.mailbox = {str(first_uid + i): raw for i, raw in enumerate(messages)}
+        self.uidvalidity = uidvalidity
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.commands: List[tuple] = []
+
+    def login(self, user: str, password: str):
+        return 'OK', [b'Logged in']
+
+    def select(self, mailbox: str = 'INBOX'):
+        self.commands.append(('SELECT', mailbox))
+        return 'OK', [str(len(self.mailbox)).encode()]
+
+    def response(self, code: str):
+        if code == 'UIDVALIDITY':
+            return code, [self.uidvalidity.encode()]
+        return code, [None]
+
+    def uid(self, command: str, *args):
+        self.commands.append((command,) + args)
+        if self.latency:
+            time.sleep(self.latency)
+        if command == 'SEARCH':
+            return 'OK', [' '.join(self.mailbox).encode()]
+        if command == 'FETCH':
+            data = []
+            for uid in args[0].split(','):
+                raw = self.mailbox[uid]
+                data.append((f'{uid} (UID {uid} RFC822 {{{len(raw)}}}'.encode(), raw))
+                data.append(b')')
+            if self.bandwidth:
+                time.sleep(sum(len(part[1]) for part in data if isinstance(part, tuple)) / self.bandwidth)
+            return 'OK', data
+        raise NotImplementedError(command)
+
+    def noop(self):
+        self.commands.append(('NOOP',))
+        return 'OK', [b'NOOP completed']
+
+    def close(self):
+        return 'OK', []
+
+    def logout(self):
+        return 'BYE', []
+
+
+def _parse_a1(a1_range: str):
+    """
+    Split an A1 range into (title, first column, first row, last column, last row).
+
+    Rows are 1-based; open-ended ranges such as 'A:F' give None rows.
+    """
+    title, _, cells = a1_range.rpartition('!')
+    title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+    match = re.fullmatch(r'([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?', cells)
+    start_col, start_row, end_col, end_row = match.groups()
+    end_col = end_col or start_col
+    end_row = end_row if match.group(3) else start_row
+
+    def col(letters):
+        n = 0
+        for ch in letters:
+            n = n * 26 + ord(ch) - 64
+        return n - 1
+
+    return (
+        title,
+        col(start_col),
+        int(start_row) if start_row else None,
+        col(end_col),
+        int(end_row) if end_row else None,
+    )
+
+
+class _Request:
+    """Deferred call with execute(), like googleapiclient HttpRequest."""
+
+    def __init__(self, service: 'FakeSheetsService', method: str, kwargs: Dict, handler: Callable):
+        self.service = service
+        self.method = method
+        self.kwargs = kwargs
+        self.handler = handler
+
+    def execute(self):
+        self.service.calls.append((self.method, self.kwargs))
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        if self.service.faults:
+            fault = self.service.faults.pop(0)
+            if fault is not None:
+                raise fault
+        return self.handler(**self.kwargs)
+
+
+class _Values:
+    def __init__(self, service: 'FakeSheetsService'):
+        self.service = service
+
+    def append(self, **kwargs):
+        return _Request(self.service, 'values.append', kwargs, self.service._append)
+
+    def update(self, **kwargs):
+        return _Request(self.service, 'values.update', kwargs, self.service._update)
+
+    def batchUpdate(self, **kwargs):
+        return _Request(self.service, 'values.batchUpdate', kwargs, self.service._values_batch_update)
+
+    def batchGet(self, **kwargs):
+        return _Request(self.service, 'values.batchGet', kwargs, self.service._batch_get)
+
+
+class _Spreadsheets:
+    def __init__(self, service: 'FakeSheetsService'):
+        self.service = service
+
+    def get(self, **kwargs):
+        return _Request(self.service, 'get', kwargs, self.service._get)
+
+    def batchUpdate(self, **kwargs):
+        return _Request(self.service, 'batchUpdate', kwargs, self.service._batch_update)
+
+    def values(self):
+        return _Values(self.service)
+
+
+class FakeSheetsService:
+    """
+    In-memory stand-in for the Sheets v4 service returned by discovery.build().
+
+    Every executed request is recorded in `calls` as (method, kwargs). Entries
+    in `faults` are consumed one per executed request: an exception is raised,
+    None lets the request through. `latency` seconds are added to every request.
+    """
+
+    def __init__(self, titles: List[str] = (), faults: List = None, latency: float = 0.0):
+        self.tabs: Dict[str, Dict] = {}
+        for title in titles:
+            self._add_tab(title)
+        self.calls: List[tuple] = []
+        self.faults = list(faults or [])
+        self.latency = latency
+
+    def _add_tab(self, title: str, sheet_id: int = None, row_count: int = 1000) -> None:
+        if title in self.tabs:
+            raise ValueError(f"Sheet '{title}' already exists")
+        sheet_id = len(self.tabs) + 1 if sheet_id is None else sheet_id
+        self.tabs[title] = {'sheetId': sheet_id, 'rows': [], 'rowCount': row_count, 'hidden': set()}
+
+    def spreadsheets(self):
+        return _Spreadsheets(self)
+
+    def calls_to(self, method: str) -> List[Dict]:
+        """Keyword arguments of every executed call to a method."""
+        return [kwargs for name, kwargs in self.calls if name == method]
+
+    def _tab_by_id(self, sheet_id: int) -> Dict:
+        return next(tab for tab in self.tabs.values() if tab['sheetId'] == sheet_id)
+
+    def _write(self, title: str, row: int, col: int, values: List[List]) -> None:
+        rows = self.tabs[title]['rows']
+        for r, value_row in enumerate(values):
+            while len(rows) < row + r:
+                rows.append([])
+            target = rows[row + r - 1]
+            for c, value in enumerate(value_row):
+                while len(target) <= col + c:
+                    target.append('')
+                target[col + c] = value
+
+    # Handlers
+
+    def _get(self, spreadsheetId, fields=None):
+        return {'sheets': [
+            {'properties': {
+                'sheetId': tab['sheetId'],
+                'title': title,
+                'gridProperties': {'rowCount': tab['rowCount']}
+            }}
+            for title, tab in self.tabs.items()
+        ]}
+
+    def _batch_update(self, spreadsheetId, body):
+        replies = []
+        for request in body['requests']:
+            if 'addSheet' in request:
+                props = request['addSheet']['properties']
+                self._add_tab(props['title'], props.get('sheetId'),
+                              props.get('gridProperties', {}).get('rowCount', 1000))
+                replies.append({'addSheet': {'properties': props}})
+                continue
+            if 'updateCells' in request:
+                start = request['updateCells']['start']
+                title = next(t for t, tab in self.tabs.items() if tab['sheetId'] == start['sheetId'])
+                values = [
+                    [next(iter(cell['userEnteredValue'].values())) for cell in row['values']]
+                    for row in request['updateCells']['rows']
+                ]
+                self._write(title, start.get('rowIndex', 0) + 1, start.get('columnIndex', 0), values)
+            elif 'appendDimension' in request:
+                self._tab_by_id(request['appendDimension']['sheetId'])['rowCount'] += \
+                    request['appendDimension']['length']
+            elif 'updateDimensionProperties' in request:
+                spec = request['updateDimensionProperties']['range']
+                if request['updateDimensionProperties']['properties'].get('hiddenByUser'):
+                    self._tab_by_id(spec['sheetId'])['hidden'].update(range(spec['startIndex'], spec['endIndex']))
+            replies.append({})
+        return {'replies': replies}
+
+    def _append(self, spreadsheetId, range, valueInputOption, body, insertDataOption=None):
+        title = _parse_a1(range)[0]
+        rows = self.tabs[title]['rows']
+        self._write(title, len(rows) + 1, 0, body['values'])
+        return {'updates': {'updatedRows': len(body['values'])}}
+
+    def _update(self, spreadsheetId, range, valueInputOption, body):
+        title, col, row, _, _ = _parse_a1(range)
+        self._write(title, row or 1, col, body['values'])
+        return {'updatedRows': len(body['values'])}
+
+    def _values_batch_update(self, spreadsheetId, body):
+        total = 0
+        for data in body['data']:
+            title, col, row, _, _ = _parse_a1(data['range'])
+            tab = self.tabs[title]
+            if row + len(data['values']) - 1 > tab['rowCount']:
+                raise ValueError(f"Range {data['range']} exceeds grid limits")
+            self._write(title, row, col, data['values'])
+            total += len(data['values'])
+        return {'totalUpdatedRows': total}
+
+    def _batch_get(self, spreadsheetId, ranges, majorDimension='ROWS', **kwargs):
+        value_ranges = []
+        for a1_range in ranges:
+            title, start_col, start_row, end_col, end_row = _parse_a1(a1_range)
+            rows = self.tabs[title]['rows']
+            rows = rows[(start_row or 1) - 1:end_row]
+            values = [row[start_col:end_col + 1] for row in rows]
+            # Like the API, trailing empty rows are omitted
+            while values and not any(v != '' for v in values[-1]):
+                values.pop()
+            if majorDimension == 'COLUMNS':
+                width = end_col - start_col + 1
+                values = [
+                    [row[c] if c < len(row) else '' for row in values]
+                    for c in range(width)
+                ]
+            value_ranges.append({'range': a1_range, 'values': values})
+        return {'valueRanges': value_ranges}
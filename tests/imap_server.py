@@ -0,0 +1,615 @@
+"""Minimal asyncio IMAP4rev1 server for exercising EmailFetcher over a real socket.
+
+Covers what the fetcher and IDLE clients use: CAPABILITY, LOGIN, SELECT/EXAMINE,
+SEARCH, FETCH, UID SEARCH/FETCH, IDLE, NOOP, CLOSE and LOGOUT. Messages come
+from a Maildir or a list of RFC822 bytes (e.g. a generated corpus), served
+over TLS or plain TCP. Every command's response can be delayed (`latency`)
+and response bytes throttled (`bandwidth`) to model a remote server.
+
+The server runs its event loop in a background thread, so blocking clients
+such as imaplib can connect from the test thread:
+
+    with ImapServer(Mailbox(messages), ssl_context=server_ctx) as server:
+        fetcher = EmailFetcher('me@example.com', 'secret', '127.0.0.1', server.port,
+                               ssl_context=client_ctx)
+"""
+import asyncio
+import email.utils
+import mailbox
+import re
+import ssl
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from email.parser import BytesHeaderParser
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+CAPABILITIES = 'IMAP4rev1 IDLE'
+
+# Bytes written per chunk when bandwidth shaping is on
+WRITE_CHUNK_SIZE = 16 * 1024
+
+
+def _sent_date(raw: bytes) -> datetime:
+    """Date header of a message (now if missing or malformed), timezone-aware."""
+    headers = BytesHeaderParser().parsebytes(raw)
+    try:
+        sent = email.utils.parsedate_to_datetime(headers.get('Date', ''))
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc)
+    return sent if sent.tzinfo else sent.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class StoredMessage:
+    """One message in the mailbox."""
+    uid: int
+    raw: bytes
+    sender: str
+    subject: str
+    date: datetime
+
+
+class Mailbox:
+    """Ordered, append-only INBOX shared by all connections."""
+
+    def __init__(self, messages: Iterable[bytes] = (), uidvalidity: int = 1, first_uid: int = 101):
+        """
+        Args:
+            messages: RFC822 message bytes, in arrival order
+            uidvalidity: Mailbox UIDVALIDITY
+            first_uid: UID of the first message
+        """
+        self.uidvalidity = uidvalidity
+        self.uidnext = first_uid
+        self.messages: List[StoredMessage] = []
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[int], None]] = []
+        for raw in messages:
+            self.append(raw)
+
+    @classmethod
+    def from_maildir(cls, path: str, **kwargs) -> 'Mailbox':
+        """
+        Load every message of a Maildir, oldest (by Date header) first.
+
+        Args:
+            path: Maildir directory (with cur/, new/, tmp/)
+            **kwargs: Passed to Mailbox()
+
+        Returns:
+            Mailbox holding the messages
+        """
+        maildir = mailbox.Maildir(path, factory=None, create=False)
+        return cls(sorted((maildir.get_bytes(key) for key in maildir.keys()), key=_sent_date), **kwargs)
+
+    def append(self, raw: bytes) -> int:
+        """
+        Deliver a message, notifying idling connections.
+
+        Args:
+            raw: RFC822 message bytes
+
+        Returns:
+            UID of the new message
+        """
+        headers = BytesHeaderParser().parsebytes(raw)
+        sent = _sent_date(raw)
+        with self._lock:
+            message = StoredMessage(
+                uid=self.uidnext,
+                raw=raw,
+                sender=str(headers.get('From', '')),
+                subject=str(headers.get('Subject', '')),
+                date=sent
+            )
+            self.messages.append(message)
+            self.uidnext += 1
+            exists = len(self.messages)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(exists)
+        return message.uid
+
+    def snapshot(self) -> List[StoredMessage]:
+        """Messages at this moment, in sequence-number order."""
+        with self._lock:
+            return list(self.messages)
+
+    def subscribe(self, listener: Callable[[int], None]) -> None:
+        """Call `listener(exists)` whenever a message is appended."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[int], None]) -> None:
+        """Stop calling a listener."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+class ImapError(Exception):
+    """Command failed; the message becomes a tagged NO/BAD response."""
+
+    def __init__(self, message: str, status: str = 'BAD'):
+        super().__init__(message)
+        self.status = status
+
+
+def tokenize(line: str) -> List:
+    """
+    Split command arguments into atoms, quoted strings and nested lists.
+
+    Brackets stay part of their atom, so `BODY.PEEK[HEADER]` is one token.
+
+    Args:
+        line: Arguments after the command name
+
+    Returns:
+        Tokens; parenthesized groups become lists
+    """
+    stack: List[List] = [[]]
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char == ' ':
+            i += 1
+        elif char == '(':
+            stack.append([])
+            i += 1
+        elif char == ')':
+            if len(stack) == 1:
+                raise ImapError("Unbalanced parentheses")
+            group = stack.pop()
+            stack[-1].append(group)
+            i += 1
+        elif char == '"':
+            value = []
+            i += 1
+            while i < len(line) and line[i] != '"':
+                if line[i] == '\\':
+                    i += 1
+                value.append(line[i])
+                i += 1
+            if i >= len(line):
+                raise ImapError("Unterminated string")
+            stack[-1].append(''.join(value))
+            i += 1
+        else:
+            start, depth = i, 0
+            while i < len(line) and (depth or line[i] not in ' ()'):
+                depth += {'[': 1, ']': -1}.get(line[i], 0)
+                i += 1
+            stack[-1].append(line[start:i])
+    if len(stack) != 1:
+        raise ImapError("Unbalanced parentheses")
+    return stack[0]
+
+
+def parse_sequence_set(spec: str, largest: int) -> Set[int]:
+    """
+    Expand a sequence set such as `1:3,7,9:*`.
+
+    Args:
+        spec: Sequence set
+        largest: Value of `*` (highest sequence number or UID)
+
+    Returns:
+        Numbers in the set
+    """
+    numbers: Set[int] = set()
+    for part in spec.split(','):
+        bounds = [largest if bound == '*' else int(bound) for bound in part.split(':')]
+        if len(bounds) == 1:
+            numbers.add(bounds[0])
+        else:
+            low, high = sorted(bounds)
+            numbers.update(range(low, high + 1))
+    return numbers
+
+
+def _search_date(value: str) -> date:
+    """Parse an IMAP date (DD-Mon-YYYY)."""
+    try:
+        return datetime.strptime(value, '%d-%b-%Y').date()
+    except ValueError:
+        raise ImapError(f"Bad date {value}")
+
+
+class _Search:
+    """Evaluates SEARCH criteria against messages."""
+
+    def __init__(self, messages: List[StoredMessage]):
+        self.messages = messages
+
+    def matches(self, seq: int, message: StoredMessage, criteria: List) -> bool:
+        """All criteria (implicitly ANDed) hold for the message."""
+        tokens = list(criteria)
+        while tokens:
+            if not self._match_one(seq, message, tokens):
+                return False
+        return True
+
+    def _match_one(self, seq: int, message: StoredMessage, tokens: List) -> bool:
+        """Consume one search key from `tokens` and evaluate it."""
+        token = tokens.pop(0)
+        if isinstance(token, list):
+            return self.matches(seq, message, token)
+        key = token.upper()
+        if key == 'ALL':
+            return True
+        if key == 'OR':
+            left = self._match_one(seq, message, tokens)
+            right = self._match_one(seq, message, tokens)
+            return left or right
+        if key == 'NOT':
+            return not self._match_one(seq, message, tokens)
+        if key in ('SINCE', 'BEFORE', 'ON'):
+            day = _search_date(tokens.pop(0))
+            sent = message.date.date()
+            return {'SINCE': sent >= day, 'BEFORE': sent < day, 'ON': sent == day}[key]
+        if key in ('FROM', 'SUBJECT'):
+            field = message.sender if key == 'FROM' else message.subject
+            return tokens.pop(0).lower() in field.lower()
+        if key == 'UID':
+            return message.uid in parse_sequence_set(tokens.pop(0), self.messages[-1].uid if self.messages else 0)
+        if re.fullmatch(r'[\d:*,]+', key):
+            return seq in parse_sequence_set(key, len(self.messages))
+        raise ImapError(f"Unsupported search key {token}")
+
+
+def _fetch_items(message: StoredMessage, seq: int, items: List[str], by_uid: bool) -> bytes:
+    """
+    Build one `* n FETCH (...)` response.
+
+    Args:
+        message: Message to describe
+        seq: Its sequence number
+        items: Requested data items (upper case)
+        by_uid: UID FETCH, which always reports the UID (first)
+
+    Returns:
+        Response bytes, literals included
+    """
+    if by_uid and 'UID' not in items:
+        items = ['UID'] + items
+    parts: List[bytes] = []
+    for item in items:
+        if item == 'UID':
+            parts.append(f'UID {message.uid}'.encode())
+        elif item == 'FLAGS':
+            parts.append(b'FLAGS (\\Seen)')
+        elif item == 'RFC822.SIZE':
+            parts.append(f'RFC822.SIZE {len(message.raw)}'.encode())
+        elif item == 'INTERNALDATE':
+            parts.append(f'INTERNALDATE "{message.date.strftime("%d-%b-%Y %H:%M:%S %z")}"'.encode())
+        elif item in ('RFC822', 'BODY[]', 'BODY.PEEK[]'):
+            name = 'RFC822' if item == 'RFC822' else 'BODY[]'
+            parts.append(f'{name} {{{len(message.raw)}}}\r\n'.encode() + message.raw)
+        else:
+            raise ImapError(f"Unsupported fetch item {item}")
+    return f'* {seq} FETCH ('.encode() + b' '.join(parts) + b')\r\n'
+
+
+class _Connection:
+    """State of one client connection."""
+
+    def __init__(self, server: 'ImapServer', reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.authenticated = False
+        self.selected = False
+
+    async def send(self, data: bytes) -> None:
+        """Write response bytes, throttled to the server's bandwidth."""
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.writer.write(data)
+            await self.writer.drain()
+            return
+        for i in range(0, len(data), WRITE_CHUNK_SIZE):
+            chunk = data[i:i + WRITE_CHUNK_SIZE]
+            self.writer.write(chunk)
+            await self.writer.drain()
+            await asyncio.sleep(len(chunk) / bandwidth)
+
+    async def serve(self) -> None:
+        """Greet the client and answer commands until LOGOUT or disconnect."""
+        await self.send(f'* OK [CAPABILITY {CAPABILITIES}] Gringotts test IMAP server ready\r\n'.encode())
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode('utf-8', errors='replace').rstrip('\r\n').partition(' ')
+            command, _, arguments = rest.partition(' ')
+            command = command.upper()
+            self.server.commands.append((command, arguments))
+            if self.server.latency:
+                await asyncio.sleep(self.server.latency)
+            try:
+                if command == 'LOGOUT':
+                    await self.send(b'* BYE Logging out\r\n' + f'{tag} OK LOGOUT completed\r\n'.encode())
+                    return
+                await self.dispatch(tag, command, tokenize(arguments))
+            except ImapError as e:
+                await self.send(f'{tag} {e.status} {e}\r\n'.encode())
+
+    async def dispatch(self, tag: str, command: str, args: List) -> None:
+        """Run one command and send its responses."""
+        if command == 'CAPABILITY':
+            await self.send(f'* CAPABILITY {CAPABILITIES}\r\n{tag} OK CAPABILITY completed\r\n'.encode())
+        elif command == 'NOOP':
+            await self.send(f'{tag} OK NOOP completed\r\n'.encode())
+        elif command == 'LOGIN':
+            self.login(args)
+            await self.send(f'{tag} OK LOGIN completed\r\n'.encode())
+        elif command in ('SELECT', 'EXAMINE'):
+            await self.send(self.select(args) + f'{tag} OK [READ-WRITE] {command} completed\r\n'.encode())
+        elif command == 'CLOSE':
+            self.require_selected()
+            self.selected = False
+            await self.send(f'{tag} OK CLOSE completed\r\n'.encode())
+        elif command == 'SEARCH':
+            await self.send(self.search(args, by_uid=False) + f'{tag} OK SEARCH completed\r\n'.encode())
+        elif command == 'FETCH':
+            await self.fetch(args, by_uid=False)
+            await self.send(f'{tag} OK FETCH completed\r\n'.encode())
+        elif command == 'UID' and args and str(args[0]).upper() in ('SEARCH', 'FETCH'):
+            subcommand = args[0].upper()
+            if subcommand == 'SEARCH':
+                await self.send(self.search(args[1:], by_uid=True) + f'{tag} OK UID SEARCH completed\r\n'.encode())
+            else:
+                await self.fetch(args[1:], by_uid=True)
+                await self.send(f'{tag} OK UID FETCH completed\r\n'.encode())
+        elif command == 'IDLE':
+            await self.idle(tag)
+        else:
+            raise ImapError(f"Unsupported command {command}")
+
+    def login(self, args: List) -> None:
+        """Check credentials (any are accepted unless the server has a password)."""
+        if len(args) != 2:
+            raise ImapError("LOGIN needs a user and a password")
+        if self.server.password is not None and args[1] != self.server.password:
+            raise ImapError("[AUTHENTICATIONFAILED] Invalid credentials", status='NO')
+        self.authenticated = True
+
+    def require_selected(self) -> None:
+        """Fail unless a mailbox is selected."""
+        if not self.authenticated:
+            raise ImapError("Not authenticated", status='NO')
+        if not self.selected:
+            raise ImapError("No mailbox selected", status='NO')
+
+    def select(self, args: List) -> bytes:
+        """Select INBOX and describe it."""
+        if not self.authenticated:
+            raise ImapError("Not authenticated", status='NO')
+        if not args or str(args[0]).upper() != 'INBOX':
+            raise ImapError("[NONEXISTENT] Only INBOX exists", status='NO')
+        self.selected = True
+        mailbox = self.server.mailbox
+        exists = len(mailbox.snapshot())
+        return (
+            f'* FLAGS (\\Seen)\r\n'
+            f'* {exists} EXISTS\r\n'
+            f'* 0 RECENT\r\n'
+            f'* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid\r\n'
+            f'* OK [UIDNEXT {mailbox.uidnext}] Predicted next UID\r\n'
+        ).encode()
+
+    def search(self, args: List, by_uid: bool) -> bytes:
+        """Run SEARCH, answering sequence numbers or UIDs."""
+        self.require_selected()
+        if args and str(args[0]).upper() == 'CHARSET':
+            args = args[2:]
+        messages = self.server.mailbox.snapshot()
+        search = _Search(messages)
+        found = [
+            str(message.uid if by_uid else seq)
+            for seq, message in enumerate(messages, start=1)
+            if search.matches(seq, message, args or ['ALL'])
+        ]
+        return ('* SEARCH' + ''.join(f' {n}' for n in found) + '\r\n').encode()
+
+    async def fetch(self, args: List, by_uid: bool) -> None:
+        """Send one FETCH response per message in the set."""
+        self.require_selected()
+        if len(args) != 2:
+            raise ImapError("FETCH needs a sequence set and data items")
+        spec, items = args
+        items = [item.upper() for item in (items if isinstance(items, list) else [items])]
+        messages = self.server.mailbox.snapshot()
+        if by_uid:
+            wanted = parse_sequence_set(spec, messages[-1].uid if messages else 0)
+            selected = [(seq, m) for seq, m in enumerate(messages, start=1) if m.uid in wanted]
+        else:
+            wanted = parse_sequence_set(spec, len(messages))
+            selected = [(seq, messages[seq - 1]) for seq in sorted(wanted) if 0 < seq <= len(messages)]
+        await self.send(b''.join(_fetch_items(message, seq, items, by_uid) for seq, message in selected))
+
+    async def idle(self, tag: str) -> None:
+        """Report new messages as EXISTS until the client sends DONE."""
+        self.require_selected()
+        loop = asyncio.get_running_loop()
+        updates: asyncio.Queue = asyncio.Queue()
+
+        def notify(exists: int) -> None:
+            loop.call_soon_threadsafe(updates.put_nowait, exists)
+
+        self.server.mailbox.subscribe(notify)
+        try:
+            await self.send(b'+ idling\r\n')
+            done = asyncio.ensure_future(self.reader.readline())
+            while True:
+                update = asyncio.ensure_future(updates.get())
+                finished, _ = await asyncio.wait({done, update}, return_when=asyncio.FIRST_COMPLETED)
+                if update in finished:
+                    await self.send(f'* {update.result()} EXISTS\r\n'.encode())
+                else:
+                    update.cancel()
+                if done in finished:
+                    break
+            if done.result().strip().upper() != b'DONE':
+                raise ImapError("Expected DONE")
+            await self.send(f'{tag} OK IDLE terminated\r\n'.encode())
+        finally:
+            self.server.mailbox.unsubscribe(notify)
+
+
+class ImapServer:
+    """IMAP server on 127.0.0.1, running in a background thread."""
+
+    def __init__(
+        self,
+        mailbox: Mailbox,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+        password: Optional[str] = None,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ):
+        """
+        Args:
+            mailbox: INBOX to serve
+            ssl_context: Server-side TLS context (None: plain TCP)
+            latency: Seconds added before answering each command
+            bandwidth: Bytes per second for responses (None: unlimited)
+            password: Required LOGIN password (None: accept any)
+            host: Address to bind
+            port: Port to bind (0: any free port)
+        """
+        self.mailbox = mailbox
+        self.ssl_context = ssl_context
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.password = password
+        self.host = host
+        self.port = port
+        self.commands: List[Tuple[str, str]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._startup_error: Optional[BaseException] = None
+
+    def start(self) -> 'ImapServer':
+        """Start serving; returns once the port is bound."""
+        self._thread = threading.Thread(target=self._run, name='imap-server', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+        return self
+
+    def stop(self) -> None:
+        """Close the listening socket and stop the event loop."""
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        """Thread body: own event loop serving until stop()."""
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, ssl=self.ssl_context)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+        except BaseException as e:
+            self._startup_error = e
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one connection."""
+        try:
+            await _Connection(self, reader, writer).serve()
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    def __enter__(self) -> 'ImapServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+@lru_cache(maxsize=None)
+def self_signed_contexts(host: str = '127.0.0.1') -> Tuple[ssl.SSLContext, ssl.SSLContext]:
+    """
+    TLS contexts for a throwaway self-signed certificate. Requires cryptography.
+
+    Args:
+        host: IP address (or name) clients connect to
+
+    Returns:
+        (server context, client context trusting only that certificate)
+
+    Raises:
+        ImportError: If cryptography is not installed
+    """
+    import ipaddress
+
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+    except ImportError as e:
+        raise ImportError("A TLS test server requires cryptography (pip install cryptography)") from e
+
+    try:
+        alt_name = x509.IPAddress(ipaddress.ip_address(host))
+    except ValueError:
+        alt_name = x509.DNSName(host)
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([alt_name]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM)
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+
+    # load_cert_chain only reads files
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path, key_path = Path(tmp) / 'cert.pem', Path(tmp) / 'key.pem'
+        cert_path.write_bytes(cert_pem)
+        key_path.write_bytes(key_pem)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert_path, key_path)
+
+    client_context = ssl.create_default_context(cadata=cert_pem.decode())
+    return server_context, client_context
@@ -0,0 +1,153 @@
+"""Tests for the windowed, resumable historical backfill."""
+import csv
+import imaplib
+import json
+from datetime import date, datetime
+from email.message import EmailMessage
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src import backfill as backfill_module
+from src.backfill import date_windows, format_duration, run_backfill
+from src.categorizer import TransactionCategorizer
+from src.config import Account
+from src.email_fetcher import RawEmail
+from src.journal import RunJournal
+from src.parser import TransactionParser
+from tests.fakes import FakeAnthropic
+from tests.imap_server import ImapServer, Mailbox
+
+
+def test_date_windows():
+    """Test windows cover the period end to end, the last one shorter."""
+    assert date_windows(date(2026, 1, 1), date(2026, 1, 20), 7) == [
+        (date(2026, 1, 1), date(2026, 1, 8)),
+        (date(2026, 1, 8), date(2026, 1, 15)),
+        (date(2026, 1, 15), date(2026, 1, 21)),
+    ]
+    with pytest.raises(ValueError):
+        date_windows(date(2026, 2, 1), date(2026, 1, 1))
+
+
+def test_format_duration():
+    """Test ETA formatting."""
+    assert [format_duration(s) for s in (42, 125, 3900)] == ['42s', '2m 05s', '1h 05m']
+
+
+def _alert(amount: float, sent: datetime) -> bytes:
+    """HDFC UPI debit alert."""
+    msg = EmailMessage()
+    msg['Subject'] = 'Transaction alert'
+    msg['From'] = 'alerts@hdfcbank.net'
+    msg['Date'] = format_datetime(sent.astimezone())
+    msg['Message-ID'] = f'<{amount}@bank>'
+    msg.set_content(f"Rs.{amount:.2f} has been debited from A/c **1234. VPA swiggy@okaxis. Avl Bal: Rs.45000.00")
+    return msg.as_bytes()
+
+
+@pytest.fixture
+def mailbox_server(monkeypatch):
+    """TLS IMAP server with one alert in each of three January weeks."""
+    pytest.importorskip('cryptography')
+    from tests.imap_server import self_signed_contexts
+    server_context, client_context = self_signed_contexts()
+    imap4_ssl = imaplib.IMAP4_SSL
+    monkeypatch.setattr(
+        'src.email_fetcher.imaplib.IMAP4_SSL',
+        lambda host, port, ssl_context=None: imap4_ssl(host, port, ssl_context=client_context)
+    )
+    inbox = Mailbox([_alert(100.0 + day, datetime(2026, 1, day, 10)) for day in (2, 9, 16)])
+    with ImapServer(inbox, ssl_context=server_context) as server:
+        yield server
+
+
+@pytest.fixture
+def components(mailbox_server, tmp_path, monkeypatch):
+    """Configuration (one account writing CSV) and categorizer, in a scratch directory."""
+    monkeypatch.chdir(tmp_path)
+    account = Account('default', 'me@example.com', 'pw', ['csv'],
+                      imap_server='127.0.0.1', imap_port=mailbox_server.port)
+    config = SimpleNamespace(
+        accounts=[account], dedup_mode='bucket', dedup_tolerance_minutes=5, dedup_horizon_days=90,
+        defer_categorization=False, pipeline_mode='batch'
+    )
+    categorizer = TransactionCategorizer('key', cache_file='cache.json', model_file='model.json',
+                                         batch_file='batch.json')
+    categorizer.client = FakeAnthropic(lambda params: "B")
+    return config, TransactionParser(), categorizer
+
+
+def _written_amounts() -> list:
+    """Amounts in the CSV ledger."""
+    with open('transactions.csv') as f:
+        return sorted(float(row['amount']) for row in csv.DictReader(f))
+
+
+def test_interrupted_backfill_resumes(components, tmp_path, monkeypatch):
+    """Test a failed window stops the backfill, and a re-run skips finished windows without duplicates."""
+    real_run_account = backfill_module.run_account
+    windows = []
+
+    def run_account(*args, window, **kwargs):
+        windows.append(window[0].date())
+        if len(windows) == 2:
+            raise ConnectionError("IMAP connection reset")
+        return real_run_account(*args, window=window, **kwargs)
+
+    monkeypatch.setattr(backfill_module, 'run_account', run_account)
+    report = {}
+    config, parser, categorizer = components
+    args = (config, parser, categorizer, None, report, date(2026, 1, 1), date(2026, 1, 20), 7)
+
+    assert run_backfill(*args) is False
+    assert report['backfill']['default']['error'] == "IMAP connection reset"
+
+    assert run_backfill(*args) is True
+    assert windows == [date(2026, 1, 1), date(2026, 1, 8), date(2026, 1, 8), date(2026, 1, 15)]
+
+    summary = report['backfill']['default']
+    assert summary['completed'] == 3
+    assert summary['counts'] == {'emails': 3, 'written': 3}
+    assert summary['this_run']['windows'] == 2
+    assert _written_amounts() == [102.0, 109.0, 116.0]
+    progress = json.loads((tmp_path / '.gringotts_backfill' / 'progress.json').read_text())
+    assert progress['completed'] == ['2026-01-01', '2026-01-08', '2026-01-15']
+
+
+def test_changed_period_discards_stale_journal(components):
+    """Test a journal left by a backfill of another period is not replayed into the new one."""
+    config, parser, categorizer = components
+    assert run_backfill(config, parser, categorizer, None, {}, date(2025, 6, 1), date(2025, 6, 30), 7)
+    # Left behind by a June window that failed after its fetch
+    journal = RunJournal('.gringotts_backfill')
+    journal.start()
+    journal.set('window', ['2025-06-01T00:00:00', '2025-06-08T00:00:00'])
+    journal.record('fetch', [RawEmail(
+        subject='Transaction alert', sender='alerts@hdfcbank.net', date=datetime(2025, 6, 2, 10),
+        body="Rs.999.00 has been debited from A/c **1234. VPA swiggy@okaxis. Avl Bal: Rs.45000.00",
+        message_id='<999@bank>', uid='7'
+    )])
+    journal.complete('fetch')
+
+    report = {}
+    assert run_backfill(config, parser, categorizer, None, report, date(2026, 1, 1), date(2026, 1, 20), 7)
+
+    assert _written_amounts() == [102.0, 109.0, 116.0]
+    assert report['backfill']['default']['counts'] == {'emails': 3, 'written': 3}
+
+
+def test_pending_rows_patched_once_per_backfill(components, monkeypatch):
+    """Test only the first window looks for pending rows, instead of re-reading them every window."""
+    real_run_account = backfill_module.run_account
+    patched = []
+
+    def run_account(*args, patch_pending, **kwargs):
+        patched.append(patch_pending)
+        return real_run_account(*args, patch_pending=patch_pending, **kwargs)
+
+    monkeypatch.setattr(backfill_module, 'run_account', run_account)
+    config, parser, categorizer = components
+    assert run_backfill(config, parser, categorizer, None, {}, date(2026, 1, 1), date(2026, 1, 20), 7)
+    assert patched == [True, False, False]
@@ -0,0 +1,89 @@
+"""Unit tests for the versioned category cache."""
+import json
+
+import pytest
+
+from src.cache import CategoryCache, CACHE_SCHEMA_VERSION
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    """Path for a cache file."""
+    return str(tmp_path / 'cache.json')
+
+
+def test_roundtrip(cache_path):
+    """Test entries survive save and load."""
+    cache = CategoryCache(cache_path, 'fp1')
+    cache.set('acme', 'Shopping')
+    cache.save()
+
+    reloaded = CategoryCache(cache_path, 'fp1')
+    assert reloaded.get('acme') == 'Shopping'
+    with open(cache_path) as f:
+        assert json.load(f)['schema'] == CACHE_SCHEMA_VERSION
+
+
+def test_fingerprint_change_invalidates(cache_path):
+    """Test entries from a different categories/model/prompt setup are stale."""
+    cache = CategoryCache(cache_path, 'fp1')
+    cache.set('acme', 'Other')
+    cache.save()
+
+    reloaded = CategoryCache(cache_path, 'fp2')
+    assert reloaded.get('acme') is None
+    assert len(reloaded) == 0
+
+
+def test_ttl_expiry(cache_path):
+    """Test TTL and the shorter TTL for 'Other'."""
+    clock = FakeClock()
+    cache = CategoryCache(cache_path, 'fp', ttl_days=30, other_ttl_days=7, clock=clock)
+    cache.set('acme', 'Shopping')
+    cache.set('mystery', 'Other')
+
+    clock.now += 8 * 86400
+    assert cache.get('mystery') is None
+    assert cache.get('acme') == 'Shopping'
+
+    clock.now += 30 * 86400
+    assert cache.get('acme') is None
+
+
+def test_lru_eviction(cache_path):
+    """Test the least recently hit entries are evicted beyond the bound."""
+    clock = FakeClock()
+    cache = CategoryCache(cache_path, 'fp', max_entries=2, clock=clock)
+    cache.set('a', 'Shopping')
+    clock.now += 1
+    cache.set('b', 'Groceries')
+    clock.now += 1
+    cache.get('a')
+    clock.now += 1
+    cache.set('c', 'Rent')
+    cache.save()
+
+    reloaded = CategoryCache(cache_path, 'fp', max_entries=2, clock=clock)
+    assert reloaded.get('b') is None
+    assert reloaded.get('a') == 'Shopping'
+    assert reloaded.get('c') == 'Rent'
+
+
+def test_legacy_flat_cache_migrated(cache_path):
+    """Test the old {merchant: category} format is still readable."""
+    with open(cache_path, 'w') as f:
+        json.dump({'acme': 'Shopping'}, f)
+
+    cache = CategoryCache(cache_path, 'fp')
+    assert cache['acme'] == 'Shopping'
+    assert CategoryCache.read_labels(cache_path) == {'acme': 'Shopping'}
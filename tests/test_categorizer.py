@@ -6,8 +6,10 @@ import tempfile
 import json
 
 from src.categorizer import TransactionCategorizer
+from src.classifier import MerchantClassifier
 from src.parser import Transaction
-from src.config import TxType, PaymentMode
+from src.config import TxType, PaymentMode, PENDING_CATEGORY
+from tests.fakes import FakeAnthropic
 
 
 @pytest.fixture
@@ -21,7 +23,12 @@ def temp_cache_file():
 @pytest.fixture
 def categorizer(temp_cache_file):
     """Create categorizer instance with temp cache."""
-    return TransactionCategorizer(api_key="test-key", cache_file=temp_cache_file)
+    return TransactionCategorizer(
+        api_key="test-key",
+        cache_file=temp_cache_file,
+        model_file=temp_cache_file + '.model',
+        batch_file=temp_cache_file + '.batch'
+    )
 
 
 @pytest.fixture
@@ -125,6 +132,14 @@ def test_categorize_with_llm(mock_anthropic, categorizer):
     assert mock_anthropic.return_value.messages.create.called
 
 
+@patch('src.categorizer.Anthropic')
+def test_client_built_on_first_use(mock_anthropic, categorizer):
+    """Test the client is built through the module's Anthropic name, without SDK retries."""
+    assert not mock_anthropic.called
+    assert categorizer.client is mock_anthropic.return_value
+    mock_anthropic.assert_called_once_with(api_key="test-key", max_retries=0)
+
+
 @patch('src.categorizer.Anthropic')
 def test_categorize_invalid_llm_response(mock_anthropic, categorizer):
     """Test handling of invalid LLM response."""
@@ -180,6 +195,26 @@ def test_cache_persistence(temp_cache_file):
     assert cat2.cache['test_merchant'] == 'Shopping'
 
 
+def test_cache_hits_saved_without_llm_calls(temp_cache_file):
+    """Test a run served entirely from cache still saves the entries' last-hit times."""
+    cat1 = TransactionCategorizer(api_key="test-key", cache_file=temp_cache_file)
+    cat1.cache.set('corner cafe', 'Food & Dining')
+    cat1._save_cache()
+    with open(temp_cache_file) as f:
+        first_hit = json.load(f)['entries']['corner cafe']['a']
+
+    cat2 = TransactionCategorizer(api_key="test-key", cache_file=temp_cache_file)
+    cat2.cache.clock = lambda: first_hit + 3600
+    cat2.client = MagicMock()
+    tx = Transaction(amount=180.0, tx_type=TxType.DEBIT, mode=PaymentMode.UPI,
+                     merchant="CORNER CAFE", date=datetime.now(), raw_text="")
+
+    assert cat2.categorize_batch([tx])[0]['category'] == "Food & Dining"
+    assert not cat2.client.messages.create.called
+    with open(temp_cache_file) as f:
+        assert json.load(f)['entries']['corner cafe']['a'] == first_hit + 3600
+
+
 def test_categorize_batch(categorizer):
     """Test batch categorization."""
     transactions = [
@@ -208,3 +243,168 @@ def test_categorize_batch(categorizer):
     assert categorized[1]['category'] == "Groceries"
     assert categorized[0]['amount'] == 2500.0
     assert categorized[1]['amount'] == 3500.0
+
+
+def test_categorize_with_model_skips_llm(categorizer):
+    """Test confident offline model predictions bypass the LLM."""
+    categorizer.model = MerchantClassifier().fit([
+        ("apollo pharmacy", "Healthcare"),
+        ("medplus pharmacy", "Healthcare"),
+        ("netmeds pharmacy", "Healthcare"),
+        ("hp petrol pump", "Transportation"),
+        ("indian oil petrol", "Transportation"),
+    ])
+    categorizer.client = MagicMock()
+
+    tx = Transaction(
+        amount=450.0,
+        tx_type=TxType.DEBIT,
+        mode=PaymentMode.CARD,
+        merchant="WELLNESS PHARMACY",
+        date=datetime.now(),
+        raw_text="Card payment"
+    )
+
+    assert categorizer.categorize(tx) == "Healthcare"
+    assert not categorizer.client.messages.create.called
+
+
+def test_batch_backfill_flow(categorizer):
+    """Test deferred rows are resolved through a Message Batches job."""
+    categorizer.client = FakeAnthropic(
+        lambda params: "Healthcare" if "PHARMACY" in params['messages'][0]['content'] else "Shopping",
+        polls_until_ended=2
+    )
+    transactions = [
+        Transaction(amount=300.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                    merchant="CITY PHARMACY", date=datetime.now(), raw_text=""),
+        Transaction(amount=120.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                    merchant="CITY PHARMACY", date=datetime.now(), raw_text=""),
+        Transaction(amount=900.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                    merchant="GIFT SHOP", date=datetime.now(), raw_text=""),
+        Transaction(amount=250.0, tx_type=TxType.DEBIT, mode=PaymentMode.UPI,
+                    merchant="SWIGGY", date=datetime.now(), raw_text=""),
+    ]
+
+    rows = categorizer.categorize_batch(transactions, defer=True)
+    assert [row['category'] for row in rows] == [
+        PENDING_CATEGORY, PENDING_CATEGORY, PENDING_CATEGORY, "Food & Dining"
+    ]
+
+    batch_id = categorizer.submit_batch(transactions)
+    assert batch_id is not None
+    assert len(categorizer.client.messages.batches.batches[batch_id]['requests']) == 2
+    assert not categorizer.client.messages.calls
+
+    # Already in flight, so nothing new is submitted
+    assert categorizer.submit_batch(transactions) is None
+
+    # First poll: still processing
+    assert categorizer.poll_batches() == 0
+    assert categorizer.resolve_pending(rows) == 0
+
+    # Second poll: ended, cache filled and job file cleared
+    assert categorizer.poll_batches() == 2
+    assert not categorizer.batch_file.exists()
+    assert categorizer.resolve_pending(rows) == 3
+    assert [row['category'] for row in rows] == [
+        "Healthcare", "Healthcare", "Shopping", "Food & Dining"
+    ]
+
+
+def test_unknown_batch_is_dropped(categorizer):
+    """Test a job the API no longer knows is removed instead of failing every poll."""
+    class NotFoundError(Exception):
+        status_code = 404
+
+    categorizer.client = FakeAnthropic(lambda params: "Shopping")
+    transactions = [
+        Transaction(amount=900.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                    merchant="GIFT SHOP", date=datetime.now(), raw_text=""),
+    ]
+    batch_id = categorizer.submit_batch(transactions)
+    batches = categorizer.client.messages.batches
+    batches.retrieve = Mock(side_effect=NotFoundError(f"batch {batch_id} not found"))
+
+    assert categorizer.poll_batches() == 0
+    assert not categorizer.batch_file.exists()
+
+    # Resubmitted by the next back-fill, and dropped once it ends without results
+    categorizer.submit_batch(transactions)
+    batches.retrieve = Mock(return_value=Mock(processing_status='expired'))
+    assert categorizer.poll_batches() == 0
+    assert not categorizer.batch_file.exists()
+
+
+def test_llm_request_uses_cached_prefix_and_codes(categorizer):
+    """Test the static prefix is cacheable and replies are category codes."""
+    categorizer.client = FakeAnthropic(lambda params: "I")  # Ninth category code
+    unknown_tx = Transaction(
+        amount=450.0,
+        tx_type=TxType.DEBIT,
+        mode=PaymentMode.CARD,
+        merchant="CITY CLINIC",
+        date=datetime.now(),
+        raw_text="Card payment"
+    )
+
+    assert categorizer.categorize(unknown_tx) == "Healthcare"
+
+    params = categorizer.client.messages.calls[0]
+    assert params['system'][0]['cache_control'] == {"type": "ephemeral"}
+    assert "I=Healthcare" in params['system'][0]['text']
+    assert "CITY CLINIC" in params['messages'][0]['content']
+    assert "CITY CLINIC" not in params['system'][0]['text']
+
+    usage = categorizer.stats.usage
+    assert usage.calls == 1
+    assert usage.input_tokens > 0
+    assert usage.output_tokens == 1
+    assert usage.cost_usd() > 0
+
+
+def test_llm_outage_defers_instead_of_caching(categorizer):
+    """Test transient LLM failures mark the row Pending and leave the cache alone."""
+    class Overloaded(Exception):
+        status_code = 529
+
+    categorizer.client = MagicMock()
+    categorizer.client.messages.create.side_effect = Overloaded("overloaded")
+    categorizer.llm.sleep = lambda seconds: None
+
+    unknown_tx = Transaction(
+        amount=1500.0,
+        tx_type=TxType.DEBIT,
+        mode=PaymentMode.CARD,
+        merchant="UNKNOWN STORE",
+        date=datetime.now(),
+        raw_text="Card payment"
+    )
+
+    assert categorizer.categorize(unknown_tx) == PENDING_CATEGORY
+    assert categorizer.cache.get("unknown store") is None
+    assert categorizer.deferred == [unknown_tx]
+
+
+def test_stats_count_tiers(categorizer):
+    """Test each tier that resolved a transaction is counted."""
+    categorizer.client = FakeAnthropic(lambda params: "D")
+    categorizer.cache.set("corner shop", "Groceries")
+
+    def tx(merchant, amount=100.0, tx_type=TxType.DEBIT):
+        return Transaction(amount=amount, tx_type=tx_type, mode=PaymentMode.UPI,
+                           merchant=merchant, date=datetime.now(), raw_text="")
+
+    categorizer.categorize_batch([
+        tx("ACME CORP", amount=90000.0, tx_type=TxType.CREDIT),
+        tx("SWIGGY"),
+        tx("CORNER SHOP"),
+        tx("GIFT GALLERY"),
+    ])
+
+    report = categorizer.stats.to_dict()
+    assert report['tiers'] == {
+        'credit_heuristic': 1, 'rule': 1, 'cache': 1, 'model': 0, 'llm': 1, 'deferred': 0
+    }
+    assert report['llm_latency_seconds']['count'] == 1
+    assert report['usage']['calls'] == 1
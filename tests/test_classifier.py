@@ -0,0 +1,77 @@
+"""Unit tests for the offline merchant classifier."""
+import pytest
+
+from src.classifier import MerchantClassifier, evaluate, training_samples
+
+
+@pytest.fixture
+def samples():
+    """Small labelled merchant set."""
+    return [
+        ("swiggy", "Food & Dining"),
+        ("zomato order", "Food & Dining"),
+        ("dominos pizza", "Food & Dining"),
+        ("pizza hut", "Food & Dining"),
+        ("apollo pharmacy", "Healthcare"),
+        ("medplus pharmacy", "Healthcare"),
+        ("netmeds pharmacy", "Healthcare"),
+        ("uber trip", "Transportation"),
+        ("ola cabs", "Transportation"),
+        ("indian oil petrol", "Transportation"),
+        ("unknown thing", "Other"),
+    ]
+
+
+def test_predict_similar_merchant(samples):
+    """Test unseen but similar merchants get the right category."""
+    model = MerchantClassifier().fit(samples)
+
+    category, confidence = model.predict("CITY PHARMACY BLR")
+    assert category == "Healthcare"
+    assert confidence > 0.5
+
+    category, _ = model.predict("PIZZA CORNER")
+    assert category == "Food & Dining"
+
+
+def test_other_label_excluded(samples):
+    """Test the 'Other' fallback label is not learned."""
+    model = MerchantClassifier().fit(samples)
+    assert "Other" not in model.centroids
+
+
+def test_unrelated_merchant_low_confidence(samples):
+    """Test merchants sharing no n-grams with training data are not answered."""
+    model = MerchantClassifier().fit(samples)
+    assert model.predict("XQZ") == (None, 0.0)
+    assert model.predict(None) == (None, 0.0)
+
+
+def test_save_and_load_roundtrip(samples, tmp_path):
+    """Test model persistence."""
+    model = MerchantClassifier().fit(samples)
+    path = tmp_path / 'model.json'
+    model.save(str(path))
+
+    loaded = MerchantClassifier.load(str(path))
+    assert loaded is not None
+    assert loaded.predict("apollo pharmacy")[0] == "Healthcare"
+    assert MerchantClassifier.load(str(tmp_path / 'missing.json')) is None
+
+
+def test_training_samples_include_rules():
+    """Test merchant rules are part of the training data."""
+    samples = training_samples({"acme cafe": "Food & Dining", "unknown": "Other"})
+    assert ("swiggy", "Food & Dining") in samples
+    assert ("acme cafe", "Food & Dining") in samples
+    assert all(merchant != "unknown" for merchant, _ in samples)
+
+
+def test_evaluate_reports_calls_avoided(samples):
+    """Test evaluation metrics on a cache."""
+    cache = {f"{merchant} {i}": category for merchant, category in samples for i in range(10)}
+    results = evaluate(cache, threshold=0.5)
+
+    assert results['test_size'] > 0
+    assert 0.0 <= results['accuracy'] <= 1.0
+    assert results['llm_calls_avoided'] <= results['test_size']
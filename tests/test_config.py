@@ -0,0 +1,79 @@
+"""Tests for multi-account configuration."""
+import json
+
+import pytest
+
+from src.config import DEFAULT_ACCOUNT, Account, Config, load_accounts
+
+
+def test_load_json_accounts(tmp_path, monkeypatch):
+    """Test accounts are read in order with defaults and passwords from the environment."""
+    monkeypatch.setenv('SHOP_PASSWORD', 'secret')
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps({'accounts': [
+        {'name': 'home', 'email_address': 'home@example.com', 'email_password': 'pw',
+         'spreadsheet_id': 'sheet-1'},
+        {'name': 'shop', 'email_address': 'shop@example.com', 'email_password_env': 'SHOP_PASSWORD',
+         'sinks': 'sqlite,csv'},
+    ]}))
+
+    home, shop = load_accounts(str(path), ['sheets'])
+    assert (home.name, home.sinks, home.spreadsheet_id) == ('home', ['sheets'], 'sheet-1')
+    assert (shop.email_password, shop.sinks) == ('secret', ['sqlite', 'csv'])
+
+
+def test_load_toml_accounts(tmp_path):
+    """Test the TOML form of the accounts file."""
+    path = tmp_path / 'accounts.toml'
+    path.write_text(
+        '[[accounts]]\n'
+        'name = "home"\n'
+        'email_address = "home@example.com"\n'
+        'email_password = "pw"\n'
+        'sinks = ["sqlite"]\n'
+    )
+    assert [account.name for account in load_accounts(str(path), ['sheets'])] == ['home']
+
+
+@pytest.mark.parametrize('accounts, message', [
+    ([{'name': 'a b', 'email_address': 'x', 'email_password': 'y', 'sinks': 'csv'}], 'Invalid account name'),
+    ([{'name': 'a', 'email_address': 'x', 'email_password': 'y', 'sinks': 'csv'}] * 2, 'Duplicate'),
+    ([{'name': 'a', 'email_address': 'x', 'sinks': 'csv'}], 'email_password'),
+    ([{'name': 'a', 'email_address': 'x', 'email_password': 'y'}], 'spreadsheet_id'),
+])
+def test_invalid_accounts_rejected(tmp_path, accounts, message):
+    """Test incomplete or ambiguous accounts fail configuration."""
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps(accounts))
+    with pytest.raises(ValueError, match=message):
+        load_accounts(str(path), ['sheets'])
+
+
+def test_missing_accounts_file_rejected(tmp_path):
+    """Test a missing accounts file is a configuration error naming the file."""
+    path = str(tmp_path / 'accounts.toml')
+    with pytest.raises(ValueError, match='accounts.toml'):
+        load_accounts(path, ['sheets'])
+
+
+def test_account_paths():
+    """Test the default account keeps existing state files and others get their own."""
+    default = Account(DEFAULT_ACCOUNT, 'a@example.com', 'pw', ['csv'])
+    home = Account('home', 'b@example.com', 'pw', ['csv'])
+    assert default.path('.dedup_index.sqlite') == '.dedup_index.sqlite'
+    assert home.path('.dedup_index.sqlite') == '.dedup_index.home.sqlite'
+    assert home.path('.gringotts_state') == '.gringotts_state.home'
+
+
+@pytest.mark.parametrize('mode', ['stagd', 'staged ', 'Batch'])
+def test_invalid_pipeline_mode_rejected(monkeypatch, mode):
+    """Test a mistyped PIPELINE_MODE fails configuration instead of falling back to batch."""
+    for key, value in [('ANTHROPIC_API_KEY', 'key'), ('EMAIL_ADDRESS', 'a@example.com'),
+                       ('EMAIL_PASSWORD', 'pw'), ('SINKS', 'csv'), ('PIPELINE_MODE', mode)]:
+        monkeypatch.setenv(key, value)
+    monkeypatch.delenv('ACCOUNTS_FILE', raising=False)
+    with pytest.raises(ValueError, match='PIPELINE_MODE'):
+        Config()
+
+    monkeypatch.setenv('PIPELINE_MODE', 'staged')
+    assert Config().pipeline_mode == 'staged'
@@ -0,0 +1,186 @@
+"""Tests for serve mode: schedules and the resident daemon."""
+import json
+import os
+import signal
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src import daemon as daemon_module
+from src.categorizer import TransactionCategorizer
+from src.config import LLM_DEADLINE_SECONDS, Account, PaymentMode, TxType, load_accounts
+from src.daemon import CronSchedule, Daemon, IntervalSchedule
+from src.llm_client import ResilientLLMClient
+from src.parser import Transaction
+from tests.fakes import FakeAnthropic
+
+
+def test_interval_schedule():
+    """Test the first run is immediate and later runs are start to start."""
+    schedule = IntervalSchedule(3600)
+    now = datetime(2026, 10, 19, 9, 40, 30)
+
+    assert schedule.next_run(None, now) == now
+    assert schedule.next_run(now, now) == datetime(2026, 10, 19, 10, 40, 30)
+
+
+@pytest.mark.parametrize('expression,now,expected', [
+    ('0 2 * * *', datetime(2026, 10, 19, 9, 40, 30), datetime(2026, 10, 20, 2, 0)),
+    ('*/15 9-17 * * 1-5', datetime(2026, 10, 23, 17, 50), datetime(2026, 10, 26, 9, 0)),  # Friday -> Monday
+    ('30 6 1 * 0', datetime(2026, 10, 19, 7, 0), datetime(2026, 10, 25, 6, 30)),  # 1st or Sunday
+    ('0 0 29 2 *', datetime(2026, 3, 1), datetime(2028, 2, 29, 0, 0)),
+])
+def test_cron_schedule(expression, now, expected):
+    """Test the next matching minute, including day-of-month/day-of-week OR semantics."""
+    assert CronSchedule(expression).next_run(None, now) == expected
+
+
+def test_cron_runs_once_per_matching_minute():
+    """Test a run that started in the matching minute is not repeated in it."""
+    schedule = CronSchedule('* * * * *')
+    started = datetime(2026, 10, 19, 2, 0, 5)
+
+    assert schedule.next_run(started, datetime(2026, 10, 19, 2, 0, 40)) == datetime(2026, 10, 19, 2, 1)
+
+
+@pytest.mark.parametrize('expression', ['0 2 * *', '61 * * * *', '0 2 30 2 *', 'x * * * *'])
+def test_invalid_cron(expression):
+    """Test malformed or never-matching expressions are rejected."""
+    with pytest.raises(ValueError):
+        CronSchedule(expression).next_run(None, datetime(2026, 10, 19))
+
+
+def _config(password: str = 'pw', api_key: str = 'key') -> SimpleNamespace:
+    """Configuration with one account and no Sheets."""
+    return SimpleNamespace(
+        anthropic_api_key=api_key,
+        google_service_account=None,
+        accounts=[Account('home', 'a@example.com', password, ['csv'])]
+    )
+
+
+class RecordedCycles(list):
+    """Stands in for run_cycle, recording each call; `hook(n)` runs during call n."""
+
+    hook = None
+
+    def __call__(self, config, parser, categorizer, sheets_pool, report, resume=False, fetchers=None):
+        self.append(SimpleNamespace(config=config, parser=parser, categorizer=categorizer,
+                                    fetchers=dict(fetchers), resume=resume))
+        if self.hook:
+            self.hook(len(self))
+        return True
+
+
+@pytest.fixture
+def cycles(tmp_path, monkeypatch):
+    """Record runs instead of running the pipeline, in a scratch directory."""
+    monkeypatch.chdir(tmp_path)
+    recorded = RecordedCycles()
+    monkeypatch.setattr(daemon_module, 'run_cycle', recorded)
+    return recorded
+
+
+def test_components_stay_warm_between_runs(cycles, tmp_path):
+    """Test parser, categorizer and IMAP fetchers are reused by every run, which resumes."""
+    daemon = Daemon(IntervalSchedule(0.01), load_config=_config, max_cycles=3)
+
+    assert daemon.serve() == 0
+
+    assert len(cycles) == 3
+    assert all(call.resume for call in cycles)
+    assert len({id(call.parser) for call in cycles}) == 1
+    assert len({id(call.categorizer) for call in cycles}) == 1
+    assert len({id(call.fetchers['home']) for call in cycles}) == 1
+    assert (tmp_path / 'run_report.json').exists()
+
+
+def test_reload_keeps_unchanged_components(cycles):
+    """Test a reload replaces only the fetcher whose settings changed."""
+    configs = iter([_config(), _config(password='new')])
+    daemon = Daemon(IntervalSchedule(0.01), load_config=lambda: next(configs), max_cycles=2)
+    cycles.hook = lambda n: daemon.request_reload() if n == 1 else None
+
+    daemon.serve()
+
+    first, second = cycles
+    assert second.categorizer is first.categorizer
+    assert second.fetchers['home'] is not first.fetchers['home']
+    assert second.fetchers['home'].password == 'new'
+
+
+def test_invalid_reload_keeps_previous_configuration(cycles):
+    """Test a broken configuration on reload is logged and ignored."""
+    def load_config():
+        if cycles:
+            raise ValueError("Missing required environment variable: ANTHROPIC_API_KEY")
+        return _config()
+
+    daemon = Daemon(IntervalSchedule(0.01), load_config=load_config, max_cycles=2)
+    cycles.hook = lambda n: daemon.request_reload()
+
+    daemon.serve()
+
+    assert cycles[1].config is cycles[0].config
+
+
+def test_reload_with_missing_accounts_file_keeps_previous_configuration(cycles, tmp_path, monkeypatch):
+    """Test an accounts file that disappeared before a reload is reported, not fatal."""
+    accounts_file = tmp_path / 'accounts.json'
+    accounts_file.write_text(json.dumps([{'name': 'home', 'email_address': 'a@example.com',
+                                          'email_password': 'pw', 'sinks': 'csv'}]))
+
+    def load_config():
+        config = _config()
+        config.accounts = load_accounts(str(accounts_file), ['csv'])
+        return config
+
+    daemon = Daemon(IntervalSchedule(0.01), load_config=load_config, max_cycles=2)
+    cycles.hook = lambda n: (accounts_file.unlink(), daemon.request_reload()) if n == 1 else None
+
+    assert daemon.serve() == 0
+
+    assert len(cycles) == 2
+    assert cycles[1].config is cycles[0].config
+
+
+def test_sigterm_stops_after_current_run(cycles):
+    """Test SIGTERM during a run lets it finish, then stops and restores the handler."""
+    previous = signal.getsignal(signal.SIGTERM)
+    daemon = Daemon(IntervalSchedule(0.01), load_config=_config)
+    cycles.hook = lambda n: os.kill(os.getpid(), signal.SIGTERM)
+
+    assert daemon.serve() == 0
+
+    assert len(cycles) == 1
+    assert signal.getsignal(signal.SIGTERM) is previous
+
+
+def test_llm_deadline_restarts_every_run(cycles, monkeypatch):
+    """Test a run long after the first still reaches the LLM: the run deadline is per run, not per process."""
+    now = [0.0]
+    clock = lambda: now[0]
+
+    class FakeClockCategorizer(TransactionCategorizer):
+        def __init__(self, api_key):
+            super().__init__(api_key)
+            self.llm = ResilientLLMClient(deadline=LLM_DEADLINE_SECONDS, clock=clock, sleep=lambda s: None)
+            self.client = FakeAnthropic(lambda params: "I")  # Healthcare
+
+    monkeypatch.setattr(daemon_module, 'TransactionCategorizer', FakeClockCategorizer)
+    categories = []
+
+    def categorize(n):
+        categorizer = cycles[-1].categorizer
+        categories.append(categorizer.categorize(Transaction(
+            amount=300.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+            merchant=f"CLINIC {n}", date=datetime(2026, 1, 5), raw_text=""
+        )))
+        now[0] += LLM_DEADLINE_SECONDS + 60
+
+    cycles.hook = categorize
+    Daemon(IntervalSchedule(0.01), load_config=_config, max_cycles=2).serve()
+
+    assert categories == ["Healthcare", "Healthcare"]
+    assert len(cycles[-1].categorizer.client.messages.calls) == 2
@@ -0,0 +1,92 @@
+"""Unit tests for the persistent cross-run dedup index."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.config import PENDING_CATEGORY, TxType, PaymentMode
+from src.dedup_index import DedupIndex
+from src.email_fetcher import RawEmail
+from src.deduplicator import transaction_fingerprint
+from src.parser import Transaction
+
+
+def make_row(amount=100.0, date=None, merchant="SWIGGY"):
+    """Categorized transaction dictionary."""
+    return {
+        'date': date or datetime.now().replace(second=0, microsecond=0),
+        'amount': amount,
+        'tx_type': 'Debit',
+        'mode': 'UPI',
+        'merchant': merchant,
+        'category': 'Food & Dining',
+        'raw_text': ''
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Dedup index in a temp directory."""
+    with DedupIndex(str(tmp_path / 'index.sqlite'), horizon_days=30) as idx:
+        yield idx
+
+
+def test_fingerprint_same_for_dict_and_transaction():
+    """Test parsed and categorized forms of a transaction share a fingerprint."""
+    row = make_row()
+    tx = Transaction(amount=row['amount'], tx_type=TxType.DEBIT, mode=PaymentMode.UPI,
+                     merchant=row['merchant'], date=row['date'], raw_text='')
+    assert transaction_fingerprint(row) == transaction_fingerprint(tx)
+    assert transaction_fingerprint(row) != transaction_fingerprint(make_row(amount=101.0))
+
+
+def test_filter_new_skips_written(index):
+    """Test transactions from a previous run are filtered out."""
+    written = make_row(amount=100.0)
+    fresh = make_row(amount=200.0)
+    index.add([written])
+
+    assert index.filter_new([written, fresh]) == [fresh]
+
+
+def test_persists_across_runs(tmp_path):
+    """Test the index survives reopening."""
+    path = str(tmp_path / 'index.sqlite')
+    row = make_row()
+    with DedupIndex(path) as first_run:
+        first_run.add([row])
+    with DedupIndex(path) as second_run:
+        assert second_run.filter_new([row]) == []
+
+
+def test_prune_drops_old_entries(index):
+    """Test entries beyond the horizon are pruned."""
+    old = make_row(date=datetime.now() - timedelta(days=60))
+    recent = make_row(amount=50.0)
+    index.add([old, recent])
+
+    assert index.prune() == 1
+    assert len(index) == 1
+    assert index.filter_new([old]) == [old]
+
+
+def test_seen_messages(index):
+    """Test processed UIDs (per UIDVALIDITY) and Message-IDs are remembered."""
+    emails = [
+        RawEmail(subject='', sender='', body='', date=datetime.now(), message_id='<a@bank>', uid='101'),
+        RawEmail(subject='', sender='', body='', date=datetime.now(), message_id=None, uid='102'),
+    ]
+    index.mark_seen(emails, uidvalidity='7')
+
+    assert index.seen_uids('7', ['101', '102', '103']) == {'101', '102'}
+    assert index.seen_uids('8', ['101']) == set()
+    assert index.seen_message_ids(['<a@bank>', '<c@bank>']) == {'<a@bank>'}
+
+
+def test_pending_rows_recorded_until_cleared(index):
+    """Test only rows written as pending are recorded, with their dates, until cleared."""
+    pending = dict(make_row(amount=300.0, date=datetime(2025, 3, 4, 10, 30)), category=PENDING_CATEGORY)
+    index.add_pending([pending, make_row()])
+
+    assert index.pending() == {transaction_fingerprint(pending): datetime(2025, 3, 4, 10, 30)}
+    index.clear_pending([transaction_fingerprint(pending)])
+    assert index.pending() == {}
@@ -0,0 +1,85 @@
+"""Unit tests for transaction deduplicator."""
+from datetime import datetime
+
+import pytest
+
+from src.config import TxType, PaymentMode
+from src.deduplicator import TransactionDeduplicator
+from src.parser import Transaction
+
+
+def make_tx(amount=100.0, minute=0, merchant="SWIGGY", mode=PaymentMode.UPI):
+    """Parsed transaction at 10:<minute>."""
+    return Transaction(
+        amount=amount,
+        tx_type=TxType.DEBIT,
+        mode=mode,
+        merchant=merchant,
+        date=datetime(2026, 1, 7, 10, minute),
+        raw_text=""
+    )
+
+
+def test_deduplicate_parsed_transactions():
+    """Test dedup runs on parsed Transaction objects, before categorization."""
+    first, duplicate, other = make_tx(minute=5), make_tx(minute=20), make_tx(amount=200.0)
+    assert TransactionDeduplicator().deduplicate([first, duplicate, other]) == [first, other]
+
+
+def test_deduplicate_categorized_rows():
+    """Test dedup still accepts categorized dictionaries."""
+    rows = [
+        {'date': datetime(2026, 1, 7, 10, 5), 'amount': 100.0, 'tx_type': 'Debit'},
+        {'date': datetime(2026, 1, 7, 10, 20), 'amount': 100.0, 'tx_type': 'Debit'},
+    ]
+    assert TransactionDeduplicator().deduplicate(rows) == rows[:1]
+
+
+def test_sweep_merges_across_hour_boundary():
+    """Test 10:59 email and 11:01 SMS-forward for one payment are merged."""
+    email_alert = make_tx(minute=59)
+    sms_forward = Transaction(
+        amount=100.0, tx_type=TxType.DEBIT, mode=PaymentMode.UNKNOWN, merchant=None,
+        date=datetime(2026, 1, 7, 11, 1), raw_text=""
+    )
+    dedup = TransactionDeduplicator(mode='sweep', tolerance_minutes=5)
+
+    assert dedup.deduplicate([sms_forward, email_alert]) == [email_alert]
+    # Hour buckets miss this pair
+    assert len(TransactionDeduplicator(mode='bucket').deduplicate([sms_forward, email_alert])) == 2
+
+
+def test_sweep_keeps_separate_payments_in_same_hour():
+    """Test two same-amount payments far apart in time, or to different payees, stay separate."""
+    dedup = TransactionDeduplicator(mode='sweep', tolerance_minutes=5)
+    morning, later = make_tx(minute=0), make_tx(minute=40)
+    assert dedup.deduplicate([morning, later]) == [morning, later]
+
+    swiggy, uber = make_tx(minute=0, merchant="SWIGGY"), make_tx(minute=2, merchant="UBER TRIP")
+    assert dedup.deduplicate([swiggy, uber]) == [swiggy, uber]
+
+    upi, card = make_tx(minute=0, mode=PaymentMode.UPI), make_tx(minute=1, mode=PaymentMode.CARD)
+    assert dedup.deduplicate([upi, card]) == [upi, card]
+
+
+def test_sweep_matches_similar_merchants_and_preserves_order():
+    """Test merchant variants merge, the earliest is kept, and input order is preserved."""
+    dedup = TransactionDeduplicator(mode='sweep', tolerance_minutes=5)
+    other = make_tx(amount=50.0, minute=30)
+    first = make_tx(minute=10, merchant="swiggy@okaxis")
+    second = make_tx(minute=12, merchant="SWIGGY BANGALORE")
+
+    assert dedup.deduplicate([other, second, first]) == [other, first]
+
+
+def test_sweep_chain_uses_tolerance_from_kept_transaction():
+    """Test transactions 4 minutes apart do not chain into one beyond the tolerance."""
+    dedup = TransactionDeduplicator(mode='sweep', tolerance_minutes=5)
+    txs = [make_tx(minute=0), make_tx(minute=4), make_tx(minute=8)]
+    assert dedup.deduplicate(txs) == [txs[0], txs[2]]
+
+
+def test_unknown_mode_rejected():
+    """Test invalid modes fail fast."""
+    with pytest.raises(ValueError):
+        TransactionDeduplicator(mode='fuzzy')
@@ -0,0 +1,95 @@
+"""Unit tests for the IMAP email fetcher."""
+from email.message import EmailMessage
+
+import pytest
+
+from src.email_fetcher import EmailFetcher
+from tests.fakes import FakeIMAP
+
+
+def make_email(body: str, message_id: str) -> bytes:
+    """Build RFC822 bytes for a bank alert."""
+    msg = EmailMessage()
+    msg['Subject'] = 'Transaction alert'
+    msg['From'] = 'alerts@hdfcbank.net'
+    msg['Date'] = 'Wed, 07 Jan 2026 10:15:00 +0530'
+    msg['Message-ID'] = message_id
+    msg.set_content(body)
+    return msg.as_bytes()
+
+
+class FakeSeen:
+    """Seen-message store with fixed contents."""
+
+    def __init__(self, uids=(), message_ids=()):
+        self.uids = set(uids)
+        self.message_ids = set(message_ids)
+
+    def seen_uids(self, uidvalidity, uids):
+        return {uid for uid in uids if uid in self.uids}
+
+    def seen_message_ids(self, message_ids):
+        return {mid for mid in message_ids if mid in self.message_ids}
+
+
+@pytest.fixture
+def imap():
+    """Fake INBOX with three messages, two sharing a Message-ID."""
+    return FakeIMAP([
+        make_email("Rs.100.00 debited via UPI to swiggy@okaxis", "<a@bank>"),
+        make_email("Rs.100.00 debited via UPI to swiggy@okaxis", "<a@bank>"),
+        make_email("Rs.250.00 debited via UPI to zomato@okaxis", "<b@bank>"),
+    ])
+
+
+@pytest.fixture
+def fetcher(imap):
+    """Fetcher connected to the fake INBOX."""
+    fetcher = EmailFetcher('me@example.com', 'secret')
+    fetcher.connection = imap
+    return fetcher
+
+
+def test_fetch_carries_uid_and_message_id(fetcher):
+    """Test fetched emails carry UID and Message-ID, with duplicates dropped."""
+    emails = fetcher.fetch_emails()
+
+    assert [(e.uid, e.message_id) for e in emails] == [('101', '<a@bank>'), ('103', '<b@bank>')]
+    assert fetcher.uidvalidity == '1'
+
+
+def test_fetch_is_batched(fetcher, imap):
+    """Test all UIDs are downloaded with a single UID FETCH."""
+    fetcher.fetch_emails()
+    fetches = [cmd for cmd in imap.commands if cmd[0] == 'FETCH']
+    assert fetches == [('FETCH', '101,102,103', '(UID RFC822)')]
+
+
+def test_seen_uids_skipped_before_download(fetcher, imap):
+    """Test UIDs processed by a previous run are never downloaded."""
+    emails = fetcher.fetch_emails(seen=FakeSeen(uids={'101', '102'}))
+
+    assert [e.uid for e in emails] == ['103']
+    assert ('FETCH', '103', '(UID RFC822)') in imap.commands
+
+
+def test_seen_message_ids_dropped(fetcher):
+    """Test Message-IDs processed by a previous run are dropped."""
+    emails = fetcher.fetch_emails(seen=FakeSeen(message_ids={'<b@bank>'}))
+    assert [e.message_id for e in emails] == ['<a@bank>']
+
+
+def test_kept_connection_checked_and_reopened(fetcher, imap, monkeypatch):
+    """Test a kept-open connection is reused after NOOP, and reopened once it drops."""
+    fetcher.ensure_connected()
+    assert fetcher.connection is imap
+    assert ('NOOP',) in imap.commands
+
+    def dropped():
+        raise OSError("connection reset")
+
+    monkeypatch.setattr(imap, 'noop', dropped)
+    fresh = FakeIMAP([])
+    monkeypatch.setattr('src.email_fetcher.imaplib.IMAP4_SSL', lambda *args, **kwargs: fresh)
+    fetcher.ensure_connected()
+    assert fetcher.connection is fresh
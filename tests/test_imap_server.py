@@ -0,0 +1,135 @@
+"""Tests for the IMAP stand-in server, driven by EmailFetcher and imaplib."""
+import imaplib
+import mailbox
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+import pytest
+
+from src.dedup_index import DedupIndex
+from src.email_fetcher import EmailFetcher
+from tests.imap_server import ImapServer, Mailbox, tokenize
+
+
+def make_email(body: str, message_id: str, sender: str = 'alerts@hdfcbank.net', age: timedelta = timedelta()) -> bytes:
+    """Build RFC822 bytes for an alert sent `age` ago."""
+    msg = EmailMessage()
+    msg['Subject'] = 'Transaction alert'
+    msg['From'] = sender
+    msg['Date'] = format_datetime((datetime.now() - age).astimezone())
+    msg['Message-ID'] = message_id
+    msg.set_content(body)
+    return msg.as_bytes()
+
+
+@pytest.fixture(scope='module')
+def tls():
+    """Server and client TLS contexts for a self-signed certificate."""
+    pytest.importorskip('cryptography')
+    from tests.imap_server import self_signed_contexts
+    return self_signed_contexts()
+
+
+@pytest.fixture
+def inbox():
+    """Two recent bank alerts, one old alert and one non-bank email."""
+    return Mailbox([
+        make_email("Rs.100.00 debited via UPI to swiggy@okaxis", "<a@bank>"),
+        make_email("Rs.250.00 debited via UPI to zomato@okaxis", "<b@bank>"),
+        make_email("Rs.75.00 debited via UPI to uber@okaxis", "<c@bank>", age=timedelta(days=5)),
+        make_email("Your newsletter", "<d@news>", sender='news@example.com'),
+    ], uidvalidity=42)
+
+
+def test_fetcher_over_tls(inbox, tls):
+    """Test EmailFetcher searches and downloads bank alerts over TLS."""
+    server_context, client_context = tls
+    with ImapServer(inbox, ssl_context=server_context, password='secret') as server:
+        with EmailFetcher('me@example.com', 'secret', '127.0.0.1', server.port, ssl_context=client_context) as fetcher:
+            emails = fetcher.fetch_emails(hours=25)
+
+    assert [(e.uid, e.message_id) for e in emails] == [('101', '<a@bank>'), ('102', '<b@bank>')]
+    assert fetcher.uidvalidity == '42'
+    uid_commands = [arguments.split()[0] for command, arguments in server.commands if command == 'UID']
+    assert uid_commands == ['SEARCH', 'FETCH']
+
+
+def test_incremental_run_downloads_only_new_messages(inbox, tls, tmp_path):
+    """Test a second run skips UIDs seen before, even with nothing written yet."""
+    server_context, client_context = tls
+    with ImapServer(inbox, ssl_context=server_context) as server, \
+            DedupIndex(str(tmp_path / 'index.sqlite')) as index:
+        with EmailFetcher('me@example.com', 'secret', '127.0.0.1', server.port, ssl_context=client_context) as fetcher:
+            index.mark_seen(fetcher.fetch_emails(seen=index), fetcher.uidvalidity)
+        inbox.append(make_email("Rs.10.00 debited via UPI to ola@okaxis", "<e@bank>"))
+        first_run = len(server.commands)
+        with EmailFetcher('me@example.com', 'secret', '127.0.0.1', server.port, ssl_context=client_context) as fetcher:
+            emails = fetcher.fetch_emails(seen=index)
+
+    assert [e.uid for e in emails] == ['105']
+    assert ('UID', 'FETCH 105 (UID RFC822)') in server.commands[first_run:]
+
+
+def test_wrong_password_rejected(inbox):
+    """Test LOGIN with the wrong password is refused."""
+    with ImapServer(inbox, password='secret') as server:
+        imap = imaplib.IMAP4('127.0.0.1', server.port)
+        with pytest.raises(imaplib.IMAP4.error, match='AUTHENTICATIONFAILED'):
+            imap.login('me@example.com', 'wrong')
+        imap.logout()
+
+
+def test_search_and_fetch_by_sequence_number(inbox):
+    """Test plain SEARCH/FETCH use sequence numbers and support OR, NOT and ranges."""
+    with ImapServer(inbox) as server:
+        imap = imaplib.IMAP4('127.0.0.1', server.port)
+        imap.login('me@example.com', 'secret')
+        imap.select('INBOX')
+
+        assert imap.search(None, '(OR FROM "news@" FROM "nobody")') == ('OK', [b'4'])
+        assert imap.search(None, 'NOT FROM "hdfcbank" 1:*') == ('OK', [b'4'])
+        status, data = imap.fetch('2:3', '(UID RFC822.SIZE)')
+        assert status == 'OK'
+        assert data == [
+            f'2 (UID 102 RFC822.SIZE {len(inbox.messages[1].raw)})'.encode(),
+            f'3 (UID 103 RFC822.SIZE {len(inbox.messages[2].raw)})'.encode(),
+        ]
+        imap.logout()
+
+
+def test_idle_reports_new_messages(inbox):
+    """Test an idling client is told about a delivered message, and DONE ends IDLE."""
+    with ImapServer(inbox) as server:
+        imap = imaplib.IMAP4('127.0.0.1', server.port)
+        imap.login('me@example.com', 'secret')
+        imap.select('INBOX')
+
+        imap.send(b'I1 IDLE\r\n')
+        assert imap.readline().startswith(b'+')
+        inbox.append(make_email("Rs.10.00 debited", "<e@bank>"))
+        assert imap.readline() == b'* 5 EXISTS\r\n'
+        imap.send(b'DONE\r\n')
+        assert imap.readline() == b'I1 OK IDLE terminated\r\n'
+
+        assert imap.uid('SEARCH', None, 'UID 105') == ('OK', [b'105'])
+        imap.logout()
+
+
+def test_maildir_corpus(tmp_path):
+    """Test a Maildir is served oldest message first."""
+    maildir = mailbox.Maildir(tmp_path / 'Mail')
+    maildir.add(make_email("second", "<2@bank>"))
+    maildir.add(make_email("first", "<1@bank>", age=timedelta(hours=1)))
+
+    inbox = Mailbox.from_maildir(str(tmp_path / 'Mail'))
+
+    assert [b'first' in message.raw for message in inbox.messages] == [True, False]
+    assert [message.uid for message in inbox.messages] == [101, 102]
+
+
+def test_tokenize_nested_and_bracketed():
+    """Test quoted strings, nested groups and bracketed fetch items."""
+    assert tokenize('(OR FROM "a b" (SINCE 01-Jan-2026)) BODY.PEEK[HEADER.FIELDS (FROM)]') == [
+        ['OR', 'FROM', 'a b', ['SINCE', '01-Jan-2026']], 'BODY.PEEK[HEADER.FIELDS (FROM)]'
+    ]
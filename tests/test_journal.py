@@ -0,0 +1,107 @@
+"""Tests for the stage journal used by --resume."""
+from datetime import datetime
+
+import pytest
+
+from src.config import PaymentMode, TxType
+from src.deduplicator import transaction_fingerprint
+from src.email_fetcher import RawEmail
+from src.journal import RunJournal
+from src.main import resume_input
+from src.parser import Transaction
+from src.pipeline import Pipeline, Stage
+
+
+def _email(amount: float) -> RawEmail:
+    return RawEmail(subject="Debit", sender="alerts@bank.com", body=f"Rs {amount} debited",
+                    date=datetime(2026, 1, 5, 12, 30), message_id=f"<{amount}>", uid=str(int(amount)))
+
+
+def _transaction(amount: float) -> Transaction:
+    return Transaction(amount=amount, tx_type=TxType.DEBIT, mode=PaymentMode.UPI,
+                       merchant="SWIGGY", date=datetime(2026, 1, 5, 12, 30), raw_text="")
+
+
+def _row(tx: Transaction) -> dict:
+    return {'date': tx.date, 'amount': tx.amount, 'tx_type': tx.tx_type.value,
+            'mode': tx.mode.value, 'merchant': tx.merchant, 'category': 'Food & Dining', 'raw_text': ''}
+
+
+def test_records_round_trip(tmp_path):
+    """Test emails, transactions and rows come back as they were recorded."""
+    journal = RunJournal(str(tmp_path))
+    journal.start()
+    email = _email(10.0)
+    tx = _transaction(10.0)
+
+    journal.record('fetch', [email])
+    journal.record('parse', [tx])
+    journal.record('categorize', [_row(tx)])
+
+    reopened = RunJournal(str(tmp_path))
+    assert reopened.load('fetch') == [email]
+    assert reopened.load('parse') == [tx]
+    assert reopened.load('categorize') == [_row(tx)]
+
+
+def test_truncated_entry_skipped(tmp_path):
+    """Test a half-written last line from a crash is ignored."""
+    journal = RunJournal(str(tmp_path))
+    journal.record('parse', [_transaction(10.0)])
+    with open(tmp_path / 'parse.jsonl', 'a') as f:
+        f.write('{"amount": 2')
+
+    assert journal.load('parse') == [_transaction(10.0)]
+
+
+def test_failed_run_resumes_after_last_completed_stage(tmp_path):
+    """Test a failure in a later stage leaves earlier stages complete and resumable."""
+    journal = RunJournal(str(tmp_path))
+    journal.start()
+
+    def fail(rows):
+        raise RuntimeError("sheets down")
+
+    stages = [
+        journal.journal_stage(Stage('parse', lambda emails: [_transaction(float(e.uid)) for e in emails])),
+        journal.journal_stage(Stage('categorize', lambda txs: [_row(tx) for tx in txs])),
+        journal.journal_stage(Stage('write', fail)),
+    ]
+    with pytest.raises(RuntimeError):
+        Pipeline(stages).run_inline(journal.journal_source([[_email(1.0), _email(2.0)]]))
+
+    reopened = RunJournal(str(tmp_path))
+    assert reopened.last_completed() == 'categorize'
+    assert [row['amount'] for row in resume_input(reopened, 'categorize')] == [1.0, 2.0]
+
+
+def test_resume_skips_rows_already_written(tmp_path):
+    """Test categorized rows whose write was journaled are not written again."""
+    journal = RunJournal(str(tmp_path))
+    journal.start()
+    rows = [_row(_transaction(1.0)), _row(_transaction(2.0))]
+    journal.record('categorize', rows)
+    journal.complete('categorize')
+    journal.record('write', rows[:1])
+
+    assert resume_input(journal, 'categorize') == rows[1:]
+    assert journal.load('write') == [transaction_fingerprint(rows[0])]
+
+
+def test_rewind_and_start_discard_later_output(tmp_path):
+    """Test re-run stages start from empty files and a fresh run clears everything."""
+    journal = RunJournal(str(tmp_path))
+    journal.start()
+    journal.record('parse', [_transaction(1.0)])
+    journal.complete('parse')
+    journal.record('dedup', [_transaction(1.0)])
+    journal.record('write', [_row(_transaction(1.0))])
+
+    journal.rewind('parse')
+    assert journal.load('dedup') == []
+    assert len(journal.load('write')) == 1
+    assert journal.last_completed() == 'parse'
+
+    journal.start()
+    assert journal.last_completed() is None
+    assert journal.load('parse') == []
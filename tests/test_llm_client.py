@@ -0,0 +1,169 @@
+"""Unit tests for the resilient LLM client wrapper."""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm_client import CircuitBreaker, LLMUnavailableError, ResilientLLMClient
+
+
+class FakeClock:
+    """Clock advanced by the fake sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StatusError(Exception):
+    """API error carrying an HTTP status and headers."""
+
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def flaky(errors, result="ok"):
+    """Function raising the given errors in turn, then returning result."""
+    errors = list(errors)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    func.calls = calls
+    return func
+
+
+@pytest.fixture
+def clock():
+    """Fake clock."""
+    return FakeClock()
+
+
+def make_client(clock, **kwargs):
+    """Resilient client with deterministic jitter and fake time."""
+    kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=2, reset_timeout=60, clock=clock))
+    return ResilientLLMClient(sleep=clock.sleep, clock=clock, jitter=lambda: 1.0, **kwargs)
+
+
+def test_retries_transient_errors_with_backoff(clock):
+    """Test 429 and 5xx are retried with exponential backoff."""
+    client = make_client(clock, base_delay=1.0)
+    func = flaky([StatusError(429), StatusError(503)])
+
+    assert client.call(func) == "ok"
+    assert len(func.calls) == 3
+    assert clock.sleeps == [1.0, 2.0]
+
+
+def test_honors_retry_after(clock):
+    """Test the retry-after header overrides a shorter backoff."""
+    client = make_client(clock, base_delay=1.0)
+    func = flaky([StatusError(429, {'retry-after': '7'})])
+
+    assert client.call(func) == "ok"
+    assert clock.sleeps == [7.0]
+
+
+def test_non_retryable_error_propagates(clock):
+    """Test client errors are not retried or wrapped."""
+    client = make_client(clock)
+    func = flaky([StatusError(400)])
+
+    with pytest.raises(StatusError):
+        client.call(func)
+    assert len(func.calls) == 1
+
+
+def test_gives_up_after_max_retries(clock):
+    """Test exhausting retries raises LLMUnavailableError."""
+    client = make_client(clock, max_retries=2)
+    func = flaky([StatusError(500)] * 5)
+
+    with pytest.raises(LLMUnavailableError):
+        client.call(func)
+    assert len(func.calls) == 3
+
+
+def test_deadline_stops_calls(clock):
+    """Test no call is made once the run deadline passes."""
+    client = make_client(clock, deadline=10.0)
+    clock.now = 11.0
+    func = flaky([])
+
+    with pytest.raises(LLMUnavailableError):
+        client.call(func)
+    assert not func.calls
+
+
+def test_circuit_breaker_opens_and_recovers(clock):
+    """Test consecutive failures open the breaker until the cooldown passes."""
+    client = make_client(clock, max_retries=0)
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            client.call(flaky([StatusError(503)]))
+    assert client.breaker.state == 'open'
+
+    func = flaky([])
+    with pytest.raises(LLMUnavailableError):
+        client.call(func)
+    assert not func.calls
+
+    clock.now += 61
+    assert client.breaker.state == 'half-open'
+    assert client.call(func) == "ok"
+    assert client.breaker.state == 'closed'
+
+
+def test_half_open_breaker_lets_one_trial_call_through(clock):
+    """Test only one thread probes a half-open breaker, and a probe without an outcome frees it."""
+    client = make_client(clock, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            client.call(flaky([StatusError(503)]))
+    clock.now += 61
+
+    probing = threading.Event()
+    finish = threading.Event()
+
+    def probe():
+        probing.set()
+        finish.wait(5)
+        return "ok"
+
+    prober = threading.Thread(target=client.call, args=(probe,))
+    prober.start()
+    probing.wait(5)
+    other = flaky([])
+    with pytest.raises(LLMUnavailableError):
+        client.call(other)
+    assert not other.calls
+    finish.set()
+    prober.join()
+    assert client.breaker.state == 'closed'
+
+    # A non-retryable error leaves the breaker half-open for the next caller
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            client.call(flaky([StatusError(503)]))
+    clock.now += 61
+    with pytest.raises(StatusError):
+        client.call(flaky([StatusError(400)]))
+    results = []
+    next_caller = threading.Thread(target=lambda: results.append(client.call(other)))
+    next_caller.start()
+    next_caller.join()
+    assert results == ["ok"]
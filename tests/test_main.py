@@ -0,0 +1,273 @@
+"""Tests for pipeline steps in the main orchestrator."""
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+from types import SimpleNamespace
+
+import pytest
+
+from src.categorizer import TransactionCategorizer
+from src.config import PENDING_CATEGORY, Account, PaymentMode, TxType
+from src import main as main_module
+from src.dedup_index import DedupIndex
+from src.email_fetcher import EmailFetcher
+from src.main import backfill_categories, run_account, run_accounts
+from src.parser import Transaction, TransactionParser
+from src.sheets import SheetsClientPool, SheetsWriter
+from src.sinks import MultiSink, SQLiteSink
+from tests.fakes import FakeAnthropic, FakeIMAP, FakeSheetsService
+
+
+@pytest.fixture
+def categorizer(tmp_path):
+    """Categorizer with temp state files and a fake LLM."""
+    categorizer = TransactionCategorizer(
+        api_key="test-key",
+        cache_file=str(tmp_path / 'cache.json'),
+        model_file=str(tmp_path / 'model.json'),
+        batch_file=str(tmp_path / 'batch.json')
+    )
+    categorizer.client = FakeAnthropic(lambda params: "I")  # Healthcare
+    return categorizer
+
+
+def test_deferred_rows_written_then_patched(categorizer, tmp_path):
+    """Test pending rows go out first and only their Category cells are patched later."""
+    service = FakeSheetsService()
+    sinks = MultiSink([
+        SheetsWriter('{}', 'sheet-id', service=service),
+        SQLiteSink(str(tmp_path / 'ledger.sqlite'))
+    ])
+    transactions = [
+        Transaction(amount=300.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                    merchant="CITY PHARMACY", date=datetime.now(), raw_text=""),
+        Transaction(amount=250.0, tx_type=TxType.DEBIT, mode=PaymentMode.UPI,
+                    merchant="SWIGGY", date=datetime.now(), raw_text=""),
+    ]
+
+    # Run 1: write with provisional categories, no synchronous LLM call
+    rows = categorizer.categorize_batch(transactions, defer=True)
+    assert sinks.write(rows) == {'sheets': 2, 'sqlite': 2}
+    assert not categorizer.client.messages.calls
+    tab = service.tabs[datetime.now().strftime('%B %Y')]
+    assert tab['rows'][1][4] == PENDING_CATEGORY
+
+    # Nothing resolvable yet: the pending merchant is submitted as a batch
+    assert backfill_categories(categorizer, sinks) == 0
+    assert len(categorizer.client.messages.batches.batches) == 1
+
+    # Run 2: batch has ended, both sinks are patched in place
+    writes_before = len(service.calls_to('values.batchUpdate'))
+    assert backfill_categories(categorizer, sinks) == 2
+    assert tab['rows'][1][4] == "Healthcare"
+    assert tab['rows'][2][4] == "Food & Dining"
+    assert len(service.calls_to('values.batchUpdate')) == writes_before + 1
+    patch = service.calls_to('values.batchUpdate')[-1]['body']['data']
+    assert [item['range'][-2:] for item in patch] == ['E2']
+    assert sinks.sinks[1].pending_rows() == []
+    assert len(tab['rows']) == 3
+
+
+def test_rows_pending_after_outage_patched_next_run(categorizer, tmp_path):
+    """Test rows written as pending while the breaker was open are categorized once the LLM is back."""
+    sinks = MultiSink([SQLiteSink(str(tmp_path / 'ledger.sqlite'))])
+    transaction = Transaction(amount=300.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                              merchant="CITY PHARMACY", date=datetime(2026, 1, 5, 10, 30), raw_text="")
+
+    # Run 1: the breaker is open, so the row goes out pending
+    breaker = categorizer.llm.breaker
+    breaker.opened_at = breaker.clock()
+    rows = categorizer.categorize_batch([transaction])
+    assert rows[0]['category'] == PENDING_CATEGORY
+    sinks.write(rows)
+
+    # Run 2: the LLM answers again, synchronously as in non-deferred mode
+    breaker.record_success()
+    categorizer.new_run()
+    assert backfill_categories(categorizer, sinks, defer=False) == 1
+    assert sinks.sinks[0].pending_rows() == []
+    assert len(categorizer.client.messages.calls) == 1
+    assert not categorizer.client.messages.batches.batches
+
+
+def test_failed_batch_collection_does_not_stop_backfill(categorizer, tmp_path, monkeypatch):
+    """Test an error collecting batch results leaves the rows pending instead of failing the run."""
+    sinks = MultiSink([SQLiteSink(str(tmp_path / 'ledger.sqlite'))])
+    transaction = Transaction(amount=300.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                              merchant="CITY PHARMACY", date=datetime(2026, 1, 5, 10, 30), raw_text="")
+    sinks.write(categorizer.categorize_batch([transaction], defer=True))
+    monkeypatch.setattr(categorizer, 'poll_batches', lambda: 1 / 0)
+
+    assert backfill_categories(categorizer, sinks, defer=False) == 1
+    assert sinks.sinks[0].pending_rows() == []
+
+
+def test_entry_point_does_not_import_heavy_clients():
+    """Test the SDKs are only imported once a stage needs them."""
+    code = (
+        "import sys, src.main\n"
+        "heavy = ['anthropic', 'googleapiclient.discovery', 'google.oauth2.service_account']\n"
+        "print(','.join(m for m in heavy if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_accounts_run_concurrently_and_fail_independently(monkeypatch):
+    """Test accounts share one categorizer, run in parallel and keep their own errors."""
+    barrier = threading.Barrier(2, timeout=5)
+    seen = []
+
+    def fake_run_account(account, config, report, parser, categorizer, sheets_pool, resume, profiler=None,
+                         fetcher=None, limit=None):
+        barrier.wait()  # Both accounts are in flight at once
+        seen.append(categorizer)
+        if account.name == 'shop':
+            raise RuntimeError("IMAP login failed")
+        report['counts']['written'] = 3
+
+    monkeypatch.setattr(main_module, 'run_account', fake_run_account)
+    accounts = [Account('home', 'a@example.com', 'pw', ['csv']), Account('shop', 'b@example.com', 'pw', ['csv'])]
+    shared = object()
+
+    reports = run_accounts(accounts, config=None, parser=None, categorizer=shared, workers=2)
+
+    assert reports['home'] == {'counts': {'written': 3}}
+    assert reports['shop']['error'] == "IMAP login failed"
+    assert seen == [shared, shared]
+
+
+def _alert(amount: float, message_id: str) -> bytes:
+    """HDFC UPI debit alert sent now."""
+    msg = EmailMessage()
+    msg['Subject'] = 'Transaction alert'
+    msg['From'] = 'alerts@hdfcbank.net'
+    msg['Date'] = datetime.now().astimezone().strftime('%a, %d %b %Y %H:%M:%S %z')
+    msg['Message-ID'] = message_id
+    msg.set_content(f"Rs.{amount:.2f} has been debited from A/c **1234. VPA swiggy@okaxis. Avl Bal: Rs.45000.00")
+    return msg.as_bytes()
+
+
+def test_resumed_run_also_fetches_new_mail(categorizer, tmp_path, monkeypatch):
+    """Test resuming a failed run finishes its journaled emails and still imports mail that arrived since."""
+    monkeypatch.chdir(tmp_path)
+    account = Account('default', 'me@example.com', 'pw', ['csv'])
+    config = SimpleNamespace(dedup_mode='bucket', dedup_tolerance_minutes=5, dedup_horizon_days=90,
+                             defer_categorization=False, pipeline_mode='batch')
+    imap = FakeIMAP([_alert(100.0, '<a@bank>')])
+    fetcher = EmailFetcher('me@example.com', 'pw')
+    fetcher.connection = imap
+
+    # Night N fails after fetching, parsing and deduplicating
+    categorize_batch = categorizer.categorize_batch
+    monkeypatch.setattr(categorizer, 'categorize_batch', lambda *args, **kwargs: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        run_account(account, config, {}, TransactionParser(), categorizer, fetcher=fetcher)
+    monkeypatch.setattr(categorizer, 'categorize_batch', categorize_batch)
+
+    # Night N+1 resumes, after another alert arrived
+    imap.mailbox['102'] = _alert(250.0, '<b@bank>')
+    imap.commands.clear()
+    report = {}
+    rows = run_account(account, config, report, TransactionParser(), categorizer, resume=True, fetcher=fetcher)
+
+    assert report['resumed_from'] == 'dedup'
+    assert report['counts']['emails'] == 2
+    assert sorted(row['amount'] for row in rows) == [100.0, 250.0]
+    assert [command[1] for command in imap.commands if command[0] == 'FETCH'] == ['102']
+    with open('transactions.csv') as f:
+        assert len(f.readlines()) == 3
+
+
+def test_pending_rows_in_old_tabs_patched(categorizer, tmp_path):
+    """Test rows recorded as pending are found in their own tabs, however old, and only there."""
+    service = FakeSheetsService([datetime.now().strftime('%B %Y')])
+    sinks = MultiSink([SheetsWriter('{}', 'sheet-id', service=service)])
+    index = DedupIndex(str(tmp_path / 'index.sqlite'))
+    transaction = Transaction(amount=300.0, tx_type=TxType.DEBIT, mode=PaymentMode.CARD,
+                              merchant="CITY PHARMACY", date=datetime(2024, 2, 5, 10, 30), raw_text="")
+    # Back-filled history, written pending in deferred mode
+    rows = categorizer.categorize_batch([transaction], defer=True)
+    sinks.write(rows)
+    index.add_pending(rows)
+
+    assert backfill_categories(categorizer, sinks, defer=False, dedup_index=index) == 1
+    assert service.tabs['February 2024']['rows'][1][4] == "Healthcare"
+    assert service.calls_to('values.batchGet')[-1]['ranges'] == ["'February 2024'!A:G"]
+    assert index.pending() == {}
+
+
+def test_sheets_only_read_for_recorded_pending_rows(categorizer, tmp_path, monkeypatch):
+    """Test the pending pass reads the sheet while rows are recorded as pending, and not at all after."""
+    monkeypatch.chdir(tmp_path)
+    account = Account('default', 'me@example.com', 'pw', ['sheets'], spreadsheet_id='sheet-id')
+    config = SimpleNamespace(dedup_mode='bucket', dedup_tolerance_minutes=5, dedup_horizon_days=90,
+                             defer_categorization=False, pipeline_mode='batch')
+    service = FakeSheetsService()
+    pool = SheetsClientPool('{}')
+    pool.release(service)
+    fetcher = EmailFetcher('me@example.com', 'pw')
+    fetcher.connection = FakeIMAP([_alert(300.0, '<a@bank>').replace(b'swiggy@okaxis', b'citypharmacy@okaxis')])
+
+    # Run 1: the LLM is down, so the row goes out pending
+    breaker = categorizer.llm.breaker
+    breaker.opened_at = breaker.clock()
+    run_account(account, config, {}, TransactionParser(), categorizer, pool, fetcher=fetcher)
+    tab = service.tabs[datetime.now().strftime('%B %Y')]
+    assert tab['rows'][1][4] == PENDING_CATEGORY
+
+    # Run 2: no new mail, the recorded row is patched
+    categorizer.new_run()
+    report = {}
+    run_account(account, config, report, TransactionParser(), categorizer, pool, fetcher=fetcher)
+    assert report['counts']['backfilled'] == 1
+    assert tab['rows'][1][4] == "Healthcare"
+
+    # Run 3: nothing pending and no new mail, so the sheet is never touched
+    service.calls.clear()
+    run_account(account, config, {}, TransactionParser(), categorizer, pool, fetcher=fetcher)
+    assert service.calls == []
+
+
+def test_concurrent_accounts_share_client_cap_and_counts(tmp_path, monkeypatch):
+    """Test accounts run together stay under the shared client cap and the shared stats add up."""
+    monkeypatch.chdir(tmp_path)
+    in_flight = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def responder(params):
+        with lock:
+            in_flight.append(params)
+            peak[0] = max(peak[0], len(in_flight))
+        time.sleep(0.002)
+        with lock:
+            in_flight.remove(params)
+        return "I"
+
+    categorizer = TransactionCategorizer("test-key", cache_file='cache.json', model_file='model.json',
+                                         batch_file='batch.json')
+    categorizer.client = FakeAnthropic(responder)
+    config = SimpleNamespace(dedup_mode='bucket', dedup_tolerance_minutes=5, dedup_horizon_days=90,
+                             defer_categorization=False, pipeline_mode='staged')
+    accounts, fetchers = [], {}
+    for name in ('home', 'shop', 'office'):
+        accounts.append(Account(name, f'{name}@example.com', 'pw', ['csv']))
+        fetchers[name] = EmailFetcher(f'{name}@example.com', 'pw')
+        fetchers[name].connection = FakeIMAP([
+            _alert(100.0 + i, f'<{name}{i}@bank>').replace(b'swiggy@okaxis', f'{name}{i}@okaxis'.encode())
+            for i in range(20)
+        ])
+
+    reports = run_accounts(accounts, config, TransactionParser(), categorizer, workers=3, fetchers=fetchers,
+                           limit=threading.BoundedSemaphore(1))
+
+    assert all('error' not in report for report in reports.values())
+    assert [report['counts']['written'] for report in reports.values()] == [20, 20, 20]
+    assert peak[0] == 1
+    assert categorizer.stats.tiers['llm'] == 60
+    assert categorizer.stats.usage.calls == 60
+    assert categorizer.stats.llm_latency.count == 60
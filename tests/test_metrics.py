@@ -0,0 +1,95 @@
+"""Unit tests for metrics primitives."""
+from types import SimpleNamespace
+
+import pytest
+
+from src.metrics import LatencyHistogram, LLMUsage, RunMetrics
+
+
+def test_histogram_percentiles():
+    """Test bucket counts and interpolated percentiles."""
+    histogram = LatencyHistogram(buckets=(0.1, 1.0, 10.0))
+    for seconds in [0.05] * 50 + [0.5] * 45 + [5.0] * 5:
+        histogram.observe(seconds)
+
+    summary = histogram.to_dict()
+    assert summary['count'] == 100
+    assert summary['buckets'] == {'0.1': 50, '1.0': 45, '10.0': 5, '+Inf': 0}
+    assert histogram.percentile(50) <= 0.1
+    assert 0.1 < histogram.percentile(90) <= 1.0
+    assert histogram.percentile(99) <= 5.0
+
+
+def test_histogram_percentiles_within_one_bucket():
+    """Test durations clustered in one bucket get distinct percentiles below the max."""
+    histogram = LatencyHistogram(buckets=(0.05, 1.0))
+    exact = LatencyHistogram(buckets=(0.05, 1.0), keep_samples=True)
+    for seconds in [0.010] * 90 + [0.040] * 10:
+        histogram.observe(seconds)
+        exact.observe(seconds)
+
+    assert histogram.percentile(50) < histogram.percentile(95) < histogram.percentile(99) < histogram.max
+    assert exact.percentile(50) == pytest.approx(0.010)
+    assert exact.percentile(95) == pytest.approx(0.040)
+
+
+def test_empty_histogram():
+    """Test an empty histogram has no percentiles."""
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_usage_accumulates_and_prices():
+    """Test usage blocks add up and discounts apply."""
+    usage = LLMUsage()
+    usage.add(SimpleNamespace(input_tokens=1_000_000, output_tokens=0,
+                              cache_read_input_tokens=None, cache_creation_input_tokens=0))
+    assert usage.calls == 1
+    assert usage.cost_usd() > 0
+    assert usage.cost_usd(0.5) == usage.cost_usd() / 2
+
+
+def test_spans_accumulate_per_stage():
+    """Test spans add up calls, items and errors per stage."""
+    metrics = RunMetrics()
+    with metrics.span('parse', items=3):
+        pass
+    with metrics.span('parse') as span:
+        span.items = 2
+    with pytest.raises(RuntimeError):
+        with metrics.span('fetch'):
+            raise RuntimeError("boom")
+
+    stages = metrics.to_dict()['stages']
+    assert stages['parse']['calls'] == 2
+    assert stages['parse']['items'] == 5
+    assert stages['parse']['errors'] == 0
+    assert stages['fetch']['errors'] == 1
+    assert stages['parse']['p95_seconds'] <= 0.001
+
+
+def test_openmetrics_exposition():
+    """Test counters, stage spans and histograms render as OpenMetrics text."""
+    metrics = RunMetrics()
+    with metrics.span('fetch', items=4):
+        pass
+    metrics.count('api_calls', api='sheets')
+    metrics.count('api_calls', 2, api='sheets')
+    metrics.count('bytes_fetched', 1024)
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    metrics.add_histogram('llm_latency_seconds', histogram)
+
+    text = metrics.to_openmetrics()
+    lines = text.splitlines()
+    assert lines[-1] == '# EOF'
+    assert 'gringotts_stage_items_total{stage="fetch"} 4' in lines
+    assert '# TYPE gringotts_api_calls counter' in lines
+    assert 'gringotts_api_calls_total{api="sheets"} 3' in lines
+    assert 'gringotts_bytes_fetched_total 1024' in lines
+    assert 'gringotts_llm_latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'gringotts_llm_latency_seconds_count 2' in lines
+
+    assert metrics.to_dict()['counters']['api_calls'] == {'api=sheets': 3}
+    metrics.reset()
+    assert metrics.to_dict() == {'stages': {}, 'counters': {}}
@@ -0,0 +1,134 @@
+"""Unit tests for the staged pipeline runner."""
+import json
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from src.categorizer import TransactionCategorizer
+from src.dedup_index import DedupIndex
+from src.deduplicator import TransactionDeduplicator
+from src.email_fetcher import RawEmail
+from src.main import TransactionStages
+from src.parser import TransactionParser
+from src.pipeline import Pipeline, Stage
+from src.sinks import MultiSink, SQLiteSink
+from tests.fakes import FakeAnthropic
+
+
+def chunks(n, size):
+    """Source of n integers in chunks."""
+    for i in range(0, n, size):
+        yield list(range(i, min(n, i + size)))
+
+
+def test_threaded_run_matches_inline():
+    """Test the threaded pipeline produces the same items, in order, as the batch path."""
+    def make_stages():
+        buffer = []
+        return [
+            Stage('double', lambda xs: [x * 2 for x in xs]),
+            Stage('odd-filter', lambda xs: [x for x in xs if x % 3]),
+            Stage('batch', lambda xs: buffer.extend(xs) or [], finish=lambda: list(buffer))
+        ]
+
+    expected = Pipeline(make_stages()).run_inline(chunks(100, 7))
+    assert Pipeline(make_stages(), queue_size=1).run(chunks(100, 7)) == expected
+    assert len(expected) == 66
+
+
+def test_stages_overlap():
+    """Test wall time approaches the slowest stage rather than the sum."""
+    def slow(seconds):
+        def process(xs):
+            time.sleep(seconds)
+            return xs
+        return process
+
+    stages = [Stage('a', slow(0.02)), Stage('b', slow(0.02)), Stage('c', slow(0.02))]
+    started = time.perf_counter()
+    assert len(Pipeline(stages).run(chunks(10, 1))) == 10
+    elapsed = time.perf_counter() - started
+
+    # Sequential cost is 3 x 10 x 0.02 = 0.6s; overlapped is about 12 x 0.02
+    assert elapsed < 0.45
+    assert [stage.chunks for stage in stages] == [10, 10, 10]
+
+
+def test_stage_error_propagates_and_stops_workers():
+    """Test a failing stage stops the source and other stages, then re-raises."""
+    produced = []
+
+    def endless():
+        i = 0
+        while True:
+            produced.append(i)
+            yield [i]
+            i += 1
+
+    def explode(xs):
+        if xs[0] == 5:
+            raise RuntimeError("boom")
+        return xs
+
+    pipeline = Pipeline([Stage('ok', lambda xs: xs), Stage('explode', explode)], queue_size=2,
+                        poll_interval=0.01)
+    with pytest.raises(RuntimeError, match="boom"):
+        pipeline.run(endless())
+    # Back-pressure: the source stopped shortly after the failure
+    assert len(produced) < 20
+
+
+def test_source_error_propagates():
+    """Test an error while fetching fails the run."""
+    def failing():
+        yield [1]
+        raise ConnectionError("IMAP dropped")
+
+    with pytest.raises(ConnectionError):
+        Pipeline([Stage('ok', lambda xs: xs)], poll_interval=0.01).run(failing())
+
+
+@pytest.mark.parametrize('mode', ['bucket', 'sweep'])
+def test_transaction_stages_staged_matches_batch(tmp_path, mode):
+    """Test a staged run writes exactly what the batch path writes."""
+    fixtures = json.loads((Path(__file__).parent / 'fixtures' / 'sample_emails.json').read_text())
+    start = datetime(2026, 1, 7, 9, 0)
+    emails = [
+        RawEmail(subject='', sender='', body=sample['body'], date=start + timedelta(minutes=i),
+                 message_id=f'<{i}@bank>', uid=str(i))
+        for i, sample in enumerate(list(fixtures.values()) * 2)
+    ]
+
+    def run(name, staged):
+        categorizer = TransactionCategorizer(
+            api_key='test-key',
+            cache_file=str(tmp_path / f'{name}-cache.json'),
+            model_file=str(tmp_path / f'{name}-model.json'),
+            batch_file=str(tmp_path / f'{name}-batch.json')
+        )
+        categorizer.client = FakeAnthropic(lambda params: "D")
+        sink = SQLiteSink(str(tmp_path / f'{name}-ledger.sqlite'))
+        stages = TransactionStages(
+            TransactionParser(),
+            TransactionDeduplicator(mode=mode),
+            DedupIndex(str(tmp_path / f'{name}-index.sqlite')),
+            categorizer,
+            MultiSink([sink]),
+            incremental=staged,
+            write_batch=3
+        )
+        pipeline = Pipeline(stages.stages())
+        source = (emails[i:i + 4] for i in range(0, len(emails), 4))
+        rows = pipeline.run(source) if staged else pipeline.run_inline(source)
+        ledger = sink.connection.execute('SELECT * FROM transactions ORDER BY id').fetchall()
+        return rows, ledger, stages.counts
+
+    batch_rows, batch_ledger, batch_counts = run('batch', staged=False)
+    staged_rows, staged_ledger, staged_counts = run('staged', staged=True)
+
+    assert staged_rows == batch_rows
+    assert staged_ledger == batch_ledger
+    assert staged_counts == batch_counts
+    assert batch_counts['written'] > 0
@@ -0,0 +1,115 @@
+"""Tests for per-stage profiling."""
+import cProfile
+import pstats
+import threading
+
+import pytest
+
+from src.pipeline import Pipeline, Stage
+from src.profiling import StageProfiler
+
+
+def busy(n: int) -> int:
+    """Burn some CPU in a recognizable function."""
+    return sum(i * i for i in range(n))
+
+
+def test_stages_profiled_and_written(tmp_path):
+    """Test each stage gets a pstats file, collapsed stacks and its hot functions."""
+    profiler = StageProfiler(str(tmp_path), top=5, sample_interval=0.001)
+    stages = [
+        profiler.stage(Stage('square', lambda chunk: [busy(200_000) for _ in chunk])),
+        profiler.stage(Stage('count', lambda chunk: [len(chunk)], finish=lambda: [0])),
+    ]
+
+    profiler.start()
+    output = Pipeline(stages).run(profiler.source([[1, 2], [3]], name='fetch'))
+    profiler.stop()
+    summary = profiler.write()
+
+    assert sorted(output) == [0, 1, 2]
+    assert set(summary) == {'fetch', 'square', 'count'}
+    assert summary['square']['calls'] == 2
+    assert summary['count']['calls'] == 3  # two chunks and finish
+    assert any('busy' in entry['function'] for entry in summary['square']['hot_functions'])
+
+    stats = pstats.Stats(str(tmp_path / 'square.pstats'))
+    assert any(func[2] == 'busy' for func in stats.stats)
+
+    stacks = (tmp_path / 'square.collapsed').read_text().splitlines()
+    assert stacks and all(line.rsplit(' ', 1)[1].isdigit() for line in stacks)
+    assert any('test_profiling:busy' in line for line in stacks)
+
+
+def test_peak_memory_per_stage(tmp_path):
+    """Test tracemalloc attributes a large allocation to the stage that made it."""
+    profiler = StageProfiler(str(tmp_path), memory=True)
+    stages = [
+        profiler.stage(Stage('allocate', lambda chunk: [len(bytearray(8 * 2 ** 20))])),
+        profiler.stage(Stage('small', lambda chunk: chunk)),
+    ]
+
+    profiler.start()
+    Pipeline(stages).run_inline([[1]])
+    profiler.stop()
+    summary = profiler.write()
+
+    assert summary['allocate']['peak_memory_bytes'] >= 8 * 2 ** 20
+    assert summary['small']['peak_memory_bytes'] < 2 ** 20
+    assert (tmp_path / 'allocate.memory.txt').exists()
+
+
+def test_failed_stage_still_recorded(tmp_path):
+    """Test a stage that raises is still profiled, and the error propagates."""
+    profiler = StageProfiler(str(tmp_path))
+
+    def fail(chunk):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        Pipeline([profiler.stage(Stage('write', fail))]).run_inline([[1]])
+
+    assert profiler.calls['write'] == 1
+
+
+class ExclusiveProfile(cProfile.Profile):
+    """cProfile.Profile that refuses to overlap another, like Python 3.12+."""
+
+    active = None
+    lock = threading.Lock()
+
+    def enable(self, *args, **kwargs):
+        with ExclusiveProfile.lock:
+            if ExclusiveProfile.active is not None:
+                raise ValueError("Another profiling tool is already active")
+            ExclusiveProfile.active = self
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        super().disable()
+        with ExclusiveProfile.lock:
+            if ExclusiveProfile.active is self:
+                ExclusiveProfile.active = None
+
+
+def test_staged_runs_profiled_one_call_at_a_time(tmp_path, monkeypatch):
+    """Test concurrent stages (and concurrent pipelines) never enable two profilers at once."""
+    monkeypatch.setattr('src.profiling.cProfile.Profile', ExclusiveProfile)
+    profiler = StageProfiler(str(tmp_path))
+
+    def run_pipeline():
+        stages = [
+            profiler.stage(Stage('square', lambda chunk: [busy(20_000) for _ in chunk])),
+            profiler.stage(Stage('count', lambda chunk: [len(chunk)])),
+        ]
+        return Pipeline(stages).run(profiler.source([[1, 2]] * 20, name='fetch'))
+
+    outputs = []
+    accounts = [threading.Thread(target=lambda: outputs.append(run_pipeline())) for _ in range(2)]
+    for account in accounts:
+        account.start()
+    for account in accounts:
+        account.join()
+
+    assert outputs == [[2] * 20, [2] * 20]
+    assert profiler.calls['square'] == 40
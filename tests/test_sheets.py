@@ -0,0 +1,198 @@
+"""Unit tests for the Google Sheets writer."""
+from datetime import datetime
+
+import httplib2
+import pytest
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+
+from src.sheets import SheetsClientPool, SheetsWriter
+from src.sheets_client import SheetsRequestExecutor
+from src.sheets_discovery import load_document
+from tests.fakes import FakeSheetsService
+
+
+def make_row(date, amount=100.0, merchant="SWIGGY", category="Food & Dining"):
+    """Categorized transaction dictionary."""
+    return {
+        'date': date,
+        'amount': amount,
+        'tx_type': 'Debit',
+        'mode': 'UPI',
+        'merchant': merchant,
+        'category': category,
+        'raw_text': ''
+    }
+
+
+@pytest.fixture
+def service():
+    """Fake spreadsheet with one existing month."""
+    return FakeSheetsService(titles=['January 2026'])
+
+
+@pytest.fixture
+def writer(service):
+    """Writer bound to the fake service."""
+    return SheetsWriter('{}', 'sheet-id', service=service)
+
+
+def test_metadata_fetched_once_with_field_mask(writer, service):
+    """Test the sheet list is fetched once per writer, with a field mask."""
+    writer.append_transactions([make_row(datetime(2026, 1, 5))])
+    writer.append_transactions([make_row(datetime(2026, 1, 6))])
+
+    gets = service.calls_to('get')
+    assert len(gets) == 1
+    assert gets[0]['fields'].startswith('sheets.properties')
+
+
+def test_backfill_creates_missing_tabs_in_one_request(writer, service):
+    """Test every missing month tab, with header, is created by one batchUpdate."""
+    rows = [make_row(datetime(2025, month, 10)) for month in range(1, 13)]
+    rows.append(make_row(datetime(2026, 1, 3)))
+
+    assert writer.append_transactions(rows) == 13
+
+    assert len(service.calls_to('get')) == 1
+    assert len(service.calls_to('batchUpdate')) == 1
+    assert not service.calls_to('values.update')
+    assert len(service.tabs) == 13
+    assert service.tabs['March 2025']['rows'][0] == SheetsWriter.HEADER_ROW
+    assert service.tabs['March 2025']['rows'][1][5] == 'SWIGGY'
+
+
+def test_no_create_request_when_tabs_exist(writer, service):
+    """Test nothing is created when all month tabs exist."""
+    writer.append_transactions([make_row(datetime(2026, 1, 5))])
+    assert not service.calls_to('batchUpdate')
+
+
+def test_multi_month_batch_is_one_write_request(writer, service):
+    """Test rows for several months go out in a single values().batchUpdate."""
+    service.tabs['January 2026']['rows'] = [SheetsWriter.HEADER_ROW, ['old']]
+    rows = [make_row(datetime(2025, 12, 30)), make_row(datetime(2026, 1, 2)), make_row(datetime(2026, 2, 1))]
+
+    assert writer.append_transactions(rows) == 3
+
+    writes = service.calls_to('values.batchUpdate')
+    assert len(writes) == 1
+    assert not service.calls_to('values.append')
+    assert service.tabs['January 2026']['rows'][2][5] == 'SWIGGY'
+    assert len(service.tabs['December 2025']['rows']) == 2
+    assert len(service.calls_to('values.batchGet')) == 1
+
+    # Row counts are tracked, so the next run neither re-reads nor overwrites
+    writer.append_transactions([make_row(datetime(2026, 1, 9), merchant="ZOMATO")])
+    assert len(service.calls_to('values.batchGet')) == 1
+    assert service.tabs['January 2026']['rows'][3][5] == 'ZOMATO'
+
+
+def test_large_batch_chunked_and_grid_grown(writer, service, monkeypatch):
+    """Test large batches are split across requests and full tabs are extended."""
+    monkeypatch.setattr('src.sheets.SHEETS_MAX_ROWS_PER_REQUEST', 400)
+    rows = [make_row(datetime(2026, 1, 1 + i % 28), amount=100.0 + i) for i in range(1100)]
+
+    assert writer.append_transactions(rows) == 1100
+
+    writes = service.calls_to('values.batchUpdate')
+    assert [sum(len(d['values']) for d in w['body']['data']) for w in writes] == [400, 400, 300]
+    assert len(service.tabs['January 2026']['rows']) == 1100
+    assert service.tabs['January 2026']['rowCount'] >= 1100
+
+
+def test_transient_errors_retried_without_duplicate_rows(service):
+    """Test a 429 on the write is retried and rows land exactly once."""
+    sleeps = []
+    executor = SheetsRequestExecutor(sleep=sleeps.append, jitter=lambda: 0.0)
+    writer = SheetsWriter('{}', 'sheet-id', service=service, executor=executor)
+    # get and batchGet succeed, the first write is rate limited
+    service.faults = [None, None, HttpError(httplib2.Response({'status': 429, 'retry-after': '2'}), b'{}')]
+
+    assert writer.append_transactions([make_row(datetime(2026, 1, 5)), make_row(datetime(2026, 1, 6))]) == 2
+
+    assert len(service.calls_to('values.batchUpdate')) == 2
+    assert len(service.tabs['January 2026']['rows']) == 2
+    assert 2.0 in sleeps
+
+
+def test_new_tabs_get_hidden_id_column(writer, service):
+    """Test created tabs carry the fingerprint in a hidden column."""
+    writer.append_transactions([make_row(datetime(2026, 3, 1))])
+
+    tab = service.tabs['March 2026']
+    assert tab['rows'][0][6] == 'Transaction ID'
+    assert len(tab['rows'][1][6]) == 16
+    assert SheetsWriter.ID_COLUMN_INDEX in tab['hidden']
+
+
+def test_rerun_skips_rows_already_in_sheet(service):
+    """Test a second writer (next run) reads the ID column and skips known rows."""
+    rows = [make_row(datetime(2026, 1, 5)), make_row(datetime(2026, 2, 5))]
+    SheetsWriter('{}', 'sheet-id', service=service).append_transactions(rows)
+
+    rerun = SheetsWriter('{}', 'sheet-id', service=service)
+    new = make_row(datetime(2026, 1, 7), amount=55.0)
+    assert rerun.append_transactions(rows + [new]) == 1
+
+    assert len(service.tabs['January 2026']['rows']) == 2
+    assert len(service.tabs['February 2026']['rows']) == 2
+    assert service.tabs['January 2026']['rows'][1][1] == 55.0
+    # Only columns A and G are read to build the index
+    ranges = service.calls_to('values.batchGet')[-1]['ranges']
+    assert all(r.endswith(('!A:A', '!G:G')) for r in ranges)
+
+
+def test_update_existing_rewrites_row_in_place(writer, service):
+    """Test update_existing overwrites the matching row instead of appending."""
+    row = make_row(datetime(2026, 1, 5), category="Pending")
+    writer.append_transactions([row])
+
+    assert writer.append_transactions([dict(row, category="Food & Dining")], update_existing=True) == 1
+    rows = service.tabs['January 2026']['rows']
+    assert len(rows) == 1
+    assert rows[0][4] == "Food & Dining"
+
+
+def test_legacy_tab_gets_id_header(writer, service):
+    """Test a tab written before the ID column gains the header and hidden column."""
+    service.tabs['January 2026']['rows'] = [SheetsWriter.HEADER_ROW[:6], ['2026-01-01 10:00', 1.0]]
+    writer.append_transactions([make_row(datetime(2026, 1, 5))])
+
+    tab = service.tabs['January 2026']
+    assert tab['rows'][0][6] == 'Transaction ID'
+    assert tab['rows'][2][5] == 'SWIGGY'
+    assert SheetsWriter.ID_COLUMN_INDEX in tab['hidden']
+
+
+def test_bundled_discovery_document_builds_used_methods():
+    """Test the trimmed discovery document supports every request the writer makes."""
+    service = build_from_document(load_document(), developerKey='test')
+    request = service.spreadsheets().values().batchUpdate(
+        spreadsheetId='sheet-id', body={'valueInputOption': 'RAW', 'data': []}
+    )
+    assert request.uri.startswith('https://sheets.googleapis.com/v4/spreadsheets/sheet-id/values:batchUpdate')
+    request = service.spreadsheets().values().batchGet(
+        spreadsheetId='sheet-id', ranges=["'January 2026'!A:A"], majorDimension='COLUMNS',
+        valueRenderOption='UNFORMATTED_VALUE', fields='valueRanges(values)'
+    )
+    assert 'majorDimension=COLUMNS' in request.uri
+    assert service.spreadsheets().get(spreadsheetId='sheet-id', fields='sheets.properties').method == 'GET'
+    assert service.spreadsheets().batchUpdate(spreadsheetId='sheet-id', body={'requests': []}).method == 'POST'
+
+
+def test_client_pool_reuses_services_and_shares_quota():
+    """Test writers for different spreadsheets reuse a returned service and one executor."""
+    pool = SheetsClientPool('{}')
+    service = FakeSheetsService()
+    pool.release(service)
+
+    first = pool.writer('sheet-1')
+    second = pool.writer('sheet-2')
+    assert first.service is service
+    assert second._service is None  # Built on first use
+    assert first.executor is second.executor
+
+    first.write([make_row(datetime(2026, 1, 5, 12, 0))])
+    first.close()
+    assert pool.writer('sheet-3').service is service
@@ -0,0 +1,146 @@
+"""Unit tests for the Sheets request executor."""
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from src.sheets_client import SheetsRequestExecutor, TokenBucket
+
+
+class FakeClock:
+    """Clock advanced by the fake sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status: int, retry_after: str = None) -> HttpError:
+    """HttpError with the given status."""
+    headers = {'status': status}
+    if retry_after:
+        headers['retry-after'] = retry_after
+    return HttpError(httplib2.Response(headers), b'{}')
+
+
+class Request:
+    """Request raising the given errors in turn, then returning a result."""
+
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.executed = 0
+
+    def execute(self):
+        self.executed += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+@pytest.fixture
+def clock():
+    """Fake clock."""
+    return FakeClock()
+
+
+def make_executor(clock, **kwargs):
+    """Executor with deterministic backoff."""
+    return SheetsRequestExecutor(sleep=clock.sleep, clock=clock, jitter=lambda: 1.0, **kwargs)
+
+
+def test_retries_quota_and_server_errors(clock):
+    """Test 429 and 5xx are retried with exponential backoff."""
+    request = Request([http_error(429), http_error(503)])
+    executor = make_executor(clock, base_delay=1.0)
+
+    assert executor.execute(lambda: request) == "ok"
+    assert request.executed == 3
+    assert clock.sleeps == [1.0, 2.0]
+    assert executor.retries == 2
+
+
+def test_honors_retry_after(clock):
+    """Test the server's retry-after wins over a shorter backoff."""
+    request = Request([http_error(429, retry_after='10')])
+    executor = make_executor(clock, base_delay=1.0)
+
+    executor.execute(lambda: request)
+    assert clock.sleeps == [10.0]
+
+
+def test_client_errors_are_not_retried(clock):
+    """Test a 400 is raised straight away."""
+    request = Request([http_error(400)])
+    executor = make_executor(clock)
+
+    with pytest.raises(HttpError):
+        executor.execute(lambda: request)
+    assert request.executed == 1
+    assert clock.sleeps == []
+
+
+def test_gives_up_after_max_retries(clock):
+    """Test the last error is re-raised once retries run out."""
+    request = Request([http_error(500)] * 5)
+    executor = make_executor(clock, max_retries=2)
+
+    with pytest.raises(HttpError):
+        executor.execute(lambda: request)
+    assert request.executed == 3
+
+
+def test_builder_called_on_every_attempt(clock):
+    """Test the request is rebuilt for each retry."""
+    request = Request([http_error(502)])
+    built = []
+    executor = make_executor(clock)
+
+    executor.execute(lambda: built.append(1) or request)
+    assert len(built) == 2
+
+
+def test_write_quota_throttles_writes_only(clock):
+    """Test writes beyond the per-minute quota wait, reads do not."""
+    executor = make_executor(clock, writes_per_minute=2)
+
+    for _ in range(2):
+        executor.execute(lambda: Request([]), write=True)
+    for _ in range(5):
+        executor.execute(lambda: Request([]))
+    assert clock.sleeps == []
+
+    executor.execute(lambda: Request([]), write=True)
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_rate_limit_drains_write_quota(clock):
+    """Test a 429 empties the bucket so the next write waits."""
+    executor = make_executor(clock, writes_per_minute=60, base_delay=0.0)
+
+    executor.execute(lambda: Request([]), write=True)
+    assert executor.write_quota.tokens == 59
+
+    request = Request([http_error(429)])
+    executor.execute(lambda: request, write=True)
+    # Backoff is zero, so the only wait is for the drained bucket to refill
+    assert clock.sleeps == [0.0, pytest.approx(1.0)]
+
+
+def test_token_bucket_refills():
+    """Test tokens accrue with time up to capacity."""
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=3, rate=1.0, clock=clock)
+    for _ in range(3):
+        bucket.take()
+    assert bucket.wait_time() == pytest.approx(1.0)
+
+    clock.now = 100
+    assert bucket.wait_time() == 0.0
+    assert bucket.tokens == 3
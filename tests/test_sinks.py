@@ -0,0 +1,108 @@
+"""Unit tests for the transaction sinks."""
+import csv
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.config import Account
+from src.sheets import SheetsWriter
+from src.sinks import CSVSink, MultiSink, SQLiteSink, TransactionSink, create_sinks
+from tests.fakes import FakeSheetsService
+
+
+def make_row(day, amount=100.0, merchant="SWIGGY", category="Food & Dining"):
+    """Categorized transaction dictionary."""
+    return {
+        'date': datetime(2026, 1, day, 12, 0),
+        'amount': amount,
+        'tx_type': 'Debit',
+        'mode': 'UPI',
+        'merchant': merchant,
+        'category': category,
+        'raw_text': ''
+    }
+
+
+def test_sqlite_sink_is_idempotent_and_indexed(tmp_path):
+    """Test the SQLite ledger ignores known transactions and has lookup indexes."""
+    path = str(tmp_path / 'ledger.sqlite')
+    sink = SQLiteSink(path)
+    assert sink.write([make_row(1), make_row(2)]) == 2
+    assert sink.write([make_row(2), make_row(3, merchant=None)]) == 1
+    sink.close()
+
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT COUNT(*) FROM transactions').fetchone()[0] == 3
+    assert connection.execute("SELECT merchant FROM transactions WHERE date LIKE '2026-01-03%'").fetchone() == \
+        ('Unknown',)
+    indexes = {row[1] for row in connection.execute("PRAGMA index_list('transactions')")}
+    assert {'idx_transactions_date', 'idx_transactions_merchant', 'idx_transactions_category'} <= indexes
+
+
+def test_csv_sink_appends_new_rows_only(tmp_path):
+    """Test the CSV sink writes one header and skips rows already in the file."""
+    path = tmp_path / 'transactions.csv'
+    CSVSink(str(path)).write([make_row(1)])
+    assert CSVSink(str(path)).write([make_row(1), make_row(2)]) == 1
+
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['date'] for row in rows] == ['2026-01-01 12:00', '2026-01-02 12:00']
+
+
+def test_parquet_sink_writes_through(tmp_path):
+    """Test the Parquet sink has rows in the file once it reports them written."""
+    pq = pytest.importorskip('pyarrow.parquet')
+    from src.sinks import ParquetSink
+
+    path = str(tmp_path / 'transactions.parquet')
+    sink = ParquetSink(path)
+    assert sink.write([make_row(1)]) == 1
+    assert pq.read_table(path).num_rows == 1
+
+    sink = ParquetSink(path)
+    assert sink.write([make_row(1), make_row(2)]) == 1
+    assert sink.write([make_row(2)]) == 0
+    assert pq.read_table(path).num_rows == 2
+
+
+def test_sheets_writer_is_a_sink():
+    """Test SheetsWriter implements the sink interface."""
+    service = FakeSheetsService()
+    writer = SheetsWriter('{}', 'sheet-id', service=service)
+    assert isinstance(writer, TransactionSink)
+    assert writer.write([make_row(1)]) == 1
+    assert len(service.tabs['January 2026']['rows']) == 2
+
+
+def test_multi_sink_writes_all_and_reports_failures(tmp_path):
+    """Test every sink is written even when one of them fails."""
+    class BrokenSink(TransactionSink):
+        name = 'broken'
+
+        def write(self, transactions):
+            raise RuntimeError("disk full")
+
+    csv_sink = CSVSink(str(tmp_path / 'transactions.csv'))
+    sqlite_sink = SQLiteSink(str(tmp_path / 'ledger.sqlite'))
+    assert MultiSink([csv_sink, sqlite_sink]).write([make_row(1)]) == {'csv': 1, 'sqlite': 1}
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        MultiSink([BrokenSink(), csv_sink]).write([make_row(2)])
+    assert csv_sink.write([make_row(2)]) == 0
+
+
+def test_create_sinks_rejects_unknown_names():
+    """Test sink names are validated."""
+    with pytest.raises(ValueError):
+        create_sinks(['ftp'])
+
+
+def test_create_sinks_uses_account_ledgers(tmp_path, monkeypatch):
+    """Test each account writes to its own ledger files."""
+    monkeypatch.chdir(tmp_path)
+    sqlite_sink, csv_sink = create_sinks(['sqlite', 'csv'], Account('home', 'a@example.com', 'pw', []))
+    assert sqlite_sink.path == 'ledger.home.sqlite'
+    assert str(csv_sink.path) == 'transactions.home.csv'
+    sqlite_sink.close()